@@ -1,11 +1,16 @@
 import os
+import json
 import requests
 import time
 import shutil
 import pyspark.sql
 import pyspark.sql.functions as F
 import pyspark.sql.window as W
- 
+
+# Partition column and watermark file of the Parquet storage mode.
+PARTITION_COLUMN = "date"
+WATERMARK_FILE = "_watermark.json"
+
 class BitcoinDataHandler:
     def __init__(self, spark: pyspark.sql.SparkSession) -> None:
         """
@@ -17,7 +22,7 @@ class BitcoinDataHandler:
         self.spark = spark
         self.stop_signal = False
 
-    def load_data(self, total_days: int, view_name: str, data_path: str, currency: str = "usd") -> None:
+    def load_data(self, total_days: int, view_name: str, data_path: str, currency: str = "usd", storage: str = "csv") -> None:
         """
         Populate the view btc_prices with past total_days information of Bitcoin prices in given currency.
         
@@ -25,7 +30,12 @@ class BitcoinDataHandler:
         :param view_name: Name of the view to create and load the data into.
         :param data_path: Directory under which to store the CSV format of the data.
         :param currency: In what currency to load the data into the view; default is USD.
+        :param storage: "csv" rewrites data_path from scratch; "parquet" keeps an append-only Parquet dataset
+                        partitioned by date and only fetches data newer than its watermark.
         """
+        if storage == "parquet":
+            self._load_data_incremental(total_days, view_name, data_path, currency)
+            return
         now_ts = int(time.time())
         from_ts = now_ts - total_days * 86400
         self.spark.catalog.dropTempView(view_name)
@@ -71,7 +81,7 @@ class BitcoinDataHandler:
             })
         return retrieved_data
 
-    def start_real_time_update(self, days: int, vw_nm:str, path:str, curr: str = "usd") -> None:
+    def start_real_time_update(self, days: int, vw_nm:str, path:str, curr: str = "usd", storage: str = "csv") -> None:
         """
         Fetch and load existing Bitcoin price data within specified days and start real time updates. The function will 
         identify if there is new data to add (hourly level), and updates the view with any new data periodically (at every hour).
@@ -79,12 +89,19 @@ class BitcoinDataHandler:
         :param days: How many days to retrieve data for intially.
         :param vw_nm: Name of the view to create and load data into.
         :param curr: Currency in which to retrieve the Bitcoin price data; default is USD.
+        :param storage: "csv" or "parquet" (incremental updates that only touch the new date partitions).
         """
         
         self.stop_signal = False
         #Intially load data with specified parameters and sleep until next retrieval.
-        self.load_data(total_days=days, currency=curr, view_name=vw_nm, data_path=path)
+        self.load_data(total_days=days, currency=curr, view_name=vw_nm, data_path=path, storage=storage)
         time.sleep(3600)
+
+        if storage == "parquet":
+            while not self.stop_signal:
+                self.update_incremental(days, vw_nm, path, curr)
+                time.sleep(3600)
+            return
         
         while not self.stop_signal:
             #Retrieve the latest timestamp in the existing view.
@@ -105,11 +122,7 @@ class BitcoinDataHandler:
                 existing_hour_keys = existing_df2.select("hour_key").distinct()
 
                 #Isolate last record for each hour.
-                filtered_df = self.spark.createDataFrame(filtered_data)
-                filtered_df = filtered_df.withColumn("hour_key", F.date_format(F.from_unixtime("timestamp"), "yyyy-MM-dd HH:00:00"))
-                window = W.Window.partitionBy("hour_key").orderBy(F.col("timestamp").desc())
-                ranked_df = filtered_df.withColumn("rn", F.row_number().over(window))
-                new_df = ranked_df.filter(F.col("rn") == 1)
+                new_df = self._latest_per_hour(self.spark.createDataFrame(filtered_data))
                 
                 #Exclude data for hours that are already in the view.
                 new_df = new_df.join(existing_hour_keys, on="hour_key", how="left_anti")
@@ -129,6 +142,140 @@ class BitcoinDataHandler:
                 print("No new data found.")
             time.sleep(3600)
     
+    def update_incremental(self, days: int, view_name: str, data_path: str, currency: str = "usd") -> int:
+        """
+        Run one hourly update of a Parquet dataset: fetch data newer than the watermark, keep the last record per
+        new hour, append it to its date partitions and refresh the view. Only the partitions of the new data are read.
+
+        :param days: How many past days the view covers.
+        :param view_name: Name of the view to refresh.
+        :param data_path: Directory of the Parquet dataset.
+        :param currency: Currency in which to retrieve the Bitcoin price data; default is USD.
+        :return: Number of records added.
+        """
+        latest_ts = self._read_watermark(data_path)
+        now_ts = int(time.time())
+        if latest_ts is None:
+            latest_ts = now_ts - days * 86400
+        print(f"Fetching new data.")
+        new_data = self.fetch_data_range(latest_ts, now_ts, currency=currency)
+        filtered_data = [item for item in new_data if int(item["timestamp"]) > int(latest_ts)]
+        if not filtered_data:
+            print("No new data found.")
+            return 0
+
+        new_df = self._latest_per_hour(self.spark.createDataFrame(filtered_data))
+        new_df = new_df.withColumn(PARTITION_COLUMN, F.from_unixtime("timestamp", "yyyy-MM-dd"))
+        #Exclude hours already stored, reading only the partitions the new data falls into.
+        new_dates = [row[PARTITION_COLUMN] for row in new_df.select(PARTITION_COLUMN).distinct().collect()]
+        if os.path.exists(data_path):
+            existing_hour_keys = (
+                self.spark.read.parquet(data_path)
+                .where(F.col(PARTITION_COLUMN).isin(new_dates))
+                .select(F.date_format(F.from_unixtime("timestamp"), "yyyy-MM-dd HH:00:00").alias("hour_key"))
+                .distinct()
+            )
+            new_df = new_df.join(existing_hour_keys, on="hour_key", how="left_anti")
+        new_df = new_df.drop("rn", "hour_key")
+        new_df = new_df.withColumn("price_date", F.from_unixtime("timestamp", "yyyy-MM-dd HH:mm:ss"))
+        #Materialize before writing, so the anti-join is not re-evaluated against the appended rows.
+        new_df = new_df.localCheckpoint()
+
+        added = self._append_partitions(new_df, data_path)
+        self._refresh_view(view_name, data_path, now_ts - days * 86400)
+        if added:
+            print(f"Added following new record(s):")
+            new_df.drop(PARTITION_COLUMN).show()
+        else:
+            print("No new data found.")
+        return added
+
+    def _load_data_incremental(self, total_days: int, view_name: str, data_path: str, currency: str = "usd") -> None:
+        """
+        Parquet version of load_data: keep the existing dataset, fetch only data newer than its watermark,
+        append it and point the view at the last total_days of partitions.
+        """
+        now_ts = int(time.time())
+        from_ts = now_ts - total_days * 86400
+        watermark = self._read_watermark(data_path)
+        if watermark is not None and watermark > from_ts:
+            from_ts = int(watermark)
+        print(f"Fetching Bitcoin data.")
+        data = self.fetch_data_range(from_ts, now_ts, currency=currency)
+        if watermark is not None:
+            data = [item for item in data if item["timestamp"] > watermark]
+        if data:
+            df = self.spark.createDataFrame(data)
+            if total_days > 90:
+                df = df.withColumn("price_date", F.from_unixtime("timestamp", "yyyy-MM-dd"))
+            else:
+                df = df.withColumn("price_date", F.from_unixtime("timestamp", "yyyy-MM-dd HH:mm:ss"))
+            df = df.drop_duplicates().withColumn(PARTITION_COLUMN, F.from_unixtime("timestamp", "yyyy-MM-dd"))
+            added = self._append_partitions(df, data_path)
+            print(f"Appended {added} rows to {data_path}.")
+        elif watermark is None:
+            print("No data found.")
+            return
+        else:
+            print("No new data found.")
+        count = self._refresh_view(view_name, data_path, now_ts - total_days * 86400).count()
+        print(f"Created view {view_name} with {count} rows.")
+
+    def _latest_per_hour(self, df: pyspark.sql.DataFrame) -> pyspark.sql.DataFrame:
+        """
+        Keep the last record of each hour; the result has an extra hour_key column (and rn, always 1).
+        """
+        df = df.withColumn("hour_key", F.date_format(F.from_unixtime("timestamp"), "yyyy-MM-dd HH:00:00"))
+        window = W.Window.partitionBy("hour_key").orderBy(F.col("timestamp").desc())
+        ranked_df = df.withColumn("rn", F.row_number().over(window))
+        return ranked_df.filter(F.col("rn") == 1)
+
+    def _append_partitions(self, df: pyspark.sql.DataFrame, data_path: str) -> int:
+        """
+        Append rows to the date-partitioned Parquet dataset and advance the watermark.
+        The watermark is written after the data, so a failed write is fetched again on the next run.
+
+        :return: Number of rows appended.
+        """
+        df = df.cache()
+        stats = df.agg(F.count(F.lit(1)).alias("rows"), F.max("timestamp").alias("max_ts")).collect()[0]
+        if stats["rows"]:
+            df.write.mode("append").partitionBy(PARTITION_COLUMN).parquet(data_path)
+            watermark = self._read_watermark(data_path)
+            self._write_watermark(data_path, max(stats["max_ts"], watermark or 0))
+        df.unpersist()
+        return stats["rows"]
+
+    def _refresh_view(self, view_name: str, data_path: str, from_ts: int) -> pyspark.sql.DataFrame:
+        """
+        Recreate the view over the Parquet dataset, restricted to partitions from from_ts on.
+        The view keeps the date partition column, so queries filtering on it skip the other partitions too.
+        """
+        from_date = F.from_unixtime(F.lit(from_ts), "yyyy-MM-dd")
+        df = self.spark.read.parquet(data_path).where(F.col(PARTITION_COLUMN) >= from_date)
+        self.spark.catalog.dropTempView(view_name)
+        df.createOrReplaceTempView(view_name)
+        return df
+
+    def _read_watermark(self, data_path: str):
+        """
+        Return the latest stored timestamp of a Parquet dataset, or None if there is none.
+        """
+        watermark_path = os.path.join(data_path, WATERMARK_FILE)
+        if not os.path.exists(watermark_path):
+            return None
+        with open(watermark_path) as f:
+            return json.load(f).get("max_timestamp")
+
+    def _write_watermark(self, data_path: str, max_timestamp: float) -> None:
+        """
+        Atomically store the latest timestamp next to the data (Spark ignores files starting with "_").
+        """
+        watermark_path = os.path.join(data_path, WATERMARK_FILE)
+        with open(watermark_path + ".tmp", "w") as f:
+            json.dump({"max_timestamp": max_timestamp, "updated_at": int(time.time())}, f)
+        os.replace(watermark_path + ".tmp", watermark_path)
+
     def stop_real_time_update(self) -> None:
         """
         Stop the real time updates. 
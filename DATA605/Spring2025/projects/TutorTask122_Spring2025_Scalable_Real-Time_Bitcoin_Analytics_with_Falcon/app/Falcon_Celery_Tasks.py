@@ -5,7 +5,7 @@ Utilize Celery to distribute across 3 key tasks for data ingestion/processing.
 
 Task mapping:
 1) process_trade_data
-2) detect_anomaly
+2) detect_anomaly (and detect_anomaly_batch)
 3) process_candle_data 
 
 """
@@ -13,13 +13,13 @@ Task mapping:
 # Import packages.
 # -----------------------------------------------------------------------------
 from celery import Celery, shared_task
+from celery.signals import worker_process_shutdown, worker_shutdown
 from datetime import datetime
 import logging
-from collections import defaultdict, deque
+from collections import defaultdict
 import redis 
 import traceback
 import json
-import numpy as np
 r = redis.Redis(host='redis', port=6379, db=0)
 
 
@@ -28,7 +28,7 @@ r = redis.Redis(host='redis', port=6379, db=0)
 # -----------------------------------------------------------------------------
 
 # Import functions.
-from Falcon_functions import clean_trade, save_trade_to_cache, save_candle_to_timeseries, fetch_coinbase_candles
+from Falcon_functions import clean_trade, fetch_coinbase_candles, BatchedRedisWriter, StreamingAnomalyDetector
 
 # Define the app and broker and backend.
 app = Celery('Falcon_Celery_Tasks',
@@ -39,6 +39,19 @@ app = Celery('Falcon_Celery_Tasks',
 logger = logging.getLogger(__name__)
 
 
+# Micro-batching writer shared by the trade and candle tasks of this worker.
+# Flushes every 200 items or 5 ms, whichever comes first.
+batch_writer = BatchedRedisWriter(redis_client=r, max_items=200, max_latency_ms=5)
+
+
+# atexit handlers don't run in prefork children (they leave with os._exit),
+# so flush when a pool process shuts down, and when a solo/threads worker stops.
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_batch_writer(**kwargs):
+    batch_writer.close()
+
+
 # Health Check Task:
 @app.task
 def ping():
@@ -70,9 +83,9 @@ def process_trade_data(data, platform):
         cleaned = clean_trade(data, platform)
         logger.info(f"Cleaned:", cleaned)  
         if cleaned: 
-            #Save to redis for caching.
-            save_trade_to_cache(cleaned, symbol=cleaned['symbol'], platform=platform)
-            logger.info("Saved to cache.")
+            #Save to redis for caching (buffered, flushed in batches).
+            batch_writer.add_trade(cleaned, symbol=cleaned["core"]["symbol"], platform=platform)
+            logger.info("Buffered for cache.")
             #detect_anomaly.delay(cleaned)  # Chain to anomaly detection.
             #return chain(
                 #process_trade_data.s(data, platform),
@@ -89,61 +102,77 @@ def process_trade_data(data, platform):
 # 2. detect_anomaly
 # ------------------------------------------------------------------------------
 # Idea: could ML be used here to detect anomalies or based on other data?
-# Store last 500 prices per platform and detect anomolies based on rolling avg. 
-price_history = defaultdict(lambda: deque(maxlen=500))
+# Detect anomalies against a 500-price rolling band (plus a 100-price band and
+# an EWMA band). The rolling state is kept in Redis, so every worker shares it.
+anomaly_detector = StreamingAnomalyDetector(
+    redis_client=r, windows=(500, 100), ewma_alphas=(0.05,), threshold=2, min_periods=30
+)
+
+
+def _store_anomalies(trades, results):
+    # Send the anomalies to a separate redis cache to use downstream.
+    pipe = r.pipeline(transaction=False)
+    n_anomalies = 0
+    for data, result in zip(trades, results):
+        if not result["anomaly"]:
+            continue
+        logging.warning(
+            f"[ANOMALY] {result['platform']} @ {data.get('timestamp')} | Price: {result['price']:.2f} | Mean: {result['mean']:.2f} | Std: {result['std']:.2f}"
+        )
+        # Tag data before pushing to Redis.
+        data["anomaly"] = True
+        data["mean"] = result["mean"]
+        data["std"] = result["std"]
+        anomaly_key = f"anomalies:{result['platform']}"
+        pipe.lpush(anomaly_key, json.dumps(data))
+        pipe.ltrim(anomaly_key, 0, 999)  # Keep only latest 1,000 anomalies
+        n_anomalies += 1
+    if n_anomalies:
+        pipe.execute()
+
 
 @app.task
 def detect_anomaly(data):
     platform = data.get("platform", "unknown").lower()
     print(f"detect anomaly triggered for platform {platform}")
     price = float(data.get("price", 0))
-    timestamp = data.get("timestamp", datetime.utcnow().isoformat())
-
-    # Update price history array based on platform.
-    history = price_history[platform]
-    history.append(price)
-
-    # Handle when there isn't enough data to run.
-    if len(history) < 30:
-        # Not enough data yet
-        logging.info(f"[{platform}] Warming up... {len(history)}/500 collected")
-        return {"platform": platform, "price": price, "anomaly": False, "note": "warming_up"}
-
-    # Compute rolling mean and std of prices.
-    mean = np.mean(history)
-    std = np.std(history)
-
-    # Set the threshold for an "anomaly" in price.
-    threshold = 2  # Detect spikes beyond 2 std deviations
-    upper_bound = mean + threshold * std
-    lower_bound = mean - threshold * std
-    # Initialize as false. 
-    is_anomaly = False
-    # Check for anomoly.
-    # Send alert if anomoly is detected and print the trade information. 
-    if price > upper_bound or price < lower_bound:
-        logging.warning(
-            f"[ANOMALY] {platform} @ {timestamp} | Price: {price:.2f} | Mean: {mean:.2f} | Std: {std:.2f}"
-        )
-        is_anomaly = True
-        # Save to a separate Redis key.
-    # Send the anomoly to separate redis cache to use downstream.
-    if is_anomaly:
-        # Tag data before pushing to Redis.
-        data["anomaly"] = True
-        data["mean"] = mean
-        data["std"] = std
-        anomaly_key = f"anomalies:{platform}"
-        r.lpush(anomaly_key, json.dumps(data))
-        r.ltrim(anomaly_key, 0, 999)  # Keep only latest 1,000 anomalies
+    data.setdefault("timestamp", datetime.utcnow().isoformat())
+
+    result = anomaly_detector.update(platform, price)
+    if result.get("note") == "warming_up":
+        logging.info(f"[{platform}] Warming up... {result['bands']['rolling_500']['n']}/500 collected")
+    _store_anomalies([data], [result])
     # Return the whole trade information.
-    return {
-        "platform": platform,
-        "price": price,
-        "mean": mean,
-        "std": std,
-        "anomaly": is_anomaly
-    }
+    return result
+
+
+@app.task
+def detect_anomaly_batch(trades):
+    """
+    Score a batch of cleaned trades (e.g. drained from a queue or the result
+    of a chord over `process_trade_data`) with one Redis call per platform.
+    """
+    by_platform = defaultdict(list)
+    for data in trades:
+        if not isinstance(data, dict) or "price" not in data:
+            continue
+        data.setdefault("timestamp", datetime.utcnow().isoformat())
+        by_platform[data.get("platform", "unknown").lower()].append(data)
+    results = []
+    for platform, platform_trades in by_platform.items():
+        prices = [float(t["price"]) for t in platform_trades]
+        platform_results = anomaly_detector.update_batch(platform, prices)
+        _store_anomalies(platform_trades, platform_results)
+        results.extend(platform_results)
+    return results
+
+# ------------------------------------------------------------------------------
+# Batch writer metrics
+# ------------------------------------------------------------------------------
+@app.task
+def batch_writer_metrics():
+    # Flush size and latency as seen by this worker process.
+    return dict(batch_writer.metrics)
 
 # ------------------------------------------------------------------------------
 # 3. process_ticker_data /NOT USED just an idea
@@ -197,14 +226,13 @@ def process_candle_data(candle):
         close = float(candle["close"])
         volume = float(candle["volume"])
 
-        save_candle_to_timeseries(
+        batch_writer.add_candle(
             platform=platform,
             symbol=symbol,
             resolution=resolution,
             candle=[timestamp, low, high, open_, close, volume]
         )
-        print(f"[process_candle_data] Stored candle for {platform}:{symbol} @ {timestamp}")
-        print(f"[process_candle_data] Received: {candle}")
+        logger.debug(f"[process_candle_data] Buffered candle for {platform}:{symbol} @ {timestamp}: {candle}")
         return {"status": "ok"}
 
     except Exception as e:
@@ -6,6 +6,8 @@
 # clean_trade clean and normalize trade data
 # save_trade_to_cache cache trade in redis
 # save_candle_to_timeseries store candle in redis time series
+# BatchedRedisWriter micro-batch trades and candles into pipelined writes
+# StreamingAnomalyDetector rolling/EWMA price bands with state shared in redis
 # fetch_coinbase_candles fetch historical candles from coinbase
 # pull_and_store_coinbase_candles fetch and store coinbase candles
 # ------------------------------------------------------------------------------
@@ -18,10 +20,17 @@
 
 import redis 
 import json
+import logging
+import threading
+import time
+from collections import defaultdict
 from datetime import datetime
 import requests
 from redistimeseries.client import Client as RedisTS
 
+# Define logger for the batched writer.
+logger = logging.getLogger(__name__)
+
 rts = RedisTS(host='redis', port=6379, db=1)
 
 
@@ -149,6 +158,387 @@ def save_candle_to_timeseries(platform: str, symbol: str, resolution: str, candl
         print(f"[RedisTS Error] Could not store candle: {e}")
 
 
+# ------------------------------------------------------------------------------
+# Micro-batching writer for trades and candles
+# -----------------------------------------------------------------------------
+# Buffers trades and candles and writes them with one Redis pipeline per flush
+# instead of 3 round-trips per trade and 5 per candle.
+class BatchedRedisWriter:
+    """
+    Buffer trades and candles and flush them to Redis in batches.
+
+    A flush is triggered when `max_items` are buffered or when the oldest
+    buffered item is older than `max_latency_ms`. Trades (LPUSH + LTRIM + SET
+    per key) and candles (one TS.MADD) go out in a single non-transactional
+    pipeline; the candles are written to the database of `ts_client` by
+    switching with SELECT inside the pipeline, so both clients must point to
+    the same server.
+
+    If Redis can't be reached the items are put back at the head of the
+    buffer and retried after `retry_delay_s`; when more than `max_buffered`
+    items are waiting, the oldest ones are dropped and counted. Flush size
+    and latency are kept in `self.metrics` and mirrored into the
+    `metrics:batch_writer` Redis hash.
+
+    Args:
+        redis_client: Redis connection used for the trade lists.
+        ts_client: RedisTimeSeries client used for the candles.
+        max_items (int): Flush once this many trades + candles are buffered.
+        max_latency_ms (float): Max time an item waits in the buffer.
+        max_trades (int): Max number of trades to keep per Redis list.
+        max_buffered (int): Max number of items kept while Redis is down.
+        retry_delay_s (float): Wait before retrying a failed flush.
+    """
+
+    METRICS_KEY = "metrics:batch_writer"
+
+    def __init__(self, redis_client=None, ts_client=None, max_items: int = 200,
+                 max_latency_ms: float = 5.0, max_trades: int = 5000,
+                 max_buffered: int = 10000, retry_delay_s: float = 1.0):
+        self.redis = redis_client if redis_client is not None else r
+        self.rts = ts_client if ts_client is not None else rts
+        self.max_items = max_items
+        self.max_latency = max_latency_ms / 1000.0
+        self.max_trades = max_trades
+        self.max_buffered = max_buffered
+        self.retry_delay = retry_delay_s
+        self._db = self.redis.connection_pool.connection_kwargs.get("db", 0)
+        self._ts_db = self.rts.redis.connection_pool.connection_kwargs.get("db", 0)
+        self._trades = []
+        self._candles = []
+        self._first_item_time = None
+        self._retry_at = 0.0
+        self._ts_keys_ready = set()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+        self.metrics = {
+            "flushes": 0,
+            "items_flushed": 0,
+            "errors": 0,
+            "requeued": 0,
+            "dropped": 0,
+            "last_flush_size": 0,
+            "last_flush_latency_ms": 0.0,
+            "max_flush_latency_ms": 0.0,
+        }
+
+    def _ensure_flusher(self):
+        # Start the timer thread lazily so that it is created in the Celery
+        # child process and not in the parent before the fork.
+        if self._flusher is None or not self._flusher.is_alive():
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._run, daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while not self._stop.wait(self.max_latency):
+            now = time.monotonic()
+            with self._lock:
+                expired = (
+                    self._first_item_time is not None
+                    and now - self._first_item_time >= self.max_latency
+                    and now >= self._retry_at
+                )
+            if expired:
+                self.flush()
+
+    def _buffer(self, buf: list, item):
+        with self._lock:
+            buf.append(item)
+            if self._first_item_time is None:
+                self._first_item_time = time.monotonic()
+            full = (
+                len(self._trades) + len(self._candles) >= self.max_items
+                and time.monotonic() >= self._retry_at
+            )
+        if full:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def add_trade(self, trade: dict, symbol: str = "BTCUSDT", platform: str = "binance"):
+        """
+        Buffer a cleaned trade; same arguments as `save_trade_to_cache`.
+        """
+        key = f"trades:{platform}:{symbol.lower()}"
+        self._buffer(self._trades, (key, json.dumps(trade)))
+
+    def add_candle(self, platform: str, symbol: str, resolution: str, candle: list):
+        """
+        Buffer a candle; same arguments as `save_candle_to_timeseries`.
+        """
+        self._buffer(self._candles, (platform, symbol, resolution, candle))
+
+    def flush(self) -> int:
+        """
+        Write every buffered trade and candle and return the number of items.
+        """
+        with self._lock:
+            trades, self._trades = self._trades, []
+            candles, self._candles = self._candles, []
+            self._first_item_time = None
+        n_items = len(trades) + len(candles)
+        if n_items == 0:
+            return 0
+        start = time.perf_counter()
+        try:
+            self._write(trades, candles)
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+            self.metrics["errors"] += 1
+            self._requeue(trades, candles)
+            logger.warning(f"[BatchedRedisWriter] Could not flush {n_items} items, will retry: {e}")
+            return 0
+        except Exception as e:
+            # Redis rejected a command; the rest of the pipeline was applied,
+            # so retrying would write those items twice.
+            self.metrics["errors"] += 1
+            self.metrics["dropped"] += n_items
+            logger.error(f"[BatchedRedisWriter] Dropped {n_items} items after a failed flush: {e}")
+            return 0
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.metrics["flushes"] += 1
+        self.metrics["items_flushed"] += n_items
+        self.metrics["last_flush_size"] = n_items
+        self.metrics["last_flush_latency_ms"] = latency_ms
+        self.metrics["max_flush_latency_ms"] = max(
+            self.metrics["max_flush_latency_ms"], latency_ms
+        )
+        self._write_metrics(n_items, latency_ms)
+        return n_items
+
+    def _requeue(self, trades: list, candles: list):
+        # Put the items back in front of what was buffered meanwhile, then
+        # drop the oldest trades (and candles) beyond `max_buffered`.
+        with self._lock:
+            self._trades = trades + self._trades
+            self._candles = candles + self._candles
+            overflow = len(self._trades) + len(self._candles) - self.max_buffered
+            n_trades = min(max(overflow, 0), len(self._trades))
+            n_candles = max(overflow - n_trades, 0)
+            del self._trades[:n_trades]
+            del self._candles[:n_candles]
+            self._first_item_time = time.monotonic()
+            self._retry_at = self._first_item_time + self.retry_delay
+        self.metrics["requeued"] += len(trades) + len(candles)
+        if n_trades or n_candles:
+            self.metrics["dropped"] += n_trades + n_candles
+            logger.error(f"[BatchedRedisWriter] Buffer full, dropped {n_trades} trades and {n_candles} candles")
+
+    def _write(self, trades: list, candles: list):
+        pipe = self.redis.pipeline(transaction=False)
+        if candles:
+            self._queue_candles(pipe, candles)
+        # Group by key so that each list gets a single LPUSH with all values,
+        # in arrival order (LPUSH of [t1, t2] leaves t2 at the head).
+        by_key = defaultdict(list)
+        for key, payload in trades:
+            by_key[key].append(payload)
+        for key, payloads in by_key.items():
+            pipe.lpush(key, *payloads)
+            pipe.ltrim(key, 0, self.max_trades - 1)
+            pipe.set(f"{key}:latest", payloads[-1])
+        # TS.CREATE fails on existing keys, which is expected.
+        for result in pipe.execute(raise_on_error=False):
+            if isinstance(result, Exception) and "already exists" not in str(result):
+                raise result
+        for platform, symbol, resolution, _ in candles:
+            self._ts_keys_ready.add(f"ts:{platform}:{symbol}:{resolution}")
+
+    def _queue_candles(self, pipe, candles: list):
+        ktv = []
+        new_keys = []
+        for platform, symbol, resolution, candle in candles:
+            base_key = f"ts:{platform}:{symbol}:{resolution}"
+            # TS.MADD does not create keys, so create them once per process.
+            if base_key not in self._ts_keys_ready and base_key not in new_keys:
+                new_keys.append(base_key)
+            timestamp = candle[0]
+            low, high, open_, close, volume = candle[1:]
+            for metric, value in zip(["open", "high", "low", "close", "volume"], [open_, high, low, close, volume]):
+                ktv += [f"{base_key}:{metric}", timestamp, value]
+        if self._ts_db != self._db:
+            pipe.execute_command("SELECT", self._ts_db)
+        for base_key in new_keys:
+            for metric in ["open", "high", "low", "close", "volume"]:
+                pipe.execute_command("TS.CREATE", f"{base_key}:{metric}", "DUPLICATE_POLICY", "last")
+        pipe.execute_command("TS.MADD", *ktv)
+        if self._ts_db != self._db:
+            pipe.execute_command("SELECT", self._db)
+
+    def _write_metrics(self, n_items: int, latency_ms: float):
+        # Written after the flush so that the latency covers the round-trip.
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hincrby(self.METRICS_KEY, "flushes", 1)
+            pipe.hincrby(self.METRICS_KEY, "items_flushed", n_items)
+            pipe.hset(self.METRICS_KEY, "last_flush_size", n_items)
+            pipe.hset(self.METRICS_KEY, "last_flush_latency_ms", round(latency_ms, 3))
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"[BatchedRedisWriter] Could not store metrics: {e}")
+
+    def close(self):
+        """
+        Stop the timer thread and flush what is left in the buffer.
+        """
+        self._stop.set()
+        self.flush()
+
+
+# ------------------------------------------------------------------------------
+# Streaming anomaly detector with state shared in Redis
+# -----------------------------------------------------------------------------
+# Rolling mean/variance are updated in O(1) per price with Welford's update
+# (add the new price, remove the one falling out of the window). The update
+# runs as a Lua script so that all Celery workers see the same state.
+_ROLLING_STATS_LUA = """
+-- KEYS[1]: state hash, KEYS[2..]: one window list per window size.
+-- ARGV[1]: JSON config {windows, alphas}, ARGV[2]: JSON list of prices.
+-- Returns a JSON list with, for each price, the stats *before* it is added.
+local cfg = cjson.decode(ARGV[1])
+local prices = cjson.decode(ARGV[2])
+local state = KEYS[1]
+local function getf(field)
+  return tonumber(redis.call('HGET', state, field) or '0')
+end
+local out = {}
+for _, x in ipairs(prices) do
+  local res = {windows = {}, ewma = {}}
+  for i, w in ipairs(cfg.windows) do
+    local p = 'w' .. w .. ':'
+    local n, mean, m2 = getf(p .. 'n'), getf(p .. 'mean'), getf(p .. 'm2')
+    local std = 0
+    if n > 0 then std = math.sqrt(math.max(m2, 0) / n) end
+    res.windows[i] = {n, mean, std}
+    local lst = KEYS[i + 1]
+    redis.call('LPUSH', lst, x)
+    if n < w then
+      n = n + 1
+      local d = x - mean
+      mean = mean + d / n
+      m2 = m2 + d * (x - mean)
+    else
+      local old = tonumber(redis.call('RPOP', lst))
+      local new_mean = mean + (x - old) / n
+      m2 = m2 + (x - old) * (x - new_mean + old - mean)
+      mean = new_mean
+    end
+    redis.call('HSET', state, p .. 'n', n, p .. 'mean', string.format('%.17g', mean),
+               p .. 'm2', string.format('%.17g', math.max(m2, 0)))
+  end
+  for i, a in ipairs(cfg.alphas) do
+    local p = 'e' .. a .. ':'
+    local n, mean, var = getf(p .. 'n'), getf(p .. 'mean'), getf(p .. 'var')
+    res.ewma[i] = {n, mean, math.sqrt(math.max(var, 0))}
+    if n == 0 then
+      mean, var = x, 0
+    else
+      local d = x - mean
+      local incr = a * d
+      mean = mean + incr
+      var = (1 - a) * (var + d * incr)
+    end
+    redis.call('HSET', state, p .. 'n', n + 1, p .. 'mean', string.format('%.17g', mean),
+               p .. 'var', string.format('%.17g', var))
+  end
+  out[#out + 1] = res
+end
+return cjson.encode(out)
+"""
+
+
+class StreamingAnomalyDetector:
+    """
+    Detect price anomalies against rolling and EWMA bands kept in Redis.
+
+    Each price is compared with the bands computed from the prices seen
+    before it, then added to the state with an O(1) update. The state lives
+    in Redis (`anomaly:state:{platform}` and one `anomaly:window:{platform}:{w}`
+    list per window), so every worker shares it and scaling out gives the
+    same answers as a single worker.
+
+    Args:
+        redis_client: Redis connection holding the shared state.
+        windows (tuple): Rolling window lengths; the first one is the primary
+            band used for the `anomaly` flag.
+        ewma_alphas (tuple): Smoothing factors of the EWMA bands.
+        threshold (float): Number of standard deviations defining a band.
+        min_periods (int): Number of prices needed before flagging anything.
+    """
+
+    def __init__(self, redis_client=None, windows=(500,), ewma_alphas=(0.05,),
+                 threshold: float = 2, min_periods: int = 30):
+        self.redis = redis_client if redis_client is not None else r
+        self.windows = [int(w) for w in windows]
+        self.ewma_alphas = [float(a) for a in ewma_alphas]
+        self.threshold = threshold
+        self.min_periods = min_periods
+        self._config = json.dumps({"windows": self.windows, "alphas": self.ewma_alphas})
+        self._script = self.redis.register_script(_ROLLING_STATS_LUA)
+
+    def _keys(self, platform: str) -> list:
+        keys = [f"anomaly:state:{platform}"]
+        keys += [f"anomaly:window:{platform}:{w}" for w in self.windows]
+        return keys
+
+    def _band(self, n, mean, std, price) -> dict:
+        ready = n >= self.min_periods
+        return {
+            "n": int(n),
+            "mean": mean,
+            "std": std,
+            "anomaly": ready and abs(price - mean) > self.threshold * std,
+        }
+
+    def update_batch(self, platform: str, prices: list) -> list:
+        """
+        Score and add a batch of prices with a single Redis round-trip.
+
+        Returns:
+            List of dicts (one per price) with the primary `mean`, `std` and
+            `anomaly` flag plus every rolling and EWMA band under `bands`.
+        """
+        if not prices:
+            return []
+        prices = [float(p) for p in prices]
+        raw = self._script(keys=self._keys(platform), args=[self._config, json.dumps(prices)])
+        results = []
+        for price, stats in zip(prices, json.loads(raw)):
+            bands = {}
+            # cjson encodes empty tables as objects, hence the `or []`.
+            for w, (n, mean, std) in zip(self.windows, stats["windows"] or []):
+                bands[f"rolling_{w}"] = self._band(n, mean, std, price)
+            for a, (n, mean, std) in zip(self.ewma_alphas, stats["ewma"] or []):
+                bands[f"ewma_{a}"] = self._band(n, mean, std, price)
+            primary = bands[f"rolling_{self.windows[0]}"]
+            result = {
+                "platform": platform,
+                "price": price,
+                "mean": primary["mean"],
+                "std": primary["std"],
+                "anomaly": primary["anomaly"],
+                "any_anomaly": any(b["anomaly"] for b in bands.values()),
+                "bands": bands,
+            }
+            if primary["n"] < self.min_periods:
+                result["note"] = "warming_up"
+            results.append(result)
+        return results
+
+    def update(self, platform: str, price: float) -> dict:
+        """
+        Score and add a single price.
+        """
+        return self.update_batch(platform, [price])[0]
+
+    def reset(self, platform: str):
+        """
+        Drop the shared state of a platform.
+        """
+        self.redis.delete(*self._keys(platform))
+
+
 # ------------------------------------------------------------------------------
 # Fetch Coinbase Candles for LSTM training/validate/test
 # -----------------------------------------------------------------------------
@@ -24,7 +24,7 @@ import json
 import falcon.asgi
 from falcon import WebSocketDisconnected
 from falcon.asgi import Request, WebSocket, Response
-from celery import chain
+from celery import chain, chord
 import redis 
 from redistimeseries.client import Client as RedisTS
 
@@ -34,6 +34,7 @@ from Falcon_Celery_Tasks import (
     process_trade_data,
     process_ticker_data,
     detect_anomaly,
+    detect_anomaly_batch,
     process_candle_data
 )
 from Falcon_functions import fetch_coinbase_candles
@@ -91,8 +92,10 @@ class IngestResource:
                 elif msg_type == "trade":
                     chain(process_trade_data.s(msg, platform), detect_anomaly.s()).apply_async()
                 elif "trades" in msg:
-                    for trade in msg["trades"]:
-                        chain(process_trade_data.s(trade, platform), detect_anomaly.s()).apply_async()
+                    # Score the whole batch at once once every trade is cleaned.
+                    chord(
+                        process_trade_data.s(trade, platform) for trade in msg["trades"]
+                    )(detect_anomaly_batch.s())
                 else:
                     print(f"[{platform}] Unknown message format: {msg}")
 
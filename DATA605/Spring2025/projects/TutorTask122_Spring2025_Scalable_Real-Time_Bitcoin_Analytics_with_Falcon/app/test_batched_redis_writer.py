@@ -0,0 +1,154 @@
+"""
+Tests for BatchedRedisWriter against fakeredis.
+
+Run from the app directory with `python -m pytest test_batched_redis_writer.py`.
+"""
+
+import json
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("redistimeseries.client")
+
+from redistimeseries.client import Client as RedisTS
+
+from Falcon_functions import BatchedRedisWriter
+
+TRADE_KEY = "trades:binance:btcusdt"
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def clients(server):
+    trades = fakeredis.FakeRedis(server=server, db=0)
+    candles = fakeredis.FakeRedis(server=server, db=1)
+    return trades, candles
+
+
+def make_writer(clients, **kwargs):
+    trades, candles = clients
+    return BatchedRedisWriter(redis_client=trades, ts_client=RedisTS(conn=candles), **kwargs)
+
+
+def trade(i):
+    return {"core": {"platform": "binance", "symbol": "BTCUSDT", "price": 100.0 + i}}
+
+
+def test_flushes_when_max_items_are_buffered(clients):
+    r, _ = clients
+    writer = make_writer(clients, max_items=3, max_latency_ms=60_000)
+    writer.add_trade(trade(0), symbol="BTCUSDT")
+    writer.add_trade(trade(1), symbol="BTCUSDT")
+    assert r.llen(TRADE_KEY) == 0
+
+    writer.add_trade(trade(2), symbol="BTCUSDT")
+    # One LPUSH in arrival order, so the newest trade is at the head.
+    prices = [json.loads(x)["core"]["price"] for x in r.lrange(TRADE_KEY, 0, -1)]
+    assert prices == [102.0, 101.0, 100.0]
+    assert json.loads(r.get(f"{TRADE_KEY}:latest"))["core"]["price"] == 102.0
+    assert writer.metrics["flushes"] == 1
+    assert writer.metrics["last_flush_size"] == 3
+    assert r.hget(BatchedRedisWriter.METRICS_KEY, "items_flushed") == b"3"
+    writer.close()
+
+
+def test_flushes_after_max_latency(clients):
+    r, _ = clients
+    writer = make_writer(clients, max_items=1000, max_latency_ms=20)
+    writer.add_trade(trade(0), symbol="BTCUSDT")
+    deadline = time.monotonic() + 2
+    while r.llen(TRADE_KEY) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert r.llen(TRADE_KEY) == 1
+    writer.close()
+
+
+def test_trims_trade_lists(clients):
+    r, _ = clients
+    writer = make_writer(clients, max_items=10, max_trades=4, max_latency_ms=60_000)
+    for i in range(10):
+        writer.add_trade(trade(i), symbol="BTCUSDT")
+    assert r.llen(TRADE_KEY) == 4
+    writer.close()
+
+
+def test_failed_flush_is_requeued_and_retried(server, clients):
+    r, _ = clients
+    writer = make_writer(clients, max_items=1000, max_latency_ms=60_000)
+    writer.add_trade(trade(0), symbol="BTCUSDT")
+    server.connected = False
+    assert writer.flush() == 0
+    writer.add_trade(trade(1), symbol="BTCUSDT")
+    assert writer.metrics["requeued"] == 1
+
+    server.connected = True
+    assert writer.flush() == 2
+    prices = [json.loads(x)["core"]["price"] for x in r.lrange(TRADE_KEY, 0, -1)]
+    assert prices == [101.0, 100.0]
+    writer.close()
+
+
+def test_requeue_drops_oldest_beyond_max_buffered(server, clients):
+    r, _ = clients
+    writer = make_writer(clients, max_items=1000, max_buffered=2, max_latency_ms=60_000)
+    for i in range(3):
+        writer.add_trade(trade(i), symbol="BTCUSDT")
+    server.connected = False
+    writer.flush()
+    assert writer.metrics["dropped"] == 1
+
+    server.connected = True
+    writer.flush()
+    prices = [json.loads(x)["core"]["price"] for x in r.lrange(TRADE_KEY, 0, -1)]
+    assert prices == [102.0, 101.0]
+    writer.close()
+
+
+def test_candles_and_trades_share_one_pipeline(clients):
+    r, ts = clients
+    try:
+        ts.execute_command("TS.INFO", "missing")
+    except Exception as e:
+        if "unknown command" in str(e).lower():
+            pytest.skip("fakeredis without RedisTimeSeries commands")
+    writer = make_writer(clients, max_items=1000, max_latency_ms=60_000)
+    calls = []
+    pipeline = r.pipeline
+    r.pipeline = lambda *args, **kwargs: calls.append(1) or pipeline(*args, **kwargs)
+
+    writer.add_trade(trade(0), symbol="BTCUSDT")
+    writer.add_candle("coinbase", "btc_usd", "1m", [60_000, 1.0, 4.0, 2.0, 3.0, 10.0])
+    writer.add_candle("coinbase", "btc_usd", "1m", [120_000, 2.0, 5.0, 3.0, 4.0, 11.0])
+    assert writer.flush() == 3
+
+    # Data and metrics pipelines only.
+    assert len(calls) == 2
+    assert r.llen(TRADE_KEY) == 1
+    closes = ts.execute_command("TS.RANGE", "ts:coinbase:btc_usd:1m:close", "-", "+")
+    assert [[int(t), float(v)] for t, v in closes] == [[60_000, 3.0], [120_000, 4.0]]
+    # The connection is back on the trade database.
+    assert r.exists(TRADE_KEY)
+    writer.close()
+
+
+def test_process_trade_data_uses_core_symbol(monkeypatch, clients):
+    pytest.importorskip("celery")
+    import Falcon_Celery_Tasks
+
+    r, _ = clients
+    writer = make_writer(clients, max_items=1000, max_latency_ms=60_000)
+    monkeypatch.setattr(Falcon_Celery_Tasks, "batch_writer", writer)
+    monkeypatch.setattr(Falcon_Celery_Tasks, "current_message_count", 0)
+    raw = {"s": "BTCUSDT", "p": "65000.5", "q": "0.1", "T": 1700000000000, "t": 42}
+
+    core = Falcon_Celery_Tasks.process_trade_data(raw, "binance")
+    assert core["symbol"] == "BTCUSDT"
+    writer.flush()
+    assert json.loads(r.get(f"{TRADE_KEY}:latest"))["core"]["trade_id"] == 42
+    writer.close()
@@ -1,8 +1,12 @@
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import time
 import json
 import logging
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List, Union, Tuple
 from dotenv import load_dotenv
@@ -21,43 +25,146 @@ class BitcoinNodeConnector:
     Focuses only on core block and transaction data needed for knowledge graph.
     """
     
-    def __init__(self, token: str = BTC_PUBLIC_TOKEN, rate_limit_delay: float = 2.0):
-        """Initialize the Bitcoin node connector with auth token"""
-        self.base_url = f"https://bitcoin-rpc.publicnode.com/{token}"
+    def __init__(self, 
+                 token: str = BTC_PUBLIC_TOKEN, 
+                 rate_limit_delay: float = 2.0,
+                 base_url: Optional[str] = None,
+                 max_workers: int = 4,
+                 batch_size: int = 50,
+                 min_delay: float = 0.0,
+                 max_delay: float = 30.0,
+                 max_retries: int = 3):
+        """
+        Initialize the Bitcoin node connector with auth token.
+        
+        `rate_limit_delay` is the initial delay between requests. It shrinks
+        towards `min_delay` while the node answers normally and backs off
+        towards `max_delay` when it answers 429/5xx. Pass `base_url` to talk
+        to another endpoint, e.g. a local fake RPC server.
+        """
+        self.base_url = base_url or f"https://bitcoin-rpc.publicnode.com/{token}"
         self.request_id = 0
         self.rate_limit_delay = rate_limit_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        
+        # Pooled keep-alive connections shared by all worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        
+        self._lock = threading.Lock()
+        self._next_request_at = 0.0
+        
+        # Cached height -> block time index used to locate blocks by timestamp,
+        # with the indexed heights and their times kept sorted by height
+        self._block_times: Dict[int, int] = {}
+        self._indexed_heights: List[int] = []
+        self._indexed_times: List[int] = []
+        self._tip_height = None
+        self._tip_checked_at = 0.0
+    
+    def _next_id(self) -> str:
+        with self._lock:
+            self.request_id += 1
+            return str(self.request_id)
+    
+    def _wait_for_slot(self) -> None:
+        """Space requests out by the current adaptive delay."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.rate_limit_delay
+        if wait > 0:
+            time.sleep(wait)
+    
+    def _adapt_delay(self, throttled: bool, retry_after: Optional[float] = None) -> None:
+        """Back off on throttling, speed up again after successful requests."""
+        with self._lock:
+            if throttled:
+                self.rate_limit_delay = min(self.max_delay, max(self.rate_limit_delay * 2, retry_after or 0.5))
+                self._next_request_at = time.monotonic() + self.rate_limit_delay
+            else:
+                self.rate_limit_delay = max(self.min_delay, self.rate_limit_delay * 0.8)
+    
+    def _post(self, payload: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Any:
+        """POST a JSON-RPC payload, retrying with backoff when throttled."""
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot()
+            response = self.session.post(self.base_url, data=json.dumps(payload))
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = response.headers.get("Retry-After")
+                self._adapt_delay(True, float(retry_after) if retry_after and retry_after.isdigit() else None)
+                logger.warning(f"HTTP {response.status_code}, backing off to {self.rate_limit_delay:.2f}s (attempt {attempt + 1})")
+                continue
+            if response.status_code != 200:
+                logger.error(f"HTTP Error: {response.status_code}, {response.text}")
+                return None
+            self._adapt_delay(False)
+            return response.json()
+        logger.error(f"Giving up after {self.max_retries + 1} attempts")
+        return None
     
     def call_method(self, method: str, params: Optional[List[Any]] = None) -> Dict[str, Any]:
         """Make an RPC call to the Bitcoin node"""
-        self.request_id += 1
-        
         payload = {
             "jsonrpc": "1.0",
-            "id": str(self.request_id),
+            "id": self._next_id(),
             "method": method,
             "params": params or []
         }
         
-        headers = {"Content-Type": "application/json"}
-        
         try:
             logger.info(f"Making RPC call: {method}")
-            response = requests.post(self.base_url, json=payload, headers=headers)
-            time.sleep(self.rate_limit_delay)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "error" in result and result["error"]:
-                    logger.error(f"RPC Error: {result['error']}")
-                    return None
-                return result["result"]
-            else:
-                logger.error(f"HTTP Error: {response.status_code}, {response.text}")
+            result = self._post(payload)
+            if result is None:
+                return None
+            if "error" in result and result["error"]:
+                logger.error(f"RPC Error: {result['error']}")
                 return None
+            return result["result"]
         except Exception as e:
             logger.error(f"Request error: {e}")
             return None
     
+    def call_batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """
+        Make several RPC calls using JSON-RPC batch requests.
+        
+        Calls are sent in chunks of `batch_size`. Results are returned in the
+        order of `calls`, with None for calls that failed.
+        """
+        results = []
+        for start in range(0, len(calls), self.batch_size):
+            chunk = calls[start:start + self.batch_size]
+            payload = [
+                {"jsonrpc": "1.0", "id": self._next_id(), "method": method, "params": params or []}
+                for method, params in chunk
+            ]
+            try:
+                logger.info(f"Making batched RPC call: {len(payload)} x {chunk[0][0]}")
+                response = self._post(payload)
+            except Exception as e:
+                logger.error(f"Request error: {e}")
+                response = None
+            if not isinstance(response, list):
+                results.extend([None] * len(chunk))
+                continue
+            by_id = {item.get("id"): item for item in response}
+            for request in payload:
+                item = by_id.get(request["id"])
+                if item is None or item.get("error"):
+                    if item is not None:
+                        logger.error(f"RPC Error: {item['error']}")
+                    results.append(None)
+                else:
+                    results.append(item.get("result"))
+        return results
 
     def get_blockchain_info(self) -> Dict[str, Any]:
         """Get general information about the blockchain state"""
@@ -76,6 +183,24 @@ class BitcoinNodeConnector:
         """Get block data by hash with specified verbosity level"""
         return self.call_method("getblock", [block_hash, verbosity])
     
+    def get_block_hashes(self, heights: List[int]) -> List[str]:
+        """Get block hashes for several heights with batched RPC calls"""
+        return self.call_batch([("getblockhash", [height]) for height in heights])
+    
+    def get_blocks_by_height(self, heights: List[int], verbosity: int = 2) -> List[Dict[str, Any]]:
+        """
+        Get blocks for several heights. Hashes are resolved in batches and the
+        blocks themselves are fetched concurrently, since full blocks are too
+        large to batch. The result follows the order of `heights`.
+        """
+        hashes = self.get_block_hashes(heights)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            blocks = list(executor.map(
+                lambda block_hash: self.get_block(block_hash, verbosity) if block_hash else None,
+                hashes
+            ))
+        return [block for block in blocks if block]
+    
     def get_block_by_height(self, height: int, verbosity: int = 2) -> Dict[str, Any]:
         """Get block data by height"""
         block_hash = self.get_block_hash(height)
@@ -125,14 +250,9 @@ class BitcoinNodeConnector:
             return []
         
         current_height = blockchain_info["blocks"]
-        blocks = []
-        
-        for height in range(current_height, current_height - count, -1):
-            block = self.get_block_by_height(height)
-            if block:
-                blocks.append(self.extract_block_data(block))
+        heights = list(range(current_height, current_height - count, -1))
         
-        return blocks
+        return [self.extract_block_data(block) for block in self.get_blocks_by_height(heights)]
     
     def get_transactions_for_block(self, block_hash: str) -> List[Dict[str, Any]]:
         """Get all transactions in a block"""
@@ -239,10 +359,11 @@ class BitcoinNodeConnector:
             logger.error("Could not determine start block height")
             return []
         
-        sampled_blocks = []
+        sample_heights = []
         current_timestamp = start_timestamp
         
-        # Sample blocks for each day in the period
+        # Choose the sampled heights for each day in the period. Each lookup
+        # starts from the cached index, so consecutive days need few RPC calls.
         for day in range(int(days_in_period)):
             day_start = current_timestamp
             day_end = current_timestamp + (24 * 60 * 60) - 1  # End of the day
@@ -268,78 +389,108 @@ class BitcoinNodeConnector:
             
             logger.info(f"Day {day+1}: Sampling {sample_count} blocks from height range {day_start_height}-{day_end_height}")
             
-            # Sample blocks for this day
-            day_blocks = []
             for i in range(sample_count):
                 # Calculate target height, distributing evenly across the day's range
-                if sample_count == 1:
-                    height = day_start_height
-                else:
-                    height = day_start_height + (i * step_size)
-                
+                height = day_start_height + (i * step_size)
                 # Ensure we don't exceed the day's end height
-                height = min(height, day_end_height)
-                
-                # Get block hash and data
-                block_hash = self.get_block_hash(height)
-                if not block_hash:
-                    continue
-                    
-                block = self.get_block(block_hash, 2)  # Full verbosity for detailed data
-                if block:
-                    day_blocks.append(self.extract_block_data(block))
-            
-            # Add this day's blocks to the overall sample
-            sampled_blocks.extend(day_blocks)
+                sample_heights.append(min(height, day_end_height))
             
             # Move to the next day
             current_timestamp += 24 * 60 * 60
         
+        # Fetch all sampled blocks concurrently, keeping chronological order
+        sampled_blocks = [
+            self.extract_block_data(block)
+            for block in self.get_blocks_by_height(sample_heights, 2)  # Full verbosity for detailed data
+        ]
+        
         logger.info(f"Sampled a total of {len(sampled_blocks)} blocks")
         return sampled_blocks
 
-    def _find_block_height_by_timestamp(self, target_timestamp):
+    def _get_tip_height(self, max_age: float = 60.0) -> Optional[int]:
+        """Get the chain tip height, cached for `max_age` seconds"""
+        if self._tip_height is None or time.monotonic() - self._tip_checked_at > max_age:
+            chain_info = self.get_blockchain_info()
+            if not chain_info:
+                return self._tip_height
+            self._tip_height = chain_info["blocks"]
+            self._tip_checked_at = time.monotonic()
+        return self._tip_height
+    
+    def _index_block_times(self, heights: List[int]) -> None:
+        """Add block times for `heights` to the index with one batch of hash and one batch of header calls"""
+        heights = sorted(set(h for h in heights if h not in self._block_times))
+        if not heights:
+            return
+        hashes = self.get_block_hashes(heights)
+        found = [(h, block_hash) for h, block_hash in zip(heights, hashes) if block_hash]
+        headers = self.call_batch([("getblockheader", [block_hash]) for _, block_hash in found])
+        for (height, _), header in zip(found, headers):
+            if header and "time" in header:
+                self._block_times[height] = header["time"]
+                position = bisect_right(self._indexed_heights, height)
+                self._indexed_heights.insert(position, height)
+                self._indexed_times.insert(position, header["time"])
+    
+    def _find_block_height_by_timestamp(self, target_timestamp, probes: int = 5, max_rounds: int = 20):
         """
-        Binary search to find a block height closest to the target timestamp.
+        Find the block height closest to the target timestamp.
+        
+        The search is bracketed by the closest heights already in the cached
+        height -> time index and refined by interpolation. Each round fetches
+        a few probe heights around the estimate in one batched request.
         """
-        chain_info = self.get_blockchain_info()
-        if not chain_info:
+        tip = self._get_tip_height()
+        if tip is None:
             return None
+        
+        for _ in range(max_rounds):
+            # Tightest bracket from the index: heights around the target time.
+            # Block times are only roughly increasing, but bisect still returns
+            # neighbours with time <= target < next time.
+            lo, hi = 0, tip
+            lo_time, hi_time = None, None
+            position = bisect_right(self._indexed_times, target_timestamp)
+            if position > 0:
+                lo, lo_time = self._indexed_heights[position - 1], self._indexed_times[position - 1]
+            if position < len(self._indexed_heights):
+                hi, hi_time = self._indexed_heights[position], self._indexed_times[position]
             
-        max_height = chain_info["blocks"]
-        min_height = 0
-        best_height = None
-        best_diff = float('inf')
-        
-        # Binary search with a limit on iterations
-        for _ in range(20):  # Limit to prevent too many API calls
-            if min_height > max_height:
-                break
-                
-            mid_height = (min_height + max_height) // 2
-            block_hash = self.get_block_hash(mid_height)
-            if not block_hash:
-                break
-                
-            block = self.get_block(block_hash, 1)  # Verbosity 1 for efficiency
-            if not block or "time" not in block:
+            if hi - lo <= 1 or lo_time == target_timestamp:
                 break
-                
-            block_time = block["time"]
-            diff = abs(block_time - target_timestamp)
-            
-            # Update best match
-            if diff < best_diff:
-                best_diff = diff
-                best_height = mid_height
             
-            # Adjust search range
-            if block_time < target_timestamp:
-                min_height = mid_height + 1
+            # Interpolate inside the bracket (assume ~10 minute blocks if one side is unknown)
+            if lo_time is not None and hi_time is not None and hi_time > lo_time:
+                estimate = lo + (target_timestamp - lo_time) * (hi - lo) / (hi_time - lo_time)
+            elif lo_time is not None:
+                estimate = lo + (target_timestamp - lo_time) / 600
+            elif hi_time is not None:
+                estimate = hi - (hi_time - target_timestamp) / 600
             else:
-                max_height = mid_height - 1
+                estimate = (lo + hi) / 2
+            estimate = int(min(max(estimate, lo), hi))
+            
+            spread = max(1, (hi - lo) // (probes * 4))
+            candidates = {
+                min(max(estimate + k * spread, lo), hi)
+                for k in range(-(probes // 2), probes // 2 + 1)
+            }
+            if lo_time is None:
+                candidates.add(lo)
+            if hi_time is None:
+                candidates.add(hi)
+            candidates -= set(self._block_times)
+            if not candidates:
+                break
+            self._index_block_times(list(candidates))
         
-        return best_height
+        # Pick the closer of the two indexed heights around the target
+        position = bisect_right(self._indexed_times, target_timestamp)
+        neighbours = [
+            (abs(self._indexed_times[i] - target_timestamp), self._indexed_heights[i])
+            for i in (position - 1, position) if 0 <= i < len(self._indexed_heights)
+        ]
+        return min(neighbours)[1] if neighbours else None
 
     def select_interesting_transactions(self, block, max_transactions=15):
         """
@@ -0,0 +1,175 @@
+"""
+Tests for BitcoinNodeConnector against a fake JSON-RPC node.
+
+Run from the project directory with `python -m pytest connectors/test`.
+"""
+
+import json
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from connectors.bitcoinrpc import BitcoinNodeConnector
+
+GENESIS_TIME = 1_700_000_000
+
+
+class FakeBitcoinNode:
+    """
+    Minimal JSON-RPC node serving a synthetic chain, with single and batch
+    requests. Block times increase by 1 to 20 minutes per block, plus up to
+    `jitter` seconds of noise, so with jitter they can go backwards like
+    real block timestamps.
+    """
+
+    def __init__(self, n_blocks=5000, seed=0, jitter=0):
+        rng = random.Random(seed)
+        self.times = [GENESIS_TIME]
+        for _ in range(n_blocks - 1):
+            self.times.append(self.times[-1] + rng.randint(60, 1200))
+        self.times = [t + rng.randint(-jitter, jitter) for t in self.times]
+        self.posts = 0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def tip(self):
+        return len(self.times) - 1
+
+    def closest_height(self, timestamp):
+        return min(range(len(self.times)), key=lambda h: (abs(self.times[h] - timestamp), h))
+
+    def handle(self, request):
+        method, params = request["method"], request.get("params", [])
+        with self._lock:
+            self.calls[method] += 1
+        result, error = None, None
+        if method == "getblockchaininfo":
+            result = {"blocks": self.tip()}
+        elif method == "getblockhash":
+            height = params[0]
+            if 0 <= height <= self.tip():
+                result = f"hash{height}"
+            else:
+                error = {"code": -8, "message": "Block height out of range"}
+        elif method in ("getblockheader", "getblock"):
+            height = int(params[0][len("hash"):])
+            result = {"hash": params[0], "height": height, "time": self.times[height]}
+            if method == "getblock":
+                result["tx"] = [{"txid": f"tx{height}", "vin": [], "vout": []}]
+                result["nTx"] = 1
+        else:
+            error = {"code": -32601, "message": "Method not found"}
+        return {"result": result, "error": error, "id": request["id"]}
+
+    def __enter__(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with node._lock:
+                    node.posts += 1
+                if isinstance(payload, list):
+                    body = [node.handle(request) for request in payload]
+                else:
+                    body = node.handle(payload)
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def node():
+    with FakeBitcoinNode() as fake_node:
+        yield fake_node
+
+
+@pytest.fixture
+def connector(node):
+    return BitcoinNodeConnector(base_url=node.url, rate_limit_delay=0.0, batch_size=50)
+
+
+def test_call_batch_keeps_order_and_marks_errors(node, connector):
+    heights = [3, 1, node.tip() + 10, 2]
+    assert connector.get_block_hashes(heights) == ["hash3", "hash1", None, "hash2"]
+    assert node.posts == 1
+
+
+def test_block_hashes_are_fetched_in_batches(node, connector):
+    hashes = connector.get_block_hashes(list(range(120)))
+    assert hashes == [f"hash{h}" for h in range(120)]
+    # 120 calls in batches of 50.
+    assert node.posts == 3
+    assert node.calls["getblockhash"] == 120
+
+
+@pytest.mark.parametrize("offset", [0, 1, 299, 300, 7200])
+def test_find_block_height_by_timestamp(node, connector, offset):
+    rng = random.Random(offset)
+    for height in rng.sample(range(node.tip()), 10):
+        target = node.times[height] + offset
+        assert connector._find_block_height_by_timestamp(target) == node.closest_height(target)
+
+
+def test_find_block_height_outside_the_chain(node, connector):
+    assert connector._find_block_height_by_timestamp(GENESIS_TIME - 10_000) == 0
+    assert connector._find_block_height_by_timestamp(node.times[-1] + 10_000) == node.tip()
+
+
+def test_lookups_reuse_the_block_time_index(node, connector):
+    target = node.times[2500] + 100
+    connector._find_block_height_by_timestamp(target)
+    first_posts = node.posts
+    # A handful of batched rounds instead of a binary search of single calls.
+    assert first_posts <= 2 * 10 + 1
+
+    connector._find_block_height_by_timestamp(target)
+    assert node.posts == first_posts
+    # The index stays sorted by height, with the matching times.
+    assert connector._indexed_heights == sorted(connector._block_times)
+    assert connector._indexed_times == [connector._block_times[h] for h in connector._indexed_heights]
+
+
+def test_find_block_height_with_non_monotonic_times():
+    with FakeBitcoinNode(jitter=900) as node:
+        connector = BitcoinNodeConnector(base_url=node.url, rate_limit_delay=0.0)
+        rng = random.Random(1)
+        for height in rng.sample(range(node.tip()), 10):
+            target = node.times[height]
+            found = connector._find_block_height_by_timestamp(target)
+            # Within a block interval plus the noise of the target.
+            assert abs(node.times[found] - target) <= 1200 + 2 * 900
+        assert any(later < earlier for earlier, later in zip(node.times, node.times[1:]))
+
+
+def test_backfill_samples_blocks_per_day(node, connector):
+    day = 24 * 60 * 60
+    start = datetime.fromtimestamp(node.times[1000] // day * day + day, tz=timezone.utc)
+    end = datetime.fromtimestamp(start.timestamp() + day, tz=timezone.utc)
+    blocks = connector.backfill_btc_blocks(start_date=start, end_date=end, blocks_per_day=4)
+
+    assert len(blocks) == 8
+    heights = [block["height"] for block in blocks]
+    assert heights == sorted(heights)
+    for block in blocks:
+        assert start.timestamp() - 1200 <= block["time"] <= end.timestamp() + day + 1200
+    assert node.calls["getblock"] == 8
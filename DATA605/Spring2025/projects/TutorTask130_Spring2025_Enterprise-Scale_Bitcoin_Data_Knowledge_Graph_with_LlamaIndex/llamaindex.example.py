@@ -15,6 +15,7 @@ from llamaindex_utils import (
     get_economic_indicators)
 from datetime import timedelta, datetime
 from utils.triplets import TripletGenerator
+from utils.graph_writer import Neo4jBulkWriter, EmbeddingCache
 from dotenv import load_dotenv
 import os
 from llama_index.llms.openai import OpenAI
@@ -56,7 +57,9 @@ for logger_name in ['httpx', 'openai', 'llama_index', 'urllib3']:
 load_dotenv("devops/env/default.env")
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
+embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2",
+                                   embed_batch_size=256)
+embedding_cache = EmbeddingCache(embed_model, path="embedding_cache.sqlite", batch_size=2048)
 llm = OpenAI(model="gpt-4.1-mini", 
              temperature=0,
              api_key=OPENAI_API_KEY)
@@ -97,29 +100,40 @@ async def ingest_data(td: timedelta):
     logger.info("Data Ingestion complete...")
 
 # Build Graph Structure with Triplets and batch embed them
-async def generate_and_embed_triplets():
+def embed_triplets(nodes, text_nodes):
     """
-    Generate and embed triplets
+    Embed nodes and text nodes in large batches, reusing cached embeddings
     """
-    blocks_data = get_raw_block_data()
-    economic_data = get_onchain_metrics()
-    onchain_data = get_economic_indicators()
-
-    triplet_generator = TripletGenerator()
-    nodes, relations, text_nodes = triplet_generator.load_and_process_data(blocks_data, economic_data, onchain_data)
-    
-    # Embed nodes
     node_texts = []
     for node in nodes:
         node_texts.append("\n".join([f"{key}: {node.properties[key]}" for key in node.properties.keys()]))
     
-    node_embeddings = embed_model.get_text_embedding_batch(node_texts)
-    text_embeddings = embed_model.get_text_embedding_batch([text_node.text for text_node in text_nodes])
+    node_embeddings = embedding_cache.embed(node_texts)
+    text_embeddings = embedding_cache.embed([text_node.text for text_node in text_nodes])
     
     for node, embedding in zip(nodes, node_embeddings):
         node.embedding = embedding
     for text_node, embedding in zip(text_nodes, text_embeddings):
         text_node.embedding = embedding
+
+async def generate_and_embed_triplets(graph_store=None):
+    """
+    Generate and embed triplets
+    
+    If a graph store is given, only nodes, relations and text nodes that are
+    not in the graph yet are kept (and embedded).
+    """
+    blocks_data = get_raw_block_data()
+    economic_data = get_onchain_metrics()
+    onchain_data = get_economic_indicators()
+
+    triplet_generator = TripletGenerator()
+    nodes, relations, text_nodes = triplet_generator.load_and_process_data(blocks_data, economic_data, onchain_data)
+    
+    if graph_store is not None:
+        nodes, relations, text_nodes = Neo4jBulkWriter(graph_store).filter_new(nodes, relations, text_nodes)
+    
+    embed_triplets(nodes, text_nodes)
     
     logger.info(f"Generated and embedded {len(nodes)} nodes, {len(relations)} relations")
     
@@ -135,9 +149,9 @@ async def build_knowledge_graph(nodes=None, relations=None, text_nodes=None):
     graph_store = get_neo4j_graph_store()
     
     if nodes and live:
-        graph_store.upsert_nodes(nodes)
-        graph_store.upsert_relations(relations)
-        graph_store.upsert_llama_nodes(text_nodes)
+        # Batched UNWIND/MERGE writes per label and relationship type
+        writer = Neo4jBulkWriter(graph_store, node_batch_size=5000, relation_batch_size=10000, max_workers=4)
+        writer.write(nodes, relations, text_nodes)
     
     kg_index = PropertyGraphIndex.from_existing(
         property_graph_store=graph_store,
@@ -182,7 +196,9 @@ async def update_knowledge_graph():
     start_time = time.time()
     try:
         await ingest_data(timedelta(days=1))  # Get last day's data
-        nodes, relations, text_nodes = await generate_and_embed_triplets()
+        # Only write blocks and dates that are not in the graph yet
+        graph_store = kg_index.property_graph_store if kg_index else get_neo4j_graph_store()
+        nodes, relations, text_nodes = await generate_and_embed_triplets(graph_store)
         await build_knowledge_graph(nodes, relations, text_nodes)
         last_update_time = datetime.now()
         LAST_UPDATE.set(last_update_time.timestamp())
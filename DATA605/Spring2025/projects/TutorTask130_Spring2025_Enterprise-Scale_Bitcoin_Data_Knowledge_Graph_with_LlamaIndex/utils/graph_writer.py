@@ -0,0 +1,298 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Set
+
+import numpy as np
+from llama_index.core.graph_stores.types import EntityNode, Relation
+from llama_index.core.schema import TextNode, MetadataMode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+
+logger = logging.getLogger(__name__)
+
+# Labels used by Neo4jPropertyGraphStore, so that retrievers see bulk-written data
+BASE_NODE_LABEL = "__Node__"
+BASE_ENTITY_LABEL = "__Entity__"
+
+
+def _quote(name: str) -> str:
+    """Quote a label or relationship type for use in Cypher"""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def _clean(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop None values, which Neo4j cannot store as properties"""
+    return {k: v for k, v in properties.items() if v is not None}
+
+
+def _chunks(rows: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class Neo4jBulkWriter:
+    """
+    Writes TripletGenerator output to Neo4j with batched `UNWIND $rows MERGE ...`
+    statements, one statement per node label and relationship type. Node batches
+    run in parallel sessions; relationship batches lock both endpoints, so they
+    run with `relation_workers` sessions (one by default) to avoid deadlocks.
+
+    The graph layout matches Neo4jPropertyGraphStore (`__Node__`/`__Entity__`
+    labels, `Chunk` text nodes, `embedding` vector property), so the
+    PropertyGraphIndex built on the same store can query the written data.
+    """
+
+    def __init__(self,
+                 graph_store,
+                 database: Optional[str] = None,
+                 node_batch_size: int = 5000,
+                 relation_batch_size: int = 10000,
+                 max_workers: int = 4,
+                 relation_workers: int = 1):
+        self.driver = graph_store.client
+        # Write to the database the store (and the index built on it) reads from
+        self.database = database or getattr(graph_store, "_database", None) or "neo4j"
+        self.node_batch_size = node_batch_size
+        self.relation_batch_size = relation_batch_size
+        self.max_workers = max_workers
+        self.relation_workers = relation_workers
+
+    def _run_batches(self,
+                     statements: List[Tuple[str, List[Dict[str, Any]]]],
+                     max_workers: Optional[int] = None) -> None:
+        """Run (query, rows) pairs in parallel write transactions"""
+        def run(statement):
+            query, rows = statement
+            with self.driver.session(database=self.database) as session:
+                session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            # list() re-raises the first failure
+            list(executor.map(run, statements))
+
+    def existing_properties(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the stored properties (without embeddings) of the `ids` that exist in the graph"""
+        found = {}
+        with self.driver.session(database=self.database) as session:
+            for batch in _chunks(list(ids), self.relation_batch_size):
+                result = session.run(
+                    f"""
+                    UNWIND $ids AS id
+                    MATCH (n:{BASE_NODE_LABEL} {{id: id}})
+                    RETURN n.id AS id, [key IN keys(n) WHERE key <> 'embedding' | [key, n[key]]] AS properties
+                    """,
+                    ids=batch
+                )
+                found.update((record["id"], dict(record["properties"])) for record in result)
+        return found
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        """Return the subset of `ids` that already exist in the graph"""
+        return set(self.existing_properties(ids))
+
+    @staticmethod
+    def _changed(stored: Optional[Dict[str, Any]], expected: Dict[str, Any]) -> bool:
+        """Whether a node is missing or differs from the properties it would be written with"""
+        if stored is None:
+            return True
+        for key, value in expected.items():
+            if isinstance(value, tuple):
+                value = list(value)
+            if stored.get(key) != value:
+                return True
+        return False
+
+    def filter_new(self,
+                   nodes: List[EntityNode],
+                   relations: List[Relation],
+                   text_nodes: List[TextNode]) -> Tuple[List[EntityNode], List[Relation], List[TextNode]]:
+        """
+        Keep only what is not in the graph yet or changed, so updates write new blocks and dates
+        and the nodes whose properties (e.g. a date's metrics) were revised.
+
+        Nodes and text nodes are kept if their id is unknown or a property differs from the stored
+        one; relations are kept if one of their endpoints is kept (relations between unchanged
+        nodes were written with them).
+        """
+        existing = self.existing_properties([node.id for node in nodes] + [text_node.id_ for text_node in text_nodes])
+        new_nodes = [
+            node for node in nodes
+            if self._changed(existing.get(node.id), {**_clean(node.properties), "name": node.name})
+        ]
+        new_text_nodes = [
+            text_node for text_node in text_nodes
+            if self._changed(existing.get(text_node.id_), {
+                **_clean(node_to_metadata_dict(text_node, remove_text=True)),
+                "text": text_node.get_content(metadata_mode=MetadataMode.NONE),
+            })
+        ]
+        new_ids = {node.id for node in new_nodes} | {text_node.id_ for text_node in new_text_nodes}
+        new_relations = [
+            relation for relation in relations
+            if relation.source_id in new_ids or relation.target_id in new_ids
+        ]
+        n_changed = sum(node.id in existing for node in new_nodes) + sum(text_node.id_ in existing for text_node in new_text_nodes)
+        logger.info(
+            f"Incremental update: {len(new_nodes)}/{len(nodes)} nodes, "
+            f"{len(new_relations)}/{len(relations)} relations, "
+            f"{len(new_text_nodes)}/{len(text_nodes)} text nodes are new or changed "
+            f"({n_changed} changed)"
+        )
+        return new_nodes, new_relations, new_text_nodes
+
+    def write_nodes(self, nodes: List[EntityNode]) -> None:
+        """MERGE entity nodes, one statement per label combination"""
+        rows_by_label = defaultdict(list)
+        for node in nodes:
+            rows_by_label[node.label].append({
+                "id": node.id,
+                "name": node.name,
+                "properties": _clean(node.properties),
+                "embedding": node.embedding,
+            })
+
+        statements = []
+        for label, rows in rows_by_label.items():
+            labels = "".join(f":{_quote(part)}" for part in label.split(":") if part)
+            query = f"""
+                UNWIND $rows AS row
+                MERGE (e:{BASE_NODE_LABEL} {{id: row.id}})
+                SET e += row.properties, e.name = row.name, e:{BASE_ENTITY_LABEL}{labels}
+                WITH e, row WHERE row.embedding IS NOT NULL
+                CALL db.create.setNodeVectorProperty(e, 'embedding', row.embedding)
+                RETURN count(*)
+            """
+            statements.extend((query, batch) for batch in _chunks(rows, self.node_batch_size))
+        self._run_batches(statements)
+
+    def write_text_nodes(self, text_nodes: List[TextNode]) -> None:
+        """MERGE text nodes as Chunk nodes, like upsert_llama_nodes"""
+        rows = [
+            {
+                "id": text_node.id_,
+                "text": text_node.get_content(metadata_mode=MetadataMode.NONE),
+                "properties": _clean(node_to_metadata_dict(text_node, remove_text=True)),
+                "embedding": text_node.embedding,
+            }
+            for text_node in text_nodes
+        ]
+        query = f"""
+            UNWIND $rows AS row
+            MERGE (c:{BASE_NODE_LABEL} {{id: row.id}})
+            SET c.text = row.text, c:Chunk
+            SET c += row.properties
+            WITH c, row WHERE row.embedding IS NOT NULL
+            CALL db.create.setNodeVectorProperty(c, 'embedding', row.embedding)
+            RETURN count(*)
+        """
+        self._run_batches([(query, batch) for batch in _chunks(rows, self.node_batch_size)])
+
+    def write_relations(self, relations: List[Relation], known_ids: Optional[Set[str]] = None) -> None:
+        """
+        MERGE relations, one statement per relationship type.
+
+        Endpoints that are not in `known_ids` (e.g. the parent of the oldest block) are
+        first created as placeholder Chunk nodes in a single transaction, so the relation
+        batches only MATCH nodes and never race to create the same one. Rows are sorted by
+        endpoint so that concurrent batches (`relation_workers` > 1) lock nodes in the same order.
+        """
+        endpoint_ids = {r.source_id for r in relations} | {r.target_id for r in relations}
+        missing = list(endpoint_ids - known_ids) if known_ids is not None else list(endpoint_ids)
+        if missing:
+            self._run_batches([(
+                f"""
+                UNWIND $rows AS id
+                MERGE (n:{BASE_NODE_LABEL} {{id: id}})
+                ON CREATE SET n:Chunk
+                """,
+                missing
+            )])
+
+        rows_by_label = defaultdict(list)
+        for relation in relations:
+            rows_by_label[relation.label].append({
+                "source_id": relation.source_id,
+                "target_id": relation.target_id,
+                "properties": _clean(relation.properties),
+            })
+
+        statements = []
+        for label, rows in rows_by_label.items():
+            rows.sort(key=lambda row: (row["source_id"], row["target_id"]))
+            query = f"""
+                UNWIND $rows AS row
+                MATCH (source:{BASE_NODE_LABEL} {{id: row.source_id}})
+                MATCH (target:{BASE_NODE_LABEL} {{id: row.target_id}})
+                MERGE (source)-[r:{_quote(label)}]->(target)
+                SET r += row.properties
+            """
+            statements.extend((query, batch) for batch in _chunks(rows, self.relation_batch_size))
+        self._run_batches(statements, max_workers=self.relation_workers)
+
+    def write(self,
+              nodes: List[EntityNode],
+              relations: List[Relation],
+              text_nodes: List[TextNode]) -> None:
+        """Write nodes and text nodes, then the relations between them"""
+        self.write_nodes(nodes)
+        self.write_text_nodes(text_nodes)
+        self.write_relations(relations, known_ids={node.id for node in nodes})
+        logger.info(f"Bulk wrote {len(nodes)} nodes, {len(relations)} relations, {len(text_nodes)} text nodes")
+
+
+class EmbeddingCache:
+    """
+    Computes embeddings in large batches and caches them by a hash of the text,
+    so unchanged nodes are never embedded twice. The cache is an SQLite file
+    storing float32 vectors.
+    """
+
+    def __init__(self, embed_model, path: str = "embedding_cache.sqlite", batch_size: int = 512):
+        self.embed_model = embed_model
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB)")
+        self._model_key = getattr(embed_model, "model_name", type(embed_model).__name__)
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha256(f"{self._model_key}\n{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Return one embedding per text, computing only texts not seen before"""
+        hashes = [self._hash(text) for text in texts]
+        vectors: Dict[str, List[float]] = {}
+
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            for batch in _chunks(unique, 900):  # SQLite parameter limit
+                placeholders = ",".join("?" * len(batch))
+                for key, blob in self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})", batch
+                ):
+                    vectors[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        logger.info(f"Embedding {len(missing)} of {len(texts)} texts ({len(texts) - len(missing)} cached or duplicate)")
+
+        missing_items = list(missing.items())
+        for batch in _chunks(missing_items, self.batch_size):
+            embeddings = self.embed_model.get_text_embedding_batch([text for _, text in batch])
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                    [(key, np.asarray(embedding, dtype=np.float32).tobytes()) for (key, _), embedding in zip(batch, embeddings)]
+                )
+                self._conn.commit()
+            for (key, _), embedding in zip(batch, embeddings):
+                vectors[key] = embedding
+
+        return [vectors[key] for key in hashes]
@@ -4,6 +4,9 @@ from datetime import datetime
 from typing import List, Dict, Any, Tuple, Optional, Set
 import re
 import logging
+from collections import defaultdict
+from itertools import product
+from typing import Iterator
 from llama_index.core.graph_stores.types import (
     LabelledPropertyGraph,
     LabelledNode,
@@ -35,6 +38,11 @@ class TripletGenerator:
         self.created_entity_ids = set()
         self.created_relation_ids = set()
         
+        # Indexes maintained by create_entity_node:
+        # id -> node, and primary label -> date -> node ids
+        self.nodes_by_id: Dict[str, EntityNode] = {}
+        self.ids_by_label_date: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+        
         # Define metrics and indicators for convenience
         self.metrics = [
             "transaction_volume_btc",
@@ -145,13 +153,14 @@ class TripletGenerator:
         entity_id = f"{primary_label}:{name}"
         
         # Check if this entity already exists
-        if entity_id in self.created_entity_ids:
-            # Find the existing node and update its properties
-            for node in self.nodes:
-                if node.id == entity_id:
-                    # Update properties
-                    node.properties.update(properties)
-                    return node
+        node = self.nodes_by_id.get(entity_id)
+        if node is not None:
+            # Update properties, indexing the date if it is new
+            had_date = 'date' in node.properties
+            node.properties.update(properties)
+            if not had_date and 'date' in node.properties:
+                self.ids_by_label_date[primary_label][node.properties['date']].append(entity_id)
+            return node
         
         # Create new entity node
         node = EntityNode(
@@ -161,9 +170,12 @@ class TripletGenerator:
             id_=entity_id
         )
         
-        # Add to tracking set
+        # Add to tracking set and indexes
         self.created_entity_ids.add(entity_id)
         self.nodes.append(node)
+        self.nodes_by_id[entity_id] = node
+        if 'date' in properties:
+            self.ids_by_label_date[primary_label][properties['date']].append(entity_id)
         
         return node
     
@@ -779,116 +791,84 @@ class TripletGenerator:
                     }
                 )
     
-    def create_cross_domain_relationships(self) -> None:
-        """
-        Create relationships between different domains (economic indicators, on-chain metrics, blockchain)
+    def iter_cross_domain_relation_batches(self, batch_size: int = 10000) -> Iterator[List[Relation]]:
         """
-        # Map of time entities to their related blocks, indicators, and metrics
-        time_mappings = {}
+        Stream relationships between different domains (economic indicators, on-chain metrics, blockchain)
+        in batches of at most `batch_size` relations.
         
-        # First, collect all time-based entities
-        for node in self.nodes:
-            if 'date' in node.properties:
-                date_str = node.properties['date']
-                
-                if date_str not in time_mappings:
-                    time_mappings[date_str] = {
-                        'blocks': [],
-                        'indicators': [],
-                        'metrics': []
-                    }
-                
-                # Categorize by primary label
-                if node.label.startswith('Block'):
-                    time_mappings[date_str]['blocks'].append(node.id)
-                elif node.label.startswith('IndicatorValue'):
-                    time_mappings[date_str]['indicators'].append(node.id)
-                elif node.label.startswith('MetricValue'):
-                    time_mappings[date_str]['metrics'].append(node.id)
+        Blocks, indicator values and metric values are joined per date through the
+        label -> date -> ids index, so only one day of pairs is materialized at a time.
+        Yielded relations are not added to `self.relations`, which lets callers write
+        multi-year backfills to the graph store without holding every relation in memory.
+        """
+        blocks_by_date = self.ids_by_label_date.get('Block', {})
+        indicators_by_date = self.ids_by_label_date.get('IndicatorValue', {})
+        metrics_by_date = self.ids_by_label_date.get('MetricValue', {})
         
-        # Now create cross-domain relationships for each date
-        for date_str, entities in time_mappings.items():
+        batch = []
+        for date_str in sorted(set(blocks_by_date) | set(indicators_by_date) | set(metrics_by_date)):
+            block_ids = blocks_by_date.get(date_str, [])
+            indicators = [self.nodes_by_id[node_id] for node_id in indicators_by_date.get(date_str, [])]
+            metrics = [self.nodes_by_id[node_id] for node_id in metrics_by_date.get(date_str, [])]
+            
             # Connect blocks with indicators on the same day
-            for block_id in entities['blocks']:
-                for indicator_id in entities['indicators']:
-                    # Extract indicator details
-                    indicator_node = None
-                    for node in self.nodes:
-                        if node.id == indicator_id:
-                            indicator_node = node
-                            break
-                    
-                    if indicator_node:
-                        indicator_type = indicator_node.properties.get('indicator', '')
-                        indicator_value = indicator_node.properties.get('value', 0)
-                        
-                        # Create block-to-indicator relationship
-                        self.create_relation(
-                            source_id=block_id,
-                            target_id=indicator_id,
-                            label="HAS_ECONOMIC_CONTEXT",
-                            properties={
-                                'relevance': 1.0,  # Default value, could be calculated
-                                'context_type': indicator_type,
-                                'indicator_value': indicator_value
-                            }
-                        )
+            for block_id, indicator_node in product(block_ids, indicators):
+                batch.append(Relation(
+                    source_id=block_id,
+                    target_id=indicator_node.id,
+                    label="HAS_ECONOMIC_CONTEXT",
+                    properties={
+                        'relevance': 1.0,  # Default value, could be calculated
+                        'context_type': indicator_node.properties.get('indicator', ''),
+                        'indicator_value': indicator_node.properties.get('value', 0)
+                    }
+                ))
             
             # Connect blocks with metrics on the same day
-            for block_id in entities['blocks']:
-                for metric_id in entities['metrics']:
-                    # Extract metric details
-                    metric_node = None
-                    for node in self.nodes:
-                        if node.id == metric_id:
-                            metric_node = node
-                            break
-                    
-                    if metric_node:
-                        metric_type = metric_node.properties.get('metric', '')
-                        metric_value = metric_node.properties.get('value', 0)
-                        
-                        # Create block-to-metric relationship
-                        self.create_relation(
-                            source_id=block_id,
-                            target_id=metric_id,
-                            label="HAS_METRIC_CONTEXT",
-                            properties={
-                                'relevance': 1.0,  # Default value, could be calculated
-                                'metric_value': metric_value
-                            }
-                        )
+            for block_id, metric_node in product(block_ids, metrics):
+                batch.append(Relation(
+                    source_id=block_id,
+                    target_id=metric_node.id,
+                    label="HAS_METRIC_CONTEXT",
+                    properties={
+                        'relevance': 1.0,  # Default value, could be calculated
+                        'metric_value': metric_node.properties.get('value', 0)
+                    }
+                ))
             
             # Connect indicators with metrics on the same day
-            for indicator_id in entities['indicators']:
-                for metric_id in entities['metrics']:
-                    # Extract indicator details
-                    indicator_node = None
-                    metric_node = None
-                    
-                    for node in self.nodes:
-                        if node.id == indicator_id:
-                            indicator_node = node
-                        elif node.id == metric_id:
-                            metric_node = node
-                    
-                    if indicator_node and metric_node:
-                        indicator_type = indicator_node.properties.get('indicator', '')
-                        metric_type = metric_node.properties.get('metric', '')
-                        
-                        # Create correlation relationship
-                        self.create_relation(
-                            source_id=indicator_id,
-                            target_id=metric_id,
-                            label="CORRELATES_WITH",
-                            properties={
-                                'correlation': 0.0,  # todo: placeholder to be calculated
-                                'p_value': 0.05,
-                                'time_period': date_str,
-                                'indicator_value': indicator_node.properties.get('value', 0),
-                                'metric_value': metric_node.properties.get('value', 0)
-                            }
-                        )
+            for indicator_node, metric_node in product(indicators, metrics):
+                batch.append(Relation(
+                    source_id=indicator_node.id,
+                    target_id=metric_node.id,
+                    label="CORRELATES_WITH",
+                    properties={
+                        'correlation': 0.0,  # todo: placeholder to be calculated
+                        'p_value': 0.05,
+                        'time_period': date_str,
+                        'indicator_value': indicator_node.properties.get('value', 0),
+                        'metric_value': metric_node.properties.get('value', 0)
+                    }
+                ))
+            
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+        
+        if batch:
+            yield batch
+    
+    def create_cross_domain_relationships(self) -> None:
+        """
+        Create relationships between different domains (economic indicators, on-chain metrics, blockchain)
+        """
+        for batch in self.iter_cross_domain_relation_batches():
+            for relation in batch:
+                relation_id = f"{relation.source_id}-{relation.label}-{relation.target_id}"
+                if relation_id in self.created_relation_ids:
+                    continue
+                self.created_relation_ids.add(relation_id)
+                self.relations.append(relation)
     
     def create_domain_specific_relationships(self) -> None:
         """
@@ -1011,9 +991,13 @@ class TripletGenerator:
                              blocks_data: Any, 
                              economic_data: Any, 
                              onchain_data: Any,
-                             create_embeddings: bool = True) -> Tuple[List[LabelledNode], List[Relation], List[TextNode]]:
+                             create_embeddings: bool = True,
+                             include_cross_domain: bool = True) -> Tuple[List[LabelledNode], List[Relation], List[TextNode]]:
         """
         Load and process all data to generate property graph nodes and relations
+        
+        Set `include_cross_domain=False` to skip materializing the cross-domain
+        relationships and stream them later with `iter_cross_domain_relation_batches`.
         """
         logger.info("Starting data processing for property graph generation...")
         
@@ -1056,8 +1040,9 @@ class TripletGenerator:
             logger.info("No on-chain metric data provided, skipping metric processing")
         
         # Create cross-domain relationships
-        logger.info("Creating cross-domain relationships...")
-        self.create_cross_domain_relationships()
+        if include_cross_domain:
+            logger.info("Creating cross-domain relationships...")
+            self.create_cross_domain_relationships()
         
         # Create domain-specific relationships
         logger.info("Creating domain-specific relationships...")
@@ -17,6 +17,7 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Union
 from psycopg2 import pool
+from psycopg2.extras import execute_values
 from sklearn.model_selection import train_test_split
 
 # from pycaret.classification import compare_models
@@ -218,6 +219,9 @@ def create_tables_if_not_exist():
     
     CREATE INDEX IF NOT EXISTS idx_raw_bitcoin_prices_timestamp 
     ON raw_bitcoin_prices(timestamp);
+
+    CREATE INDEX IF NOT EXISTS idx_raw_bitcoin_prices_created_at
+    ON raw_bitcoin_prices(created_at);
     """
 
     # SQL to create hourly_bitcoin_prices table with improved index
@@ -236,6 +240,18 @@ def create_tables_if_not_exist():
     ON hourly_bitcoin_prices(close_price_usd);
     """
 
+    # SQL to create the table tracking how far each aggregation has progressed
+    create_watermark_table_sql = """
+    CREATE TABLE IF NOT EXISTS aggregation_watermarks (
+        name TEXT PRIMARY KEY,
+        last_created_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Watermark tables created when the watermark was a raw id
+    ALTER TABLE aggregation_watermarks ADD COLUMN IF NOT EXISTS last_created_at TIMESTAMP;
+    """
+
     conn = None
     try:
         conn = get_db_connection()
@@ -244,6 +260,7 @@ def create_tables_if_not_exist():
         # Create tables
         cur.execute(create_raw_table_sql)
         cur.execute(create_hourly_table_sql)
+        cur.execute(create_watermark_table_sql)
 
         conn.commit()
         logger.info("Tables created successfully")
@@ -414,81 +431,144 @@ def fetch_and_store_bitcoin_data():
 # -----------------------------------------------------------------------------
 
 
-@with_db_connection
-def aggregate_hourly_data(conn, days_to_aggregate=7):
+HOURLY_WATERMARK = "hourly_bitcoin_prices"
+
+# Compute the OHLC bar of every hour touched by the pending raw rows, in a
+# single statement. Hours are recomputed in full, so a partially filled hour is
+# corrected once the rest of its rows arrive.
+HOURLY_OHLC_SQL = """
+WITH pending AS (
+    SELECT DISTINCT date_trunc('hour', timestamp) AS hour
+    FROM raw_bitcoin_prices
+    WHERE {pending_filter}
+)
+SELECT DISTINCT
+    p.hour,
+    first_value(r.price_usd) OVER w AS open_price_usd,
+    max(r.price_usd) OVER w AS high_price_usd,
+    min(r.price_usd) OVER w AS low_price_usd,
+    last_value(r.price_usd) OVER w AS close_price_usd,
+    avg(r.volume_usd) OVER w AS volume_usd
+FROM pending p
+JOIN raw_bitcoin_prices r
+    ON r.timestamp >= p.hour AND r.timestamp < p.hour + INTERVAL '1 hour'
+WINDOW w AS (
+    PARTITION BY p.hour ORDER BY r.timestamp, r.id
+    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+)
+ORDER BY p.hour;
+"""
+
+# Rows inserted since the watermark, whatever their timestamp.
+PENDING_SINCE_WATERMARK = "created_at >= %(since)s"
+# First run: everything in the aggregation window.
+PENDING_IN_WINDOW = "timestamp > NOW() - %(days)s * INTERVAL '1 day'"
+
+# The next watermark: the newest insertion time seen, held back to the start of
+# the oldest other open transaction in this database, whether it has written
+# yet or not (a transaction gets an xid only at its first write). Rows it
+# commits later get created_at >= its start, so they are picked up by the next
+# run. Other users' transactions are only visible with pg_read_all_stats
+# (granted to rds_superuser).
+NEXT_WATERMARK_SQL = """
+SELECT
+    (SELECT max(created_at) FROM raw_bitcoin_prices),
+    (SELECT min(xact_start)::timestamp FROM pg_stat_activity
+     WHERE xact_start IS NOT NULL
+       AND backend_type = 'client backend'
+       AND datname = current_database()
+       AND pid <> pg_backend_pid());
+"""
+
+
+def get_watermark(cursor, name=HOURLY_WATERMARK):
     """
-    Aggregate raw Bitcoin data into hourly data points for the specified days.
+    Return the insertion time (created_at) up to which an aggregation is complete.
 
-    :param conn: Database connection (injected by decorator)
-    :param days_to_aggregate: Number of days to look back for aggregation
+    :param cursor: Database cursor
+    :param name: Name of the aggregation
+    :return: Watermark timestamp (None if the aggregation never ran)
     """
-    logger.info(
-        f"Aggregating hourly Bitcoin data for the last {days_to_aggregate} days"
+    cursor.execute(
+        "SELECT last_created_at FROM aggregation_watermarks WHERE name = %s;", (name,)
     )
+    row = cursor.fetchone()
+    return row[0] if row else None
 
-    # Step 1: Get hours from the specified time period that need aggregation
-    hours_query = """
-    SELECT DISTINCT date_trunc('hour', timestamp) as hour
-    FROM raw_bitcoin_prices
-    WHERE timestamp > NOW() - INTERVAL '%s days'
-    AND date_trunc('hour', timestamp) NOT IN (SELECT timestamp FROM hourly_bitcoin_prices)
-    ORDER BY hour;
+
+def set_watermark(cursor, last_created_at, name=HOURLY_WATERMARK):
     """
+    Store the insertion time (created_at) up to which an aggregation is complete.
 
-    try:
-        cur = conn.cursor()
+    :param cursor: Database cursor
+    :param last_created_at: Watermark timestamp
+    :param name: Name of the aggregation
+    """
+    cursor.execute(
+        """
+        INSERT INTO aggregation_watermarks (name, last_created_at)
+        VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET
+            last_created_at = EXCLUDED.last_created_at,
+            updated_at = CURRENT_TIMESTAMP;
+        """,
+        (name, last_created_at),
+    )
 
-        # Get all hours that need aggregation
-        cur.execute(hours_query, (days_to_aggregate,))
-        hours = [row[0] for row in cur.fetchall()]
-
-        if not hours:
-            logger.info("No new hours to aggregate")
-            return
-
-        logger.info(f"Aggregating {len(hours)} hours of data")
-
-        # Prepare batch insert parameters
-        batch_data = []
-        batch_size = 100  # Process in batches of 100 hours
-
-        # For each hour, calculate OHLC values
-        for hour in hours:
-            # Query for data in this hour
-            hour_data_query = """
-            SELECT 
-                price_usd, volume_usd
-            FROM raw_bitcoin_prices
-            WHERE timestamp >= %s AND timestamp < %s + INTERVAL '1 hour'
-            ORDER BY timestamp;
-            """
 
-            cur.execute(hour_data_query, (hour, hour))
-            rows = cur.fetchall()
+@with_db_connection
+def aggregate_hourly_data(conn, days_to_aggregate=7, refresh_daily=False, overlap_minutes=5):
+    """
+    Aggregate raw Bitcoin data into hourly data points for the specified days.
 
-            if not rows:
-                continue
+    The first run aggregates the last `days_to_aggregate` days. Later runs
+    recompute every hour touched by raw rows inserted (`created_at`) since the
+    watermark in `aggregation_watermarks`, whatever the age of the rows, so
+    backfilled history is aggregated too. The watermark never passes the start
+    of a transaction that is still open, and each run re-reads the last
+    `overlap_minutes` before it, so rows committed out of order are not
+    skipped. Bars are computed in one SQL statement and upserted with
+    `execute_values`.
 
-            # Calculate OHLC values
-            open_price = rows[0][0]  # First price
-            close_price = rows[-1][0]  # Last price
-            high_price = max(row[0] for row in rows)
-            low_price = min(row[0] for row in rows)
-            avg_volume = sum(row[1] for row in rows) / len(rows)
+    :param conn: Database connection (injected by decorator)
+    :param days_to_aggregate: Number of days to look back on the first run
+    :param refresh_daily: Whether to refresh (or create) the daily rollup afterwards
+    :param overlap_minutes: Minutes re-read before the watermark
+    :return: Number of hourly bars written
+    """
+    logger.info(
+        f"Aggregating hourly Bitcoin data for the last {days_to_aggregate} days"
+    )
 
-            # Add to batch
-            batch_data.append(
-                (hour, open_price, high_price, low_price, close_price, avg_volume)
-            )
+    try:
+        cur = conn.cursor()
 
-            # If batch is full, insert and reset
-            if len(batch_data) >= batch_size:
-                execute_batch_insert(cur, batch_data)
-                batch_data = []
+        watermark = get_watermark(cur)
+        # Read the next watermark first: rows inserted during the run have a
+        # later created_at and are aggregated again by the next run.
+        cur.execute(NEXT_WATERMARK_SQL)
+        max_created_at, oldest_writer = cur.fetchone()
+        if max_created_at is None:
+            logger.info("No raw data to aggregate")
+            return 0
+        next_watermark = max_created_at
+        if oldest_writer is not None:
+            next_watermark = min(next_watermark, oldest_writer)
+
+        if watermark is None:
+            pending_filter = PENDING_IN_WINDOW
+            params = {"days": days_to_aggregate}
+        else:
+            pending_filter = PENDING_SINCE_WATERMARK
+            params = {"since": watermark - timedelta(minutes=overlap_minutes)}
+        cur.execute(HOURLY_OHLC_SQL.format(pending_filter=pending_filter), params)
+        bars = cur.fetchall()
 
-        # Insert any remaining records
-        if batch_data:
-            execute_batch_insert(cur, batch_data)
+        logger.info(f"Aggregating {len(bars)} hours of data")
+        if bars:
+            execute_batch_insert(cur, bars)
+        if watermark is None or next_watermark > watermark:
+            set_watermark(cur, next_watermark)
 
         conn.commit()
         logger.info("Hourly data aggregated successfully")
@@ -499,18 +579,23 @@ def aggregate_hourly_data(conn, days_to_aggregate=7):
     finally:
         cur.close()
 
+    if refresh_daily:
+        refresh_daily_rollup()
+    return len(bars)
 
-def execute_batch_insert(cursor, batch_data):
+
+def execute_batch_insert(cursor, batch_data, page_size=1000):
     """
-    Execute batch insert for hourly data.
+    Execute batch upsert for hourly data.
 
     :param cursor: Database cursor
     :param batch_data: List of data tuples to insert
+    :param page_size: Number of rows sent per statement
     """
     insert_query = """
     INSERT INTO hourly_bitcoin_prices
     (timestamp, open_price_usd, high_price_usd, low_price_usd, close_price_usd, volume_usd)
-    VALUES (%s, %s, %s, %s, %s, %s)
+    VALUES %s
     ON CONFLICT (timestamp) 
     DO UPDATE SET
         open_price_usd = EXCLUDED.open_price_usd,
@@ -521,8 +606,77 @@ def execute_batch_insert(cursor, batch_data):
         created_at = CURRENT_TIMESTAMP;
     """
 
-    # Use executemany for batch insert
-    cursor.executemany(insert_query, batch_data)
+    # Use execute_values to send many rows per statement
+    execute_values(cursor, insert_query, batch_data, page_size=page_size)
+
+
+CREATE_DAILY_ROLLUP_SQL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS daily_bitcoin_prices AS
+SELECT DISTINCT
+    date_trunc('day', timestamp) AS day,
+    first_value(open_price_usd) OVER w AS open_price_usd,
+    max(high_price_usd) OVER w AS high_price_usd,
+    min(low_price_usd) OVER w AS low_price_usd,
+    last_value(close_price_usd) OVER w AS close_price_usd,
+    avg(volume_usd) OVER w AS volume_usd
+FROM hourly_bitcoin_prices
+WINDOW w AS (
+    PARTITION BY date_trunc('day', timestamp) ORDER BY timestamp
+    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+);
+
+-- A unique index is required by REFRESH ... CONCURRENTLY.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_bitcoin_prices_day
+ON daily_bitcoin_prices(day);
+"""
+
+
+@with_db_connection
+def create_daily_rollup(conn):
+    """
+    Create the `daily_bitcoin_prices` materialized view over the hourly bars.
+
+    :param conn: Database connection (injected by decorator)
+    """
+    logger.info("Creating daily rollup materialized view if it doesn't exist")
+
+    try:
+        cur = conn.cursor()
+        cur.execute(CREATE_DAILY_ROLLUP_SQL)
+        conn.commit()
+        logger.info("Daily rollup created successfully")
+    except Exception as e:
+        logger.error(f"Error creating daily rollup: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+@with_db_connection
+def refresh_daily_rollup(conn):
+    """
+    Refresh the daily rollup without blocking readers, creating it on first use.
+
+    :param conn: Database connection (injected by decorator)
+    """
+    logger.info("Refreshing daily rollup")
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('daily_bitcoin_prices');")
+        if cur.fetchone()[0] is None:
+            # A new view is populated when it is created.
+            logger.info("Daily rollup does not exist yet, creating it")
+            cur.execute(CREATE_DAILY_ROLLUP_SQL)
+        else:
+            cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY daily_bitcoin_prices;")
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error refreshing daily rollup: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
 
 
 @with_db_connection
@@ -0,0 +1,139 @@
+"""
+PostgreSQL tests for the hourly aggregation in bitcoin_rds_utils.
+
+They run against the database given by TEST_POSTGRES_DSN (default: the local
+`postgres` database) in a throwaway schema, and are skipped when it can't be
+reached:
+
+    TEST_POSTGRES_DSN="host=localhost dbname=postgres user=postgres" python -m pytest test_bitcoin_rds_utils.py
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+from psycopg2 import pool
+
+import bitcoin_rds_utils as brds
+
+DSN = os.getenv("TEST_POSTGRES_DSN", "host=localhost dbname=postgres user=postgres")
+
+
+@pytest.fixture
+def dsn(monkeypatch):
+    try:
+        admin = psycopg2.connect(DSN, connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"No PostgreSQL available: {e}")
+    admin.autocommit = True
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema};")
+    schema_dsn = f"{DSN} options='-c search_path={schema}'"
+    test_pool = pool.ThreadedConnectionPool(1, 5, schema_dsn)
+    monkeypatch.setattr(brds, "_connection_pool", test_pool)
+    brds.create_tables_if_not_exist()
+    yield schema_dsn
+    test_pool.closeall()
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA {schema} CASCADE;")
+    admin.close()
+
+
+def insert(conn, rows):
+    with conn.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO raw_bitcoin_prices (timestamp, price_usd, volume_usd, market_cap_usd)"
+            " VALUES (%s, %s, %s, 0);",
+            rows,
+        )
+
+
+def hourly_bars(dsn):
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT timestamp, open_price_usd, high_price_usd, low_price_usd, close_price_usd"
+            " FROM hourly_bitcoin_prices ORDER BY timestamp;"
+        )
+        return {row[0]: tuple(float(x) for x in row[1:]) for row in cur.fetchall()}
+
+
+def this_hour(hours_ago=0):
+    return datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours_ago)
+
+
+def test_recomputes_hours_touched_by_new_rows(dsn):
+    hour = this_hour(2)
+    with psycopg2.connect(dsn) as conn:
+        insert(conn, [(hour + timedelta(minutes=1), 10, 1), (hour + timedelta(minutes=2), 12, 1)])
+    assert brds.aggregate_hourly_data() == 1
+    assert hourly_bars(dsn)[hour] == (10, 12, 10, 12)
+
+    with psycopg2.connect(dsn) as conn:
+        insert(conn, [(hour + timedelta(minutes=30), 8, 1), (hour + timedelta(minutes=59), 11, 1)])
+    brds.aggregate_hourly_data()
+    assert hourly_bars(dsn)[hour] == (10, 12, 8, 11)
+
+
+def test_aggregates_late_rows_older_than_the_window(dsn):
+    with psycopg2.connect(dsn) as conn:
+        insert(conn, [(this_hour(1), 100, 1)])
+    brds.aggregate_hourly_data(days_to_aggregate=1)
+
+    # Backfilled history, far older than days_to_aggregate.
+    old_hour = this_hour(24 * 30)
+    with psycopg2.connect(dsn) as conn:
+        insert(conn, [(old_hour + timedelta(minutes=5), 50, 1)])
+    brds.aggregate_hourly_data(days_to_aggregate=1)
+    assert hourly_bars(dsn)[old_hour] == (50, 50, 50, 50)
+
+
+def test_rows_committed_out_of_order_are_not_skipped(dsn):
+    slow = psycopg2.connect(dsn)
+    # Started first, so its rows get the older created_at, but commits last.
+    insert(slow, [(this_hour(3) + timedelta(minutes=1), 20, 1)])
+    with psycopg2.connect(dsn) as conn:
+        insert(conn, [(this_hour(1) + timedelta(minutes=1), 30, 1)])
+    brds.aggregate_hourly_data(overlap_minutes=0)
+    assert this_hour(3) not in hourly_bars(dsn)
+
+    slow.commit()
+    slow.close()
+    brds.aggregate_hourly_data(overlap_minutes=0)
+    assert hourly_bars(dsn)[this_hour(3)] == (20, 20, 20, 20)
+
+
+def test_rows_of_a_transaction_open_before_the_run_are_not_skipped(dsn):
+    slow = psycopg2.connect(dsn)
+    # The transaction is open but has not written yet, so it has no xid.
+    with slow.cursor() as cur:
+        cur.execute("SELECT 1;")
+    with psycopg2.connect(dsn) as conn:
+        insert(conn, [(this_hour(1) + timedelta(minutes=1), 30, 1)])
+    brds.aggregate_hourly_data(overlap_minutes=0)
+
+    # Its rows get created_at = its start, before the newest rows seen above.
+    insert(slow, [(this_hour(3) + timedelta(minutes=1), 20, 1)])
+    slow.commit()
+    slow.close()
+    brds.aggregate_hourly_data(overlap_minutes=0)
+    assert hourly_bars(dsn)[this_hour(3)] == (20, 20, 20, 20)
+
+
+def test_refresh_daily_creates_the_rollup(dsn):
+    hour = this_hour(1)
+    with psycopg2.connect(dsn) as conn:
+        insert(conn, [(hour, 10, 1), (hour + timedelta(minutes=10), 14, 1)])
+    brds.aggregate_hourly_data(refresh_daily=True)
+
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute("SELECT day, close_price_usd FROM daily_bitcoin_prices;")
+        assert [(day, float(close)) for day, close in cur.fetchall()] == [
+            (hour.replace(hour=0), 14.0)
+        ]
+
+    # Refreshing an existing view works too.
+    brds.aggregate_hourly_data(refresh_daily=True)
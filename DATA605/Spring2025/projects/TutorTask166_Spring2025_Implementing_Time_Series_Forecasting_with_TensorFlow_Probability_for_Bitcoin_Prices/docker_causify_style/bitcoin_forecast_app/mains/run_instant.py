@@ -62,6 +62,9 @@ class BitcoinForecastApp:
         self.kafka_topic = os.getenv('KAFKA_TOPIC', 
                                    self.config['kafka']['topic'])
         
+        # Incremental reader over the raw data file, shared by all CSV lookups
+        self.data_loader = InstantCSVLoader(self.config)
+
         # Ensure predictions directory exists
         os.makedirs(os.path.dirname(self.predictions_file), exist_ok=True)
         os.makedirs(os.path.dirname(self.metrics_file), exist_ok=True)
@@ -121,12 +124,8 @@ class BitcoinForecastApp:
                 self.logger.warning(f"Data file not found: {self.data_file}")
                 return pd.DataFrame()
                 
-            # Read the CSV file
-            df = pd.read_csv(
-                self.data_file,
-                names=self.config['data_format']['columns']['raw_data']['names'],
-                skiprows=1  # Skip header row
-            )
+            # Parse only newly appended rows and copy the buffered recent bars
+            df = self.data_loader.reader.frame().copy()
             
             if df.empty:
                 self.logger.warning("Data file is empty")
@@ -287,9 +286,15 @@ class BitcoinForecastApp:
                     if self.last_prediction_time is None or \
                             (message_time - self.last_prediction_time).total_seconds() >= self.config[self.service_name]['model']['instant']['update_interval']:
                         
-                        # Always pass the full price series to the model for better context
-                        self.logger.info(f"Updating model with {len(price_series)} historical data points")
-                        self.model.fit(price_series)
+                        if self.model.posterior is None:
+                            # First fit on the historical window; afterwards the model keeps
+                            # its own history, fed by update() after every prediction
+                            self.logger.info(f"Fitting model on {len(price_series)} historical data points")
+                            self.model.fit(price_series)
+                        else:
+                            # Periodic refit of the model's history (warm-started in incremental mode)
+                            self.logger.info("Refitting model on its history")
+                            self.model.update(force_refit=True)
                         self.last_prediction_time = message_time
                 
                         # Reset reinit counter after successful update
@@ -386,11 +391,8 @@ class BitcoinForecastApp:
                     
                     # Update model with the actual price for continuous learning
                     try:
-                        # Add the actual price to the end of the price series
-                        updated_series = np.append(price_series, actual_price)
-                        
-                        # Use the update method to incorporate the new observation
-                        self.model.update(updated_series[-60:])  # Use the last 60 points for efficiency
+                        # The model keeps its own history, so only the new observation is passed
+                        self.model.update(actual_price)
                         self.logger.debug("Updated model with actual price for continuous learning")
                     except Exception as update_error:
                         self.logger.warning(f"Could not update model with actual price: {update_error}")
@@ -497,11 +499,7 @@ class BitcoinForecastApp:
             
             # Try to load data from the CSV file
             try:
-                df = pd.read_csv(
-                    self.data_file,
-                    names=self.config['data_format']['columns']['raw_data']['names'],
-                    skiprows=1
-                )
+                df = self.data_loader.reader.frame().copy()
             except Exception as e:
                 self.logger.error(f"Error loading data for robust prediction: {e}")
                 df = None
@@ -18,6 +18,7 @@ Usage:
     model.fit(price_series)               # Train on historical data
     pred, lower, upper = model.forecast() # Make prediction with confidence intervals
     metrics = model.evaluate_prediction(actual_price, prediction) # Evaluate accuracy
+    model.update(new_price)               # Incremental (warm-started) update per tick
 """
 import tensorflow as tf
 import tensorflow_probability as tfp
@@ -68,6 +69,46 @@ tfd = tfp.distributions
 tfs = tfp.sts
 
 
+class PriceRingBuffer:
+    """
+    Fixed-size ring buffer of the most recent prices.
+
+    Appending is O(1) per value and never reallocates, unlike concatenating
+    onto a tensor and slicing it back to the maximum size.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float64)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, values):
+        """Append values, overwriting the oldest ones when full."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) >= self.capacity:
+            self._data[:] = values[-self.capacity:]
+            self._start = 0
+            self._size = self.capacity
+            return
+        end = (self._start + self._size) % self.capacity
+        first = min(len(values), self.capacity - end)
+        self._data[end:end + first] = values[:first]
+        self._data[:len(values) - first] = values[first:]
+        overflow = max(0, self._size + len(values) - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self._size = min(self.capacity, self._size + len(values))
+
+    def last(self, n=None):
+        """Return the last `n` values (all values if None) in time order."""
+        n = self._size if n is None else min(n, self._size)
+        idx = (self._start + self._size - n + np.arange(n)) % self.capacity
+        return self._data[idx]
+
+
 class BitcoinForecastModel:
     def __init__(self, config):
         """
@@ -113,10 +154,28 @@ class BitcoinForecastModel:
         # Get VI steps from config
         self.vi_steps = model_config.get('vi_steps', 100)
 
-        # # Add missing attributes for history size management
-        # self.max_history_size = model_config.get('max_history_size', 1000)
-        # self.min_points_req = model_config.get('min_points_req', 10)
-        # self.num_variational_steps = model_config.get('vi_steps', 100)
+        # History size management
+        self.max_history_size = model_config.get('max_history_size', 1000)
+        self.min_points_req = model_config.get('min_points_req', 10)
+        self.num_variational_steps = model_config.get('vi_steps', 100)
+        self.history = PriceRingBuffer(self.max_history_size)
+
+        # Incremental update mode: keep the surrogate posterior and optimizer
+        # state between ticks and only run a few warm-started VI steps when a
+        # refit is due (drift detected or every `refit_interval` ticks)
+        self.update_mode = model_config.get('update_mode', 'full')
+        self.refit_interval = model_config.get('refit_interval', 30)
+        self.warm_start_steps = model_config.get('warm_start_steps', 10)
+        self.drift_threshold = model_config.get('drift_threshold', 3.0)
+        self.drift_window = model_config.get('drift_window', 60)
+        self.preprocess_window = model_config.get('preprocess_window', 200)
+        self.ticks_since_refit = 0
+        # Cleaned prices aligned with self.history, so that a tick only
+        # preprocesses its new points
+        self.preprocessed_history = PriceRingBuffer(self.max_history_size)
+        self._warm_optimizer = None
+        self._warm_step_fn = None
+        self._warm_posterior = None
         # Store num_samples for forecasting
         self.num_samples = model_config.get('num_samples', 50)
 
@@ -655,6 +714,14 @@ class BitcoinForecastModel:
             if num_variational_steps is None:
                 num_variational_steps = self.vi_steps
 
+            # Remember the raw prices for later incremental updates
+            self.history = PriceRingBuffer(self.max_history_size)
+            if isinstance(observed_time_series, tf.Tensor):
+                self.history.extend(observed_time_series.numpy())
+            else:
+                self.history.extend(observed_time_series)
+            self.ticks_since_refit = 0
+
             # Preprocess data first
             processed_data = self.preprocess_data(observed_time_series)
 
@@ -663,7 +730,7 @@ class BitcoinForecastModel:
                 self.build_model(processed_data)
         
             # Convert to tensor and ensure float64
-            self.observed_time_series = processed_data
+            self._set_preprocessed(processed_data)
 
             # Choose between MCMC or Variational Inference
             # Only use MCMC with sufficient data
@@ -1100,18 +1167,25 @@ class BitcoinForecastModel:
                 'timestamp': timestamp
             }
     
-    def update(self, new_data_point):
+    def update(self, new_data_point=None, force_refit=False):
         """
         Update the model with new data, using adaptive learning strategies
         specifically designed for cryptocurrency price movements.
+
+        With `update_mode: incremental` the fitted posterior is kept and only
+        warm-started when the drift test fires or `refit_interval` new points
+        have arrived; otherwise the model is rebuilt and refit from scratch.
         
         Args:
             new_data_point: New observation to incorporate - can be a single value,
-                           array, or tensor
+                           array, or tensor. None refits on the current history.
+            force_refit: Refit now even if no drift was detected
         """
         try:
             # Check and validate input
-            if isinstance(new_data_point, (int, float)):
+            if new_data_point is None:
+                new_data = np.array([], dtype=np.float64)
+            elif isinstance(new_data_point, (int, float)):
                 new_data = np.array([new_data_point], dtype=np.float64)
             elif isinstance(new_data_point, tf.Tensor):
                 new_data = new_data_point.numpy()
@@ -1129,7 +1203,7 @@ class BitcoinForecastModel:
             volatility_increased = False
             
             # Check if we have historical data to compare with
-            if self.observed_time_series is not None and len(self.observed_time_series) > 0:
+            if self.observed_time_series is not None and len(self.observed_time_series) > 0 and len(new_data) > 0:
                 last_price = extract_scalar_from_prediction(self.observed_time_series[-1])
                 new_price = extract_scalar_from_prediction(new_data[-1])
                 
@@ -1158,28 +1232,18 @@ class BitcoinForecastModel:
                         volatility_increased = True
                         print(f"Volatility increase detected: {(new_std/recent_std-1)*100:.1f}%. Using enhanced update.")
 
-            # Append new data to observed time series
-            if self.observed_time_series is None:
-                self.observed_time_series = tf.convert_to_tensor(new_data, dtype=tf.float64)
-            else:
-                # Append the new data, ensuring it's a tensor
-                new_data_tensor = tf.convert_to_tensor(new_data, dtype=tf.float64)
-                self.observed_time_series = tf.concat(
-                    [self.observed_time_series, new_data_tensor], axis=0)
-            
-            # Limit dataset size to prevent unbounded growth
-            if len(self.observed_time_series) > self.max_history_size:
-                # Keep more recent data for crypto (more relevant for prediction)
-                print(f"Limiting history to {self.max_history_size} points")
-                self.observed_time_series = self.observed_time_series[-self.max_history_size:]
+            # Incremental mode keeps the fitted posterior and only refits when needed
+            if self.update_mode == 'incremental' and self._can_warm_start():
+                return self._incremental_update(new_data, force_refit)
+
+            # Append new data to the fixed-size history and rebuild the observed series
+            self.history.extend(new_data)
 
             # Store the number of timesteps
-            self.num_timesteps = len(self.observed_time_series)
+            self.num_timesteps = len(self.history)
             
             # Apply preprocessing to the new time series
-            preprocessed_data = self.preprocess_data(self.observed_time_series)
-            if preprocessed_data is not None:
-                self.observed_time_series = preprocessed_data
+            self._set_preprocessed(self.preprocess_data(self.history.last()))
             
             # Verify that we have sufficient data for model fitting
             if len(self.observed_time_series) < self.min_points_req:
@@ -1232,6 +1296,176 @@ class BitcoinForecastModel:
             print(f"Error updating model: {e}\n{traceback.format_exc()}")
             return False
 
+    def _can_warm_start(self):
+        """Whether the current posterior can be reused as a warm start."""
+        return (
+            self.model is not None
+            and self.posterior is not None
+            and len(getattr(self.posterior, 'trainable_variables', ())) > 0
+        )
+
+    def _detect_drift(self, new_data):
+        """
+        Check whether new prices are inconsistent with recent behaviour.
+
+        Drift is flagged when the log return of the newest price is more than
+        `drift_threshold` standard deviations away from the recent returns, or
+        when the price falls outside the last forecast interval.
+
+        Returns:
+            Tuple of (drift detected, reason)
+        """
+        new_price = float(new_data[-1])
+        recent = self.history.last(self.drift_window + 1)
+        if len(recent) >= 3 and recent[-1] > 0 and new_price > 0:
+            returns = np.diff(np.log(recent))
+            std = returns.std()
+            if std > 0:
+                z_score = (np.log(new_price / recent[-1]) - returns.mean()) / std
+                if abs(z_score) > self.drift_threshold:
+                    return True, f"return z-score {z_score:.2f}"
+
+        if self.last_lower is not None and self.last_upper is not None:
+            lower = extract_scalar_from_prediction(self.last_lower)
+            upper = extract_scalar_from_prediction(self.last_upper)
+            if not lower <= new_price <= upper:
+                return True, f"price {format_price(new_price)} outside [{format_price(lower)}, {format_price(upper)}]"
+
+        return False, None
+
+    def _warm_start_vi(self, num_steps):
+        """
+        Continue optimizing the existing surrogate posterior on the current series.
+
+        The optimizer and the compiled training step are kept between calls, so
+        a warm start only pays for `num_steps` gradient updates. They are
+        rebuilt whenever the posterior is replaced by a full fit.
+        """
+        if self._warm_step_fn is None or self._warm_posterior is not self.posterior:
+            model = self.model
+            surrogate = self.posterior
+            optimizer = self._create_optimizer()
+
+            @tf.function(reduce_retracing=True)
+            def warm_step(observed_time_series):
+                def target_log_prob_fn(**params):
+                    return model.joint_distribution(
+                        observed_time_series=observed_time_series
+                    ).log_prob(**params)
+
+                with tf.GradientTape() as tape:
+                    loss = tfp.vi.monte_carlo_variational_loss(
+                        target_log_prob_fn, surrogate, sample_size=1)
+                grads = tape.gradient(loss, surrogate.trainable_variables)
+                grads, _ = tf.clip_by_global_norm(grads, 5.0)
+                optimizer.apply_gradients(zip(grads, surrogate.trainable_variables))
+                return loss
+
+            self._warm_optimizer = optimizer
+            self._warm_step_fn = warm_step
+            self._warm_posterior = surrogate
+
+        loss = None
+        for _ in range(num_steps):
+            loss = self._warm_step_fn(self.observed_time_series)
+        return loss
+
+    def _set_preprocessed(self, processed_data):
+        """Use a fully preprocessed series as the observed series and cache its values."""
+        if processed_data is None:
+            processed_data = tf.convert_to_tensor(self.history.last(), dtype=tf.float64)
+        self.preprocessed_history = PriceRingBuffer(self.max_history_size)
+        self.preprocessed_history.extend(processed_data.numpy())
+        self.observed_time_series = processed_data
+
+    def _preprocess_new_points(self, new_data):
+        """
+        Clean new prices against the cached preprocessed series.
+
+        Applies the consensus outlier test of `preprocess_data` (modified
+        z-score, IQR fences, >3% jump; at least 2 must agree) to each new point
+        using the last `preprocess_window` cleaned prices as context, and
+        replaces outliers with a distance-weighted average of the preceding
+        cleaned prices.
+
+        Returns:
+            Array of cleaned prices, one per new point
+        """
+        context = list(self.preprocessed_history.last(self.preprocess_window))
+        previous = self.history.last(1)
+        previous = float(previous[0]) if len(previous) else None
+        cleaned = []
+        for x in np.asarray(new_data, dtype=np.float64):
+            window = np.append(context, x)
+            median_val = np.median(window)
+            mad = np.median(np.abs(window - median_val))
+            votes = int(abs(0.6745 * (x - median_val) / (mad + 1e-8)) > 3.5)
+            q1, q3 = np.quantile(window, [0.25, 0.75])
+            iqr = q3 - q1
+            votes += int(x < q1 - 1.8 * iqr or x > q3 + 1.8 * iqr)
+            if previous:
+                votes += int(abs(x / previous - 1) > 0.03)
+
+            value = x
+            if votes >= 2 and context:
+                local_values = np.asarray(context[-10:])
+                if len(local_values) >= 3:
+                    weights = np.exp(-0.3 * np.arange(len(local_values), 0, -1))
+                    value = float(np.sum(local_values * weights / np.sum(weights)))
+                else:
+                    value = float(local_values.mean())
+                print(f"  Replaced outlier {x:.2f} with {value:.2f}")
+
+            cleaned.append(value)
+            context.append(value)
+            previous = x
+        return np.asarray(cleaned, dtype=np.float64)
+
+    def _incremental_update(self, new_data, force_refit=False):
+        """
+        Append new prices and refit only when drift is detected, the refit
+        interval has elapsed or a refit is forced. Between refits only the new
+        points are preprocessed; refits run the full preprocessing and
+        warm-start from the current posterior and optimizer state instead of
+        rebuilding them.
+        """
+        drift, reason = self._detect_drift(new_data) if len(new_data) else (False, None)
+        self.ticks_since_refit += len(new_data)
+        refit = drift or force_refit or self.ticks_since_refit >= self.refit_interval
+
+        if refit or len(self.preprocessed_history) != len(self.history):
+            self.history.extend(new_data)
+            self._set_preprocessed(self.preprocess_data(self.history.last()))
+        else:
+            cleaned = self._preprocess_new_points(new_data)
+            self.history.extend(new_data)
+            self.preprocessed_history.extend(cleaned)
+            self.observed_time_series = tf.convert_to_tensor(
+                self.preprocessed_history.last(), dtype=tf.float64)
+        self.num_timesteps = len(self.history)
+
+        if not refit:
+            # Posterior is still valid, the next forecast conditions on the new data
+            return True
+
+        # Take more steps when the data has drifted away from the fitted model
+        num_steps = self.warm_start_steps * 3 if drift else self.warm_start_steps
+        if drift:
+            print(f"Drift detected ({reason}). Warm-starting with {num_steps} VI steps.")
+        elif force_refit:
+            print(f"Refit requested. Warm-starting with {num_steps} VI steps.")
+        else:
+            print(f"Refit interval reached. Warm-starting with {num_steps} VI steps.")
+
+        loss = self._warm_start_vi(num_steps)
+        self.ticks_since_refit = 0
+        print(
+            f"[{datetime.now().isoformat()}] Warm-started model v{self.model_version} "
+            f"with {len(self.observed_time_series)} points, loss {float(loss):.4f}")
+
+        self.forecast()
+        return True
+
     def _fallback_forecast(self):
         """
         Create a fallback forecast when the primary model fails.
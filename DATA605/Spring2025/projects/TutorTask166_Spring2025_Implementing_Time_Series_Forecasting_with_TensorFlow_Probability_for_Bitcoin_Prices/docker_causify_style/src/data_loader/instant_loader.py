@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import os
 import time
 from typing import Optional, Tuple
+from utilities.csv_tail_reader import get_tail_reader
 
 class InstantCSVLoader:
     def __init__(self, config):
@@ -12,6 +13,14 @@ class InstantCSVLoader:
         self.window_size = timedelta(minutes=5)  # 5-minute window for predictions
         self.last_check_time = None
         self.ensure_data_file_exists()
+        # Shared incremental reader: only newly appended rows are parsed
+        instant_config = config['data']['raw_data']['instant_data']
+        self.reader = get_tail_reader(
+            self.raw_data_file,
+            columns=config.get('data_format', {}).get('columns', {}).get('raw_data', {}).get('names'),
+            max_rows=instant_config.get('buffer_rows', 100_000),
+            parquet_dir=instant_config.get('parquet_dir'),
+        )
 
     def ensure_data_file_exists(self):
         """Ensure the data file exists and has headers."""
@@ -28,15 +37,8 @@ class InstantCSVLoader:
                 self.ensure_data_file_exists()
                 return None
 
-            # Read the CSV file
-            df = pd.read_csv(self.raw_data_file)
-            if len(df) == 0:
-                return None
-
-            # Convert timestamp to datetime, coerce errors
-            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-            # Drop rows with invalid timestamps
-            df = df.dropna(subset=['timestamp'])
+            # Parse newly appended rows and take the buffered recent bars
+            df = self.reader.frame()
             if len(df) == 0:
                 return None
 
@@ -64,11 +66,10 @@ class InstantCSVLoader:
             if not os.path.exists(self.raw_data_file):
                 self.ensure_data_file_exists()
                 return pd.DataFrame()
-            df = pd.read_csv(self.raw_data_file)
+            # Compacted Parquet history plus recent rows (the buffer if no Parquet dir)
+            df = self.reader.history()
             if len(df) == 0:
                 return pd.DataFrame()
-            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-            df = df.dropna(subset=['timestamp'])
         except Exception as e:
             print(f"Error loading historical data: {str(e)}")
             return pd.DataFrame()
@@ -79,13 +80,8 @@ class InstantCSVLoader:
         try:
             if not os.path.exists(self.raw_data_file):
                 return None
-            
-            df = pd.read_csv(self.raw_data_file)
-            if len(df) == 0:
-                return None
-                
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            return df['timestamp'].max()
+
+            return self.reader.latest_timestamp()
             
         except Exception as e:
             print(f"Error getting latest timestamp: {str(e)}")
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Incremental CSV reader for append-only data files.
+Remembers the byte offset of the last parsed line so each refresh only parses
+rows appended since the previous call, and keeps the most recent rows in an
+in-memory ring buffer that the forecaster and the web API can serve from.
+"""
+import inspect
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHECKPOINT_FILE = '_offset.json'
+
+
+class CSVTailReader:
+    """
+    Tail an append-only CSV file into a bounded buffer of recent rows.
+
+    Args:
+        file_path: Path of the CSV file to follow
+        columns: Column names; if None they are taken from the header line
+        header: Whether the first line of the file is a header
+        max_rows: Maximum number of rows kept in memory (None for unbounded)
+        parquet_dir: Optional directory where parsed rows are compacted into
+            Parquet parts, so a restart resumes from the saved offset instead
+            of re-parsing the whole CSV (requires pyarrow)
+        compact_rows: Number of new rows that triggers a Parquet compaction
+    """
+
+    def __init__(self, file_path: str, columns: Optional[List[str]] = None, header: bool = True,
+                 max_rows: Optional[int] = 100_000, parquet_dir: Optional[str] = None,
+                 compact_rows: int = 10_000):
+        self.file_path = file_path
+        self.columns = list(columns) if columns else None
+        self.header = header
+        self.max_rows = max_rows
+        self.parquet_dir = parquet_dir
+        self.compact_rows = compact_rows
+
+        self._lock = threading.Lock()
+        self._chunks = deque()
+        self._num_rows = 0
+        self._frame = None
+        self._offset = 0
+        self._inode = None
+        self._uncompacted = []
+
+        if self.parquet_dir:
+            self._restore_checkpoint()
+
+    def _reset(self):
+        """Forget all state, e.g. after the file was truncated or replaced."""
+        self._chunks.clear()
+        self._num_rows = 0
+        self._frame = None
+        self._offset = 0
+        self._uncompacted = []
+
+    def _append_rows(self, df: pd.DataFrame):
+        """Add parsed rows to the ring buffer, evicting the oldest chunks."""
+        self._chunks.append(df)
+        self._num_rows += len(df)
+        if self.max_rows is not None:
+            while self._num_rows - len(self._chunks[0]) >= self.max_rows:
+                self._num_rows -= len(self._chunks.popleft())
+        self._frame = None
+
+    def _parse(self, data: bytes) -> pd.DataFrame:
+        """Parse complete CSV lines into a DataFrame with typed columns."""
+        df = pd.read_csv(io.BytesIO(data), names=self.columns, header=None)
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+            df = df.dropna(subset=['timestamp'])
+        return df
+
+    def refresh(self) -> int:
+        """
+        Parse lines appended since the last call.
+
+        Returns:
+            Number of new rows added to the buffer
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.file_path)
+            except FileNotFoundError:
+                return 0
+
+            # Start over if the file was rotated or truncated
+            if (self._inode is not None and stat.st_ino != self._inode) or stat.st_size < self._offset:
+                logger.info(f"{self.file_path} was replaced or truncated, re-reading from the start")
+                self._reset()
+            self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return 0
+
+            with open(self.file_path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+
+            # Only consume complete lines; a partially written row is read next time
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                return 0
+            start = 0
+            if self._offset == 0 and self.header:
+                start = data.find(b'\n') + 1
+                if self.columns is None:
+                    self.columns = data[:start].decode('utf-8').strip().split(',')
+            self._offset += end
+            if start >= end:
+                return 0
+
+            df = self._parse(data[start:end])
+            if df.empty:
+                return 0
+            self._append_rows(df)
+
+            if self.parquet_dir:
+                self._uncompacted.append(df)
+                if sum(len(c) for c in self._uncompacted) >= self.compact_rows:
+                    self._compact()
+            return len(df)
+
+    def frame(self, refresh: bool = True) -> pd.DataFrame:
+        """
+        Return the buffered rows as one DataFrame.
+
+        The concatenated frame is cached until new rows arrive, so callers
+        must copy it before modifying it.
+        """
+        if refresh:
+            self.refresh()
+        with self._lock:
+            if self._frame is None:
+                if self._chunks:
+                    df = pd.concat(self._chunks, ignore_index=True)
+                    if self.max_rows is not None and len(df) > self.max_rows:
+                        df = df.iloc[-self.max_rows:].reset_index(drop=True)
+                    self._frame = df
+                else:
+                    self._frame = pd.DataFrame(columns=self.columns or [])
+            return self._frame
+
+    def latest_timestamp(self, refresh: bool = True) -> Optional[pd.Timestamp]:
+        """Return the most recent timestamp in the buffer."""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            for chunk in reversed(self._chunks):
+                if 'timestamp' in chunk.columns and not chunk.empty:
+                    return chunk['timestamp'].max()
+        return None
+
+    def history(self) -> pd.DataFrame:
+        """
+        Return the full history: compacted Parquet parts plus rows that are
+        not compacted yet. Without a Parquet directory the whole CSV is parsed,
+        unless the buffer is unbounded and therefore already holds everything.
+        """
+        self.refresh()
+        if not self.parquet_dir:
+            if self.max_rows is None:
+                return self.frame(refresh=False).copy()
+            with open(self.file_path, 'rb') as f:
+                if self.header:
+                    f.readline()
+                return self._parse(f.read())
+        with self._lock:
+            parts = [pd.read_parquet(path) for path in self._parquet_parts()]
+            parts.extend(self._uncompacted)
+        if not parts:
+            return pd.DataFrame(columns=self.columns or [])
+        return pd.concat(parts, ignore_index=True)
+
+    def _parquet_parts(self) -> List[str]:
+        if not os.path.isdir(self.parquet_dir):
+            return []
+        return sorted(
+            os.path.join(self.parquet_dir, name)
+            for name in os.listdir(self.parquet_dir)
+            if name.endswith('.parquet')
+        )
+
+    def _compact(self):
+        """Write uncompacted rows to a new Parquet part and save the offset."""
+        if not self._uncompacted:
+            return
+        os.makedirs(self.parquet_dir, exist_ok=True)
+        df = pd.concat(self._uncompacted, ignore_index=True)
+        path = os.path.join(self.parquet_dir, f"part-{time.time_ns()}.parquet")
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+        checkpoint = {'offset': self._offset, 'inode': self._inode, 'columns': self.columns}
+        checkpoint_path = os.path.join(self.parquet_dir, CHECKPOINT_FILE)
+        with open(checkpoint_path + '.tmp', 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+        self._uncompacted = []
+        logger.info(f"Compacted {len(df)} rows from {self.file_path} into {path}")
+
+    def compact(self):
+        """Flush pending rows to Parquet (no-op without a Parquet directory)."""
+        if self.parquet_dir:
+            self.refresh()
+            with self._lock:
+                self._compact()
+
+    def _restore_checkpoint(self):
+        """Resume from a saved offset and reload recent rows from Parquet."""
+        checkpoint_path = os.path.join(self.parquet_dir, CHECKPOINT_FILE)
+        if not os.path.exists(checkpoint_path):
+            return
+        try:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            stat = os.stat(self.file_path)
+            if stat.st_ino != checkpoint.get('inode') or stat.st_size < checkpoint['offset']:
+                logger.info(f"Ignoring Parquet checkpoint for {self.file_path}: file has changed")
+                return
+
+            # Load parts newest first until the buffer is full
+            chunks = []
+            rows = 0
+            for path in reversed(self._parquet_parts()):
+                if self.max_rows is not None and rows >= self.max_rows:
+                    break
+                df = pd.read_parquet(path)
+                chunks.append(df)
+                rows += len(df)
+            for df in reversed(chunks):
+                self._append_rows(df)
+
+            self._offset = checkpoint['offset']
+            self._inode = checkpoint['inode']
+            self.columns = self.columns or checkpoint.get('columns')
+            logger.info(f"Resumed {self.file_path} at byte {self._offset} with {self._num_rows} buffered rows")
+        except Exception as e:
+            logger.warning(f"Could not restore Parquet checkpoint: {e}")
+            self._reset()
+
+
+_readers: Dict[Tuple, CSVTailReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_tail_reader(file_path: str, columns: Optional[List[str]] = None, **kwargs) -> CSVTailReader:
+    """
+    Return a process-wide reader for `file_path`, creating it on first use.
+
+    Readers are shared so that repeated calls (e.g. one per API request)
+    continue from the same offset and buffer. They are keyed by all their
+    settings (defaults included), so a call with a different `max_rows` or
+    `header` gets its own reader instead of the first caller's one.
+
+    Raises:
+        ValueError: If another reader already compacts into the same `parquet_dir`
+    """
+    settings = inspect.signature(CSVTailReader).bind(file_path, columns=columns, **kwargs)
+    settings.apply_defaults()
+    settings.arguments['columns'] = tuple(columns) if columns else None
+    key = tuple(settings.arguments.items())
+    with _readers_lock:
+        if key not in _readers:
+            parquet_dir = settings.arguments['parquet_dir']
+            if parquet_dir and any(reader.parquet_dir == parquet_dir for reader in _readers.values()):
+                raise ValueError(f"Parquet directory {parquet_dir} is already used by another reader")
+            _readers[key] = CSVTailReader(**settings.arguments)
+        return _readers[key]
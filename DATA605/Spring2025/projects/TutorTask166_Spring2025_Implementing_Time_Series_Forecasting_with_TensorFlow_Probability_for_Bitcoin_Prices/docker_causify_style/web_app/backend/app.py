@@ -14,6 +14,13 @@ import sys
 # Use local unified_config module
 from unified_config import get_service_config
 
+# Add parent directory to path for the shared utilities
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from utilities.csv_tail_reader import get_tail_reader
+
 # Get service name from environment or use default
 SERVICE_NAME = os.environ.get('SERVICE_NAME', 'web_app')
 
@@ -28,30 +35,28 @@ logger = logging.getLogger(__name__)
 PRICE_FILE = config['data']['raw_data']['instant_data']['file']
 PREDICTIONS_FILE = config['data']['predictions']['instant_data']['predictions_file']
 METRICS_FILE = config['data']['predictions']['instant_data']['metrics_file']
+PRICE_BUFFER_ROWS = config['data']['raw_data']['instant_data'].get('buffer_rows', 100_000)
 
 # Create Flask app
 app = Flask(__name__, static_folder='../frontend')
 CORS(app)  # Enable CORS for all routes
 
-def load_csv_safely(file_path, columns=None, skip_rows=1):
-    """Safely load CSV data with error handling"""
+def load_csv_safely(file_path, columns=None, skip_rows=1, max_rows=None):
+    """
+    Safely load CSV data with error handling.
+
+    Files are followed by a shared incremental reader, so each call only
+    parses rows appended since the previous request.
+    """
     try:
         if not os.path.exists(file_path):
             logger.warning(f"File not found: {file_path}")
             return pd.DataFrame()
-            
-        # Determine if we should use column names from config or let pandas infer
-        if columns:
-            df = pd.read_csv(file_path, names=columns, skiprows=skip_rows)
-        else:
-            df = pd.read_csv(file_path)
-        
-        # Handle timestamp conversion
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-            
-        return df
+
+        reader = get_tail_reader(file_path, columns=columns, header=skip_rows > 0, max_rows=max_rows)
+
+        # Copy so that endpoints can reformat columns without touching the buffer
+        return reader.frame().copy()
     except Exception as e:
         logger.error(f"Error loading data from {file_path}: {e}")
         return pd.DataFrame()
@@ -82,7 +87,8 @@ def get_price_data():
         # Load price data
         price_df = load_csv_safely(
             PRICE_FILE,
-            columns=config['data_format']['columns']['raw_data']['names']
+            columns=config['data_format']['columns']['raw_data']['names'],
+            max_rows=PRICE_BUFFER_ROWS
         )
         
         # Filter to last 60 minutes
@@ -157,7 +163,11 @@ def get_metrics_data():
         if 'actual_error' not in metrics_df.columns and not metrics_df.empty:
             try:
                 pred_df = load_csv_safely(PREDICTIONS_FILE)
-                price_df = load_csv_safely(PRICE_FILE)
+                price_df = load_csv_safely(
+                    PRICE_FILE,
+                    columns=config['data_format']['columns']['raw_data']['names'],
+                    max_rows=PRICE_BUFFER_ROWS
+                )
                 
                 if not pred_df.empty and not price_df.empty:
                     logger.info("Calculating actual_error field for metrics")
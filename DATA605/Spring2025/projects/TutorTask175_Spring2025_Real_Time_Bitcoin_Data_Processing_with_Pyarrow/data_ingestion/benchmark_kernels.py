@@ -0,0 +1,115 @@
+"""
+Benchmark the vectorized analytics kernels in `utils.py` against the previous
+list-based implementations.
+
+Usage:
+    python benchmark_kernels.py --rows 10000000 --window 3
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils import (
+    calculate_moving_average,
+    detect_anomalies,
+    rolling_mean,
+    rolling_std,
+    zscore,
+    ewma,
+    rolling_stats_batches,
+)
+
+
+def legacy_moving_average(table: pa.Table, window_size: int = 3) -> pa.Table:
+    prices = table.column("price_usd").to_pylist()
+    ma = [None if i < window_size - 1 else
+          round(sum(prices[i - window_size + 1:i + 1]) / window_size, 2)
+          for i in range(len(prices))]
+    return table.append_column("moving_average", pa.array(ma))
+
+
+def legacy_detect_anomalies(table: pa.Table, threshold: float = 2.0) -> pa.Table:
+    prices = table.column("price_usd").to_pylist()
+    mean = statistics.mean(prices)
+    stdev = statistics.stdev(prices) if len(prices) > 1 else 0
+    anomalies = [abs((p - mean) / stdev) > threshold if stdev else False for p in prices]
+    return table.append_column("is_anomaly", pa.array(anomalies))
+
+
+def make_table(num_rows: int, num_chunks: int = 8) -> pa.Table:
+    # Random walk around 60k USD, split in several chunks like a dataset scan.
+    rng = np.random.default_rng(0)
+    prices = 60_000 + np.cumsum(rng.normal(0, 50, num_rows))
+    chunks = np.array_split(prices, num_chunks)
+    return pa.Table.from_batches(
+        [pa.RecordBatch.from_arrays([pa.array(c)], names=["price_usd"]) for c in chunks]
+    )
+
+
+def check_against_pandas(prices: np.ndarray, window: int, label: str, rtol: float = 1e-6) -> None:
+    # The rolling kernels must match pandas, including for series that drift
+    # far from their first value. pandas' own rolling sums carry a small
+    # absolute error on long series, so the tolerance scales with the prices.
+    atol = rtol * np.max(np.abs(prices))
+    expected_std = pd.Series(prices).rolling(window).std().to_numpy()
+    expected_mean = pd.Series(prices).rolling(window).mean().to_numpy()
+    std_err = np.nanmax(np.abs(rolling_std(pa.array(prices), window).to_numpy(zero_copy_only=False) - expected_std))
+    mean_err = np.nanmax(np.abs(rolling_mean(pa.array(prices), window).to_numpy(zero_copy_only=False) - expected_mean))
+    print(f"{label:<32} max |diff| std {std_err:.2e}, mean {mean_err:.2e} (tolerance {atol:.2e})")
+    assert std_err < atol and mean_err < atol, f"rolling kernels differ from pandas on {label}"
+
+
+def timeit(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--window", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    table = make_table(args.rows)
+    prices = table.column("price_usd")
+    print(f"{args.rows:,} rows in {prices.num_chunks} chunks, window={args.window}")
+
+    walk = prices.to_numpy()
+    trend = 1_000 + np.linspace(0, 100_000, args.rows) + np.random.default_rng(1).normal(0, 5, args.rows)
+    check_against_pandas(walk, args.window, "pandas check (random walk)")
+    check_against_pandas(trend, args.window, "pandas check (trending)")
+
+    timeit("rolling_mean", rolling_mean, prices, args.window)
+    timeit("rolling_std", rolling_std, prices, args.window)
+    timeit("zscore (global)", zscore, prices)
+    timeit("zscore (rolling)", zscore, prices, args.window)
+    timeit("ewma", ewma, prices, 0.1)
+    timeit(
+        "rolling_stats_batches",
+        lambda: sum(b.num_rows for b in rolling_stats_batches(table.to_batches(), window=args.window)),
+    )
+    new_ma = timeit("calculate_moving_average", calculate_moving_average, table, args.window)
+    new_an = timeit("detect_anomalies", detect_anomalies, table)
+
+    if not args.skip_legacy:
+        old_ma = timeit("legacy_moving_average", legacy_moving_average, table, args.window)
+        old_an = timeit("legacy_detect_anomalies", legacy_detect_anomalies, table)
+        diff = np.nanmax(np.abs(
+            new_ma.column("moving_average").to_numpy(zero_copy_only=False).astype(float)
+            - old_ma.column("moving_average").to_numpy(zero_copy_only=False).astype(float)
+        ))
+        same = new_an.column("is_anomaly").equals(old_an.column("is_anomaly"))
+        print(f"max |moving_average diff| = {diff:.4f}, anomalies equal = {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,14 @@
 import os
 from datetime import datetime
-import pyarrow.parquet as pq
 
 from utils import (
-    fetch_and_append_new_data,
+    fetch_and_append_to_dataset,
+    migrate_parquet_to_dataset,
+    read_dataset,
     calculate_moving_average,
     detect_anomalies,
-    save_to_parquet,
     create_log_entry,
-    append_log_entry,
+    append_log_entry_to_dataset,
     generate_forecast_report
 )
 
@@ -19,29 +19,27 @@ except ImportError:
     raise ImportError("Missing COINGECKO_API_KEY in config.py")
 
 PARQUET_PATH = "/workspace/bitcoin-pyarrow/data_ingestion/datalake/bitcoin_price_stream.parquet"
-LOG_PATH = "data_ingestion/datalake/load_log.parquet"
+DATASET_DIR = "/workspace/bitcoin-pyarrow/data_ingestion/datalake/bitcoin_price_stream"
+LOG_DIR = "data_ingestion/datalake/load_log"
 REPORT_PATH = "data_ingestion/reports/forecast_report.html"
 
 print("🚀 Starting container and updating from last available timestamp...")
 
-# Track previous row count
-try:
-    previous_table = pq.read_table(PARQUET_PATH)
-    previous_row_count = previous_table.num_rows
-except Exception:
-    previous_row_count = 0
+# Convert the single-file history into the partitioned dataset once.
+if not os.path.isdir(DATASET_DIR) and os.path.exists(PARQUET_PATH):
+    migrated = migrate_parquet_to_dataset(PARQUET_PATH, DATASET_DIR)
+    print(f"Migrated {migrated} rows to {DATASET_DIR}")
 
-# Step 1: Fetch new data
-fetch_and_append_new_data(api_key=COINGECKO_API_KEY, parquet_path=PARQUET_PATH)
+# Step 1: Fetch new data (only new files are written)
+new_row_count = fetch_and_append_to_dataset(api_key=COINGECKO_API_KEY, dataset_dir=DATASET_DIR)
 
-# Step 2: Re-load and post-process the full table
-table = pq.read_table(PARQUET_PATH)
+# Step 2: Load and post-process the table in memory (derived columns are not
+# written back, so the stored history is never rewritten)
+table = read_dataset(DATASET_DIR)
 table = calculate_moving_average(table)
 table = detect_anomalies(table)
-save_to_parquet(table, PARQUET_PATH)
 
 # Step 3: Log the update
-new_row_count = table.num_rows - previous_row_count
 print("New row Count",table.num_rows)
 log_entry = create_log_entry(
     timestamp=datetime.utcnow(),
@@ -50,7 +48,7 @@ log_entry = create_log_entry(
     status="success",
     message="Data updated and processed."
 )
-append_log_entry(log_entry, LOG_PATH)
+append_log_entry_to_dataset(log_entry, LOG_DIR)
 
 # Step 4: Forecast report generation
 df = table.to_pandas()
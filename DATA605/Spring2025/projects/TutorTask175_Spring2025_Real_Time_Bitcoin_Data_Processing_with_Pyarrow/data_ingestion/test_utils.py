@@ -0,0 +1,86 @@
+"""
+Tests for the vectorized analytics kernels in `utils.py`.
+
+Run from the data_ingestion directory with `python -m pytest test_utils.py`.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from utils import (
+    calculate_moving_average,
+    rolling_mean,
+    rolling_stats_batches,
+    rolling_std,
+    zscore,
+)
+
+
+def to_numpy(array: pa.Array) -> np.ndarray:
+    return array.to_numpy(zero_copy_only=False).astype(float)
+
+
+def random_walk(num_rows: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 60_000 + np.cumsum(rng.normal(0, 50, num_rows))
+
+
+def prices_with_gaps() -> pa.Array:
+    # Nulls and a NaN in the middle of the series, and a null at the end.
+    prices = random_walk(200).tolist()
+    for i in (50, 51, 120, 199):
+        prices[i] = None
+    prices[90] = float("nan")
+    return pa.array(prices, pa.float64())
+
+
+def two_pass_std(prices: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(prices), np.nan)
+    out[window - 1:] = np.lib.stride_tricks.sliding_window_view(prices, window).std(axis=1, ddof=1)
+    return out
+
+
+@pytest.mark.parametrize("window", [1, 3, 20, 150])
+def test_rolling_kernels_match_reference(window):
+    prices = random_walk(5_000)
+    expected_mean = pd.Series(prices).rolling(window).mean()
+    np.testing.assert_allclose(to_numpy(rolling_mean(pa.array(prices), window)), expected_mean, rtol=1e-12)
+    if window > 1:
+        # pandas' own running sums drift on long series, so the std is
+        # checked against a per-window two-pass computation.
+        np.testing.assert_allclose(to_numpy(rolling_std(pa.array(prices), window)), two_pass_std(prices, window), rtol=1e-9)
+
+
+@pytest.mark.parametrize("window", [3, 20])
+def test_rolling_kernels_with_nulls_in_the_middle(window):
+    prices = prices_with_gaps()
+    # pandas also gives NaN for the windows that contain a missing value.
+    expected = pd.Series(to_numpy(prices)).rolling(window)
+    mean = rolling_mean(prices, window)
+    std = rolling_std(prices, window)
+    np.testing.assert_allclose(to_numpy(mean), expected.mean(), rtol=1e-12)
+    np.testing.assert_allclose(to_numpy(std), expected.std(), rtol=1e-7)
+
+    # Only the windows that contain a gap are null, and both kernels agree.
+    gaps = {50, 51, 90, 120, 199}
+    expected_nulls = [i < window - 1 or any(i - window < g <= i for g in gaps) for i in range(len(prices))]
+    assert mean.is_null().to_pylist() == expected_nulls
+    assert std.is_null().to_pylist() == expected_nulls
+    assert zscore(prices, window).is_null().to_pylist() == expected_nulls
+
+
+def test_moving_average_recovers_after_a_null():
+    table = pa.table({"price_usd": pa.array([1.0, 2.0, None, 4.0, 5.0, 6.0, 7.0])})
+    ma = calculate_moving_average(table, window_size=2).column("moving_average").to_pylist()
+    assert ma == [None, 1.5, None, None, 4.5, 5.5, 6.5]
+
+
+def test_rolling_stats_batches_match_the_full_table():
+    prices = prices_with_gaps()
+    table = pa.table({"price_usd": prices})
+    batches = list(rolling_stats_batches(table.to_batches(max_chunksize=37), window=5))
+    streamed = pa.Table.from_batches(batches)
+    np.testing.assert_allclose(to_numpy(streamed.column("rolling_mean").combine_chunks()), to_numpy(rolling_mean(prices, 5)))
+    np.testing.assert_allclose(to_numpy(streamed.column("rolling_std").combine_chunks()), to_numpy(rolling_std(prices, 5)))
@@ -1,31 +1,150 @@
 import requests
+import numpy as np
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import pyarrow.compute as pc
 from datetime import datetime, timedelta
-import statistics
 import os
+import uuid
 import matplotlib.pyplot as plt
 from statsmodels.tsa.arima.model import ARIMA
+from scipy.signal import lfilter
 
 
 def arrowify_data(data_dict: dict) -> pa.Table:
     batch = {k: [v] for k, v in data_dict.items()}
     return pa.table(batch)
 
+# ------------------------------------------------------------------------------
+# Vectorized analytics kernels
+# ------------------------------------------------------------------------------
+# The kernels take a pa.Array / pa.ChunkedArray (e.g. `table.column(...)` or
+# `batch.column(...)`) and return a float64 pa.Array, with nulls where the
+# window is not full yet or contains a null. Rolling means and standard
+# deviations both come from running sums of x and x**2 in O(n).
+
+def _as_numpy(values) -> np.ndarray:
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks() if values.num_chunks != 1 else values.chunk(0)
+    values = pc.cast(values, pa.float64())
+    if values.null_count:
+        values = pc.fill_null(values, np.nan)
+    # Zero-copy for a single chunk without nulls.
+    return values.to_numpy(zero_copy_only=False)
+
+def _to_arrow(out: np.ndarray) -> pa.Array:
+    return pa.array(out, type=pa.float64(), from_pandas=True)
+
+def _rolling_moments(x: np.ndarray, window: int, segment: int = 8):
+    # Number of valid values, mean and sum of squared deviations of each full
+    # window, from running sums of x and x**2 that skip NaNs. A running sum of
+    # squares over the whole series would cancel badly for prices far from
+    # zero, so the sums restart every `segment` windows and are taken relative
+    # to the mean of their rows (segment + window - 1 values each).
+    num_windows = len(x) - window + 1
+    step = max(segment, window)
+    num_rows = -(-num_windows // step)
+    padded = np.full(num_rows * step + window - 1, np.nan)
+    padded[:len(x)] = x
+    rows = np.lib.stride_tricks.sliding_window_view(padded, step + window - 1)[::step]
+    valid = ~np.isnan(rows)
+    count = valid.sum(axis=1)
+    offset = np.where(valid, rows, 0.0).sum(axis=1) / np.maximum(count, 1)
+    d = np.where(valid, rows - offset[:, None], 0.0)
+
+    def window_sums(values):
+        cs = np.zeros((num_rows, values.shape[1] + 1))
+        np.cumsum(values, axis=1, out=cs[:, 1:])
+        return (cs[:, window:window + step] - cs[:, :step]).ravel()[:num_windows]
+
+    n = window_sums(valid.astype(np.float64))
+    s1 = window_sums(d)
+    s2 = window_sums(d * d)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = s1 / n
+        m2 = np.maximum(s2 - s1 * mean, 0.0)
+    return n, mean + np.repeat(offset, step)[:num_windows], m2
+
+def _rolling_mean_np(x: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        n, mean, _ = _rolling_moments(x, window)
+        out[window - 1:] = np.where(n == window, mean, np.nan)
+    return out
+
+def _rolling_std_np(x: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= window and window > ddof:
+        n, _, m2 = _rolling_moments(x, window)
+        out[window - 1:] = np.where(n == window, np.sqrt(m2 / (window - ddof)), np.nan)
+    return out
+
+def rolling_mean(values, window: int) -> pa.Array:
+    return _to_arrow(_rolling_mean_np(_as_numpy(values), window))
+
+def rolling_std(values, window: int, ddof: int = 1) -> pa.Array:
+    return _to_arrow(_rolling_std_np(_as_numpy(values), window, ddof))
+
+def zscore(values, window: int = None) -> pa.Array:
+    # Global z-score when `window` is None, rolling z-score otherwise.
+    if window is None:
+        mean = pc.mean(values).as_py()
+        std = pc.stddev(values, ddof=1).as_py()
+        x = _as_numpy(values)
+        if not std:
+            return _to_arrow(np.zeros(len(x)))
+        return _to_arrow((x - mean) / std)
+    x = _as_numpy(values)
+    std = _rolling_std_np(x, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (x - _rolling_mean_np(x, window)) / std
+    z[std == 0] = 0.0
+    return _to_arrow(z)
+
+def _ewma_np(x: np.ndarray, alpha: float, initial: float = None) -> np.ndarray:
+    # y[t] = alpha * x[t] + (1 - alpha) * y[t-1], y[-1] = `initial` (x[0]).
+    if len(x) == 0:
+        return x.copy()
+    prev = x[0] if initial is None else initial
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * prev])
+    return out
+
+def ewma(values, alpha: float) -> pa.Array:
+    return _to_arrow(_ewma_np(_as_numpy(values), alpha))
+
+def rolling_stats_batches(batches, column: str = "price_usd", window: int = 3, alpha: float = 0.1):
+    # Stream over record batches, carrying the last `window - 1` values and
+    # the last EWMA value across batches so results match the full-table ones.
+    tail = np.empty(0)
+    last_ewma = None
+    for batch in batches:
+        x = _as_numpy(batch.column(column))
+        xx = np.concatenate((tail, x))
+        n_tail = len(tail)
+        mean = _rolling_mean_np(xx, window)[n_tail:]
+        std = _rolling_std_np(xx, window)[n_tail:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (x - mean) / std
+        z[std == 0] = 0.0
+        ew = _ewma_np(x, alpha, initial=last_ewma)
+        if len(x):
+            last_ewma = ew[-1]
+        tail = xx[-(window - 1):] if window > 1 else np.empty(0)
+        yield pa.RecordBatch.from_arrays(
+            batch.columns + [_to_arrow(mean), _to_arrow(std), _to_arrow(z), _to_arrow(ew)],
+            names=batch.schema.names + ["rolling_mean", "rolling_std", "zscore", "ewma"],
+        )
+
 def calculate_moving_average(table: pa.Table, window_size: int = 3) -> pa.Table:
-    prices = table.column("price_usd").to_pylist()
-    ma = [None if i < window_size - 1 else
-          round(sum(prices[i - window_size + 1:i + 1]) / window_size, 2)
-          for i in range(len(prices))]
-    return table.append_column("moving_average", pa.array(ma))
+    ma = np.round(_rolling_mean_np(_as_numpy(table.column("price_usd")), window_size), 2)
+    return table.append_column("moving_average", _to_arrow(ma))
 
 def detect_anomalies(table: pa.Table, threshold: float = 2.0) -> pa.Table:
-    prices = table.column("price_usd").to_pylist()
-    mean = statistics.mean(prices)
-    stdev = statistics.stdev(prices) if len(prices) > 1 else 0
-    anomalies = [abs((p - mean) / stdev) > threshold if stdev else False for p in prices]
-    return table.append_column("is_anomaly", pa.array(anomalies))
+    z = pc.abs(zscore(table.column("price_usd")))
+    anomalies = pc.greater(z, threshold)
+    return table.append_column("is_anomaly", anomalies)
 
 def save_to_parquet(table: pa.Table, path: str) -> None:
     pq.write_table(table, path)
@@ -35,33 +154,35 @@ def get_latest_timestamp_from_parquet(parquet_path: str) -> datetime:
     timestamps = table.column("timestamp").to_pylist()
     return datetime.fromisoformat(max(timestamps))
 
-def fetch_and_append_new_data(api_key: str, parquet_path: str):
-    last_timestamp = get_latest_timestamp_from_parquet(parquet_path)
-    next_time = int((last_timestamp + timedelta(hours=1)).timestamp())
-    now_time = int(datetime.utcnow().timestamp())
-
-    if next_time >= now_time:
-        print("No new data to fetch.")
-        return
-
+def fetch_price_records(api_key: str, start: datetime, end: datetime) -> list:
     url = "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart/range"
     headers = {"x-cg-demo-api-key": api_key}
     params = {
         "vs_currency": "usd",
-        "from": str(next_time),
-        "to": str(now_time)
+        "from": str(int(start.timestamp())),
+        "to": str(int(end.timestamp()))
     }
 
     response = requests.get(url, headers=headers, params=params)
     response.raise_for_status()
     data = response.json()
+    return data.get("prices", [])
+
+def fetch_and_append_new_data(api_key: str, parquet_path: str):
+    last_timestamp = get_latest_timestamp_from_parquet(parquet_path)
+    next_time = last_timestamp + timedelta(hours=1)
+    now_time = datetime.utcnow()
+
+    if next_time >= now_time:
+        print("No new data to fetch.")
+        return
 
     records = [
         {
             "timestamp": datetime.utcfromtimestamp(ts / 1000).isoformat(),
             "price_usd": price
         }
-        for ts, price in data.get("prices", [])
+        for ts, price in fetch_price_records(api_key, next_time, now_time)
     ]
 
     if records:
@@ -74,6 +195,110 @@ def fetch_and_append_new_data(api_key: str, parquet_path: str):
     else:
         print("No new records found.")
 
+# ------------------------------------------------------------------------------
+# Append-only, date-partitioned dataset
+# ------------------------------------------------------------------------------
+# Each append writes new Parquet files under `date=YYYY-MM-DD/` instead of
+# rewriting the whole history, so the cost of an hourly update does not grow
+# with the size of the dataset.
+
+PRICE_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("ms")),
+    ("price_usd", pa.float64()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+def prices_to_table(prices: list) -> pa.Table:
+    # `prices` is the CoinGecko list of [epoch_ms, price] pairs.
+    timestamps = pa.array([ts for ts, _ in prices], pa.int64()).cast(pa.timestamp("ms"))
+    values = pa.array([price for _, price in prices], pa.float64())
+    return pa.Table.from_arrays([timestamps, values], schema=PRICE_SCHEMA)
+
+def append_to_dataset(table: pa.Table, dataset_dir: str) -> int:
+    if table.num_rows == 0:
+        return 0
+    # Add the partition key and write new files next to the existing ones.
+    dates = pc.strftime(table.column("timestamp"), format="%Y-%m-%d")
+    table = table.append_column("date", dates)
+    ds.write_dataset(
+        table,
+        dataset_dir,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return table.num_rows
+
+def read_dataset(dataset_dir: str, columns: list = None) -> pa.Table:
+    dataset = ds.dataset(dataset_dir, format="parquet", partitioning=PARTITIONING)
+    table = dataset.to_table(columns=columns or PRICE_SCHEMA.names)
+    return table.sort_by("timestamp")
+
+def _latest_partition_files(dataset_dir: str) -> list:
+    # Hive partition names sort chronologically, so only the newest
+    # partition has to be inspected.
+    partitions = sorted(
+        d for d in os.listdir(dataset_dir) if d.startswith("date=")
+    ) if os.path.isdir(dataset_dir) else []
+    for partition in reversed(partitions):
+        path = os.path.join(dataset_dir, partition)
+        files = [os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet")]
+        if files:
+            return files
+    return []
+
+def get_latest_timestamp_from_dataset(dataset_dir: str, column: str = "timestamp"):
+    latest = None
+    for path in _latest_partition_files(dataset_dir):
+        metadata = pq.ParquetFile(path).metadata
+        idx = metadata.schema.names.index(column)
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(idx).statistics
+            if stats is not None and stats.has_min_max:
+                file_max = stats.max
+            else:
+                # No statistics (e.g. written by another tool): read the column.
+                file_max = pc.max(pq.read_table(path, columns=[column]).column(column)).as_py()
+            if file_max is not None and (latest is None or file_max > latest):
+                latest = file_max
+    return latest
+
+def migrate_parquet_to_dataset(parquet_path: str, dataset_dir: str) -> int:
+    # One-off conversion of the single-file history (ISO string timestamps).
+    table = pq.read_table(parquet_path, columns=["timestamp", "price_usd"])
+    timestamps = table.column("timestamp")
+    if pa.types.is_string(timestamps.type) or pa.types.is_large_string(timestamps.type):
+        timestamps = pc.strptime(
+            pc.utf8_slice_codeunits(timestamps, 0, 19), format="%Y-%m-%dT%H:%M:%S", unit="ms"
+        )
+    table = pa.Table.from_arrays(
+        [timestamps.cast(pa.timestamp("ms")), table.column("price_usd").cast(pa.float64())],
+        schema=PRICE_SCHEMA,
+    )
+    return append_to_dataset(table, dataset_dir)
+
+def fetch_and_append_to_dataset(api_key: str, dataset_dir: str, default_start: datetime = None) -> int:
+    last_timestamp = get_latest_timestamp_from_dataset(dataset_dir)
+    if last_timestamp is None:
+        last_timestamp = default_start or datetime.utcnow() - timedelta(days=90)
+    next_time = last_timestamp + timedelta(hours=1)
+    now_time = datetime.utcnow()
+
+    if next_time >= now_time:
+        print("No new data to fetch.")
+        return 0
+
+    table = prices_to_table(fetch_price_records(api_key, next_time, now_time))
+    # Drop anything not strictly newer than what is already stored.
+    table = table.filter(pc.greater(table.column("timestamp"), pa.scalar(last_timestamp, pa.timestamp("ms"))))
+    num_rows = append_to_dataset(table, dataset_dir)
+    if num_rows:
+        print(f"Appended {num_rows} new rows.")
+    else:
+        print("No new records found.")
+    return num_rows
+
 def create_log_entry(timestamp: datetime, num_rows: int, source: str, status: str, message: str = "") -> pa.Table:
     data = {
         "timestamp": [timestamp.isoformat()],
@@ -95,6 +320,19 @@ def append_log_entry(log_table: pa.Table, log_path: str = "load_log.parquet"):
     df = log_table.to_pandas()
     print(df.tail(10))
 
+def append_log_entry_to_dataset(log_table: pa.Table, log_dir: str = "load_log"):
+    # Every entry is a new file, the existing log is never read back.
+    timestamps = pc.strptime(
+        pc.utf8_slice_codeunits(log_table.column("timestamp"), 0, 19),
+        format="%Y-%m-%dT%H:%M:%S",
+        unit="ms",
+    )
+    log_table = log_table.set_column(0, "timestamp", timestamps)
+    os.makedirs(log_dir, exist_ok=True)
+    pq.write_table(log_table, os.path.join(log_dir, f"log-{uuid.uuid4().hex}.parquet"))
+    print("\n📋Loaded Log:")
+    print(log_table.to_pandas())
+
 def generate_forecast_report(df: pd.DataFrame, output_path: str = "forecast_report.html"):
     df = df.copy()
 
@@ -1,20 +1,26 @@
 from pykafka import KafkaClient
+from pykafka.common import OffsetType
+import argparse
 import json
 import csv
 import os
+import time
 
 KAFKA_HOST = "kafka:9092"
 TOPIC = 'bitcoin_price'
+GROUP = 'btc_sink_group'
 
 JSON_FILE = 'output/bitcoin_data.jsonl'
 CSV_FILE = 'output/bitcoin_data.csv'
+PARQUET_DIR = 'output/parquet'
+FIELDNAMES = ['timestamp', 'price']
 
 os.makedirs('output', exist_ok=True)
 
 # Initialize CSV with headers if it doesn't exist
 if not os.path.exists(CSV_FILE):
     with open(CSV_FILE, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['timestamp', 'price'])
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
 
 def write_to_jsonl(data):
@@ -24,7 +30,7 @@ def write_to_jsonl(data):
 
 def write_to_csv(data):
     with open(CSV_FILE, 'a', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['timestamp', 'price'])
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writerow(data)
 
 def consume():
@@ -38,5 +44,192 @@ def consume():
             write_to_jsonl(data)
             write_to_csv(data)
 
+
+class RollingParquetWriter:
+    """
+    Append batches of records to Parquet files, starting a new file every
+    `roll_rows` rows or `roll_seconds` seconds. The file being written has a
+    `.tmp` suffix and is renamed when it is closed, so readers only ever see
+    complete files.
+    """
+
+    def __init__(self, directory=PARQUET_DIR, roll_rows=1_000_000, roll_seconds=3600):
+        # PyArrow is only needed for the Parquet sink.
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._pq = pq
+        self.directory = directory
+        self.roll_rows = roll_rows
+        self.roll_seconds = roll_seconds
+        self.schema = pa.schema([('timestamp', pa.float64()), ('price', pa.float64())])
+        self._writer = None
+        self._path = None
+        self._rows = 0
+        self._opened_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, records):
+        if not records:
+            return
+        if self._writer is None:
+            self._path = os.path.join(self.directory, f"bitcoin_data-{time.time_ns()}.parquet")
+            self._writer = self._pq.ParquetWriter(self._path + '.tmp', self.schema)
+            self._rows = 0
+            self._opened_at = time.monotonic()
+        columns = {
+            name: self._pa.array([r.get(name) for r in records], type=self.schema.field(name).type)
+            for name in self.schema.names
+        }
+        # One row group per flush.
+        self._writer.write_table(self._pa.table(columns, schema=self.schema))
+        self._rows += len(records)
+        self.roll_if_due()
+
+    @property
+    def finalized(self):
+        """True when every record written so far is in a closed file."""
+        return self._writer is None
+
+    def roll_if_due(self):
+        if self._writer is None:
+            return
+        if self._rows >= self.roll_rows or time.monotonic() - self._opened_at >= self.roll_seconds:
+            self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._path + '.tmp', self._path)
+            self._writer = None
+
+
+class BufferedSinks:
+    """
+    JSONL, CSV and (optionally) Parquet sinks that keep their files open and
+    write whole batches at once.
+
+    An open Parquet file has no footer and can't be read back after a crash,
+    so `sync()` reports whether everything written so far is durable.
+    """
+
+    def __init__(self, parquet_dir=None, buffer_size=1 << 20, roll_rows=1_000_000, roll_seconds=3600):
+        self._jsonl = open(JSON_FILE, 'a', buffering=buffer_size)
+        self._csv_file = open(CSV_FILE, 'a', newline='', buffering=buffer_size)
+        self._csv = csv.DictWriter(self._csv_file, fieldnames=FIELDNAMES, extrasaction='ignore')
+        self._parquet = (
+            RollingParquetWriter(parquet_dir, roll_rows, roll_seconds) if parquet_dir else None
+        )
+
+    def write(self, records):
+        self._jsonl.write(''.join(json.dumps(r) + '\n' for r in records))
+        self._csv.writerows(records)
+        if self._parquet is not None:
+            self._parquet.write(records)
+
+    def flush(self):
+        for f in (self._jsonl, self._csv_file):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def sync(self):
+        """
+        Flush the JSONL/CSV files to disk and roll the Parquet file if it is due.
+        Returns True when all written records are in fsynced or finalized files.
+        """
+        self.flush()
+        if self._parquet is None:
+            return True
+        self._parquet.roll_if_due()
+        return self._parquet.finalized
+
+    def close(self):
+        self.flush()
+        self._jsonl.close()
+        self._csv_file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def consume_batched(batch_size=5000, flush_interval=1.0, parquet_dir=None, use_rdkafka=False,
+                    roll_rows=1_000_000, roll_seconds=3600):
+    """
+    Drain messages through a BalancedConsumer and write them in batches.
+
+    A batch is written when it holds `batch_size` messages or when
+    `flush_interval` seconds have passed since the last flush. Offsets are
+    committed only once the written batches are fsynced and, with Parquet,
+    the file holding them has been closed (every `roll_rows` rows or
+    `roll_seconds` seconds), so a crash replays messages instead of losing
+    them. Replayed messages may be appended to the JSONL/CSV files twice.
+    """
+    client = KafkaClient(hosts=KAFKA_HOST)
+    topic = client.topics[TOPIC.encode()]
+    consumer = topic.get_balanced_consumer(
+        consumer_group=GROUP.encode(),
+        managed=True,
+        auto_commit_enable=False,
+        auto_offset_reset=OffsetType.EARLIEST,
+        # Return from consume() when idle so time-based flushes still happen.
+        consumer_timeout_ms=int(flush_interval * 1000),
+        use_rdkafka=use_rdkafka,
+    )
+    sinks = BufferedSinks(parquet_dir=parquet_dir, roll_rows=roll_rows, roll_seconds=roll_seconds)
+    batch = []
+    last_flush = time.monotonic()
+    total = 0
+    uncommitted = False
+    print(f"[BatchedConsumer] Started in group '{GROUP}'...")
+    try:
+        while True:
+            message = consumer.consume(block=True)
+            if message is not None:
+                batch.append(json.loads(message.value))
+            flushed = False
+            if len(batch) >= batch_size or (batch and time.monotonic() - last_flush >= flush_interval):
+                sinks.write(batch)
+                total += len(batch)
+                print(f"[BatchedConsumer] Flushed {len(batch)} messages ({total} total)")
+                batch = []
+                last_flush = time.monotonic()
+                flushed = uncommitted = True
+            # commit_offsets() covers every consumed message, so nothing may be
+            # left in the batch. Idle polls also roll a Parquet file that is due.
+            if uncommitted and not batch and (flushed or message is None) and sinks.sync():
+                consumer.commit_offsets()
+                uncommitted = False
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if batch:
+            sinks.write(batch)
+            uncommitted = True
+        # Closing finalizes the Parquet file, so the offsets can be committed.
+        sinks.close()
+        if uncommitted:
+            consumer.commit_offsets()
+        consumer.stop()
+
+
 if __name__ == '__main__':
-    consume()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batched', action='store_true', help='Use the batched BalancedConsumer sinks')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--flush-interval', type=float, default=1.0, help='Seconds between flushes')
+    parser.add_argument('--parquet', action='store_true', help=f'Also write rolling Parquet files to {PARQUET_DIR}')
+    parser.add_argument('--roll-rows', type=int, default=1_000_000, help='Rows per Parquet file')
+    parser.add_argument('--roll-seconds', type=float, default=3600,
+                        help='Seconds before a Parquet file is closed; offsets are committed when it is')
+    parser.add_argument('--rdkafka', action='store_true', help='Use the librdkafka-backed consumer')
+    args = parser.parse_args()
+    if args.batched:
+        consume_batched(
+            batch_size=args.batch_size,
+            flush_interval=args.flush_interval,
+            parquet_dir=PARQUET_DIR if args.parquet else None,
+            use_rdkafka=args.rdkafka,
+            roll_rows=args.roll_rows,
+            roll_seconds=args.roll_seconds,
+        )
+    else:
+        consume()
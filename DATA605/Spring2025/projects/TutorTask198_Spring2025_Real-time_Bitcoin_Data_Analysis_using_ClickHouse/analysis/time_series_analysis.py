@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+
 import pandas as pd
 from config.clickhouse_client import client
 
@@ -43,8 +45,84 @@ def fetch_time_series_from_db():
     """
     Fetches timestamp/price pairs from ClickHouse and returns a pandas DataFrame.
     """
-    query = "SELECT timestamp, price FROM bitcoin_db.price_data ORDER BY timestamp"
+    query = "SELECT timestamp, price FROM bitcoin_db.price_data FINAL ORDER BY timestamp"
     data = client.query_df(query)
     df = pd.DataFrame(data, columns=["timestamp", "price"])
     df["timestamp"] = pd.to_datetime(df["timestamp"])
     return df
+
+
+# Server-side analytics: the rolling statistics are computed by ClickHouse with
+# window functions, and only the requested time range is returned.
+# clickhouse_connect binds datetimes client-side as quoted strings, so every
+# use of %(since)s (a naive UTC datetime) is wrapped in toDateTime(..., 'UTC')
+# to get a DateTime expression.
+_ANALYTICS_SOURCES = {
+    # Deduplicated raw prices.
+    "raw": """
+        SELECT timestamp, price
+          FROM bitcoin_db.price_data FINAL
+         WHERE timestamp >= toDateTime(%(since)s, 'UTC') - toIntervalSecond(%(lookback_sec)s)
+    """,
+    # Hourly close prices from the materialized view.
+    "hour": """
+        SELECT hour AS timestamp, argMaxMerge(close) AS price
+          FROM bitcoin_db.price_hourly
+         WHERE hour >= toStartOfHour(toDateTime(%(since)s, 'UTC')) - toIntervalHour(%(window)s)
+         GROUP BY hour
+    """,
+}
+
+
+def fetch_price_analytics(
+    days: int = 365,
+    window: int = 10,
+    threshold: float = 2.0,
+    granularity: str = "hour",
+) -> pd.DataFrame:
+    """
+    Fetch prices with their moving average and anomaly flags, computed in
+    ClickHouse.
+
+    Args:
+        days: Number of days to return.
+        window: Number of periods for the rolling statistics.
+        threshold: Number of standard deviations to flag anomaly.
+        granularity: "hour" to use the hourly bars, "raw" for every price.
+
+    Returns:
+        DataFrame with ['timestamp', 'price', 'moving_avg', 'anomaly'].
+    """
+    if granularity not in _ANALYTICS_SOURCES:
+        raise ValueError(f"Unsupported granularity: {granularity!r}")
+    # Same semantics as compute_moving_average / detect_price_anomalies: the
+    # statistics are NULL until the window is full.
+    query = f"""
+        SELECT timestamp, price, moving_avg, anomaly
+        FROM (
+            SELECT
+                timestamp,
+                price,
+                if(count() OVER w = %(window)s, avg(price) OVER w, NULL) AS moving_avg,
+                if(count() OVER w = %(window)s, stddevSamp(price) OVER w, NULL) AS moving_std,
+                ifNull(abs(price - moving_avg) > %(threshold)s * moving_std, 0) AS anomaly
+            FROM ({_ANALYTICS_SOURCES[granularity]})
+            WINDOW w AS (ORDER BY timestamp ROWS BETWEEN %(frame)s PRECEDING AND CURRENT ROW)
+        )
+        WHERE timestamp >= toDateTime(%(since)s, 'UTC')
+        ORDER BY timestamp
+    """
+    since = datetime.utcnow().replace(microsecond=0) - timedelta(days=days)
+    params = {
+        "since": since,
+        "window": window,
+        "frame": window - 1,
+        "threshold": threshold,
+        # Prices arrive at least hourly, so reading `window` hours before
+        # `since` gives the first returned rows a full window.
+        "lookback_sec": window * 3600,
+    }
+    df = client.query_df(query, parameters=params)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["anomaly"] = df["anomaly"].astype(bool)
+    return df
@@ -1,10 +1,36 @@
 -- 1) Create the database if it doesn’t already exist
 CREATE DATABASE IF NOT EXISTS bitcoin_db;
 
--- 2) Create the table, with no TTL
+-- 2) Create the table, with no TTL. ReplacingMergeTree collapses rows with the
+--    same timestamp on merge, so ingestion can insert blindly and queries read
+--    deduplicated data with FINAL.
 CREATE TABLE IF NOT EXISTS bitcoin_db.price_data (
     timestamp DateTime,
     price     Float64
 )
-ENGINE = MergeTree()
+ENGINE = ReplacingMergeTree()
 ORDER BY timestamp;
+
+-- 3) Hourly OHLC bars, maintained on insert by the materialized view below.
+--    Only duplicate-safe aggregates are stored, so re-inserted rows do not
+--    change the bars.
+CREATE TABLE IF NOT EXISTS bitcoin_db.price_hourly (
+    hour  DateTime,
+    open  AggregateFunction(argMin, Float64, DateTime),
+    high  AggregateFunction(max, Float64),
+    low   AggregateFunction(min, Float64),
+    close AggregateFunction(argMax, Float64, DateTime)
+)
+ENGINE = AggregatingMergeTree()
+ORDER BY hour;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS bitcoin_db.price_hourly_mv
+TO bitcoin_db.price_hourly
+AS SELECT
+    toStartOfHour(timestamp) AS hour,
+    argMinState(price, timestamp) AS open,
+    maxState(price) AS high,
+    minState(price) AS low,
+    argMaxState(price, timestamp) AS close
+FROM bitcoin_db.price_data
+GROUP BY hour
@@ -5,14 +5,17 @@ from ingest.fetch_prices import (
     fetch_historical_prices,
     fetch_historical_hourly_prices,
 )
+import numpy as np
 import pandas as pd
 import time
 
 
 def ingest_historical_prices(days: int = 365, truncate: bool = False) -> None:
     """
-    Insert historical Bitcoin prices into ClickHouse, but only for timestamps
-    not already present.
+    Insert historical Bitcoin prices into ClickHouse with one columnar insert.
+
+    Duplicated timestamps are collapsed by the ReplacingMergeTree engine, so
+    there is no need to read the existing timestamps back first.
 
     Args:
         days: Days of history to fetch.
@@ -20,67 +23,54 @@ def ingest_historical_prices(days: int = 365, truncate: bool = False) -> None:
     """
     if truncate:
         client.command("TRUNCATE TABLE bitcoin_db.price_data")
+        client.command("TRUNCATE TABLE bitcoin_db.price_hourly")
 
     # fetch hourly points
     df = fetch_historical_hourly_prices(days)
+    inserted = insert_prices(df["timestamp"], df["price"])
+    if not inserted:
+        print("📝 No new historical rows to insert.")
 
-    # build a list of (datetime, float) tuples
-    cleaned = []
-    for ts, price in zip(df["timestamp"], df["price"]):
-        if ts is None or pd.isna(ts):
-            continue
-        if hasattr(ts, "to_pydatetime"):
-            ts = ts.to_pydatetime()
-        elif isinstance(ts, (int, float)):
-            ts = datetime.utcfromtimestamp(int(ts))
-        cleaned.append((ts, float(price)))
 
-    if not truncate and cleaned:
-        # determine range to query for existing data
-        min_ts = min(ts for ts, _ in cleaned)
-        max_ts = max(ts for ts, _ in cleaned)
-        # pull existing timestamps in that window
-        existing_ts_rows = client.execute(
-            """
-            SELECT timestamp
-              FROM bitcoin_db.price_data
-             WHERE timestamp >= %(min_ts)s
-               AND timestamp <= %(max_ts)s
-            """,
-            {"min_ts": min_ts, "max_ts": max_ts},
-        )
-        existing_ts = {row[0] for row in existing_ts_rows}
+def insert_prices(timestamps, prices) -> int:
+    """
+    Insert timestamp/price columns (NumPy arrays, pandas Series or Arrow
+    arrays) into ClickHouse as a single columnar block.
 
-        # filter out any that are already in the table
-        cleaned = [(ts, price) for ts, price in cleaned if ts not in existing_ts]
+    Args:
+        timestamps: Datetimes (or epoch seconds) of the prices.
+        prices: Prices in USD.
 
-    if cleaned:
-        client.insert("bitcoin_db.price_data", cleaned)
-    else:
-        print("📝 No new historical rows to insert.")
+    Returns:
+        Number of rows inserted.
+    """
+    ts = pd.Series(timestamps)
+    if pd.api.types.is_numeric_dtype(ts):
+        ts = pd.to_datetime(ts, unit="s")
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(ts, utc=True).dt.tz_localize(None).to_numpy(),
+            "price": np.asarray(prices, dtype="float64"),
+        }
+    ).dropna(subset=["timestamp"])
+    if df.empty:
+        return 0
+    client.insert_df("bitcoin_db.price_data", df)
+    return len(df)
 
 
 def ingest_current_price() -> None:
     """
-    Insert the current Bitcoin price into ClickHouse, unless that exact
-    timestamp is already present.
+    Insert the current Bitcoin price into ClickHouse (a repeated timestamp is
+    collapsed by the ReplacingMergeTree engine).
     """
     price = fetch_current_price()
     timestamp = datetime.utcnow()
-
-    # check for an existing row with this timestamp
-    count = client.query(
-        "SELECT count() FROM bitcoin_db.price_data WHERE timestamp = %(ts)s",
-        {"ts": timestamp},
-    )[0][0]
-
-    if count == 0:
-        client.command(
-            "INSERT INTO bitcoin_db.price_data (timestamp, price) VALUES (%(ts)s, %(price)s)",
-            {"ts": timestamp, "price": price},
-        )
-    else:
-        print(f"🗓️  Row for {timestamp!r} already exists; skipping insert.")
+    client.insert(
+        "bitcoin_db.price_data",
+        [[timestamp, float(price)]],
+        column_names=["timestamp", "price"],
+    )
 
 
 def run_auto_ingest(interval_sec: int = 60) -> None:
@@ -3,8 +3,7 @@ import threading
 import streamlit as st
 from pipeline.schema_setup import setup_schema
 from ingest.price_ingest import ingest_historical_prices, run_auto_ingest
-from analysis.time_series_analysis import fetch_time_series_from_db
-from analysis.time_series_analysis import compute_moving_average, detect_price_anomalies
+from analysis.time_series_analysis import fetch_price_analytics
 
 # one‑time DB init + historical load
 setup_schema()
@@ -21,9 +20,9 @@ threading.Thread(
 
 @st.cache_data(ttl=60)
 def get_data():
-    df = fetch_time_series_from_db()
-    # df = compute_moving_average(df, window=10)
-    # df = detect_price_anomalies(df, window=10, threshold=2.0)
+    # Hourly bars with moving average / anomaly flags computed in ClickHouse,
+    # only for the window shown.
+    df = fetch_price_analytics(days=365, window=10, threshold=2.0, granularity="hour")
     return df.set_index("timestamp")
 
 
@@ -34,14 +33,15 @@ def main():
 
     # Main chart
     st.subheader("BTC Price (USD)")
-    st.line_chart(df[["price"]])
+    st.line_chart(df[["price", "moving_avg"]])
 
     # Key stats
     st.markdown("### Key stats (last 365 days)")
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     col1.metric("Latest", f"${df['price'].iloc[-1]:,.2f}")
     col2.metric("Max", f"${df['price'].max():,.2f}")
     col3.metric("Min", f"${df['price'].min():,.2f}")
+    col4.metric("Anomalous hours", int(df["anomaly"].sum()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import importlib
+import os
+import re
+import sys
+import types
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+binding = pytest.importorskip("clickhouse_connect.driver.binding")
+
+
+class RecordingClient:
+    """Stands in for the ClickHouse client and keeps the queries it receives."""
+
+    def __init__(self):
+        self.calls = []
+
+    def query_df(self, query, parameters=None):
+        self.calls.append((query, parameters))
+        return pd.DataFrame(columns=["timestamp", "price", "moving_avg", "anomaly"])
+
+
+@pytest.fixture
+def analysis(monkeypatch):
+    # Importing config.clickhouse_client would connect to a server.
+    client = RecordingClient()
+    fake_module = types.ModuleType("config.clickhouse_client")
+    fake_module.client = client
+    monkeypatch.setitem(sys.modules, "config.clickhouse_client", fake_module)
+    monkeypatch.delitem(sys.modules, "analysis.time_series_analysis", raising=False)
+    return importlib.import_module("analysis.time_series_analysis"), client
+
+
+@pytest.mark.parametrize("granularity", ["raw", "hour"])
+def test_fetch_price_analytics_binds_since_as_datetime(analysis, granularity):
+    module, client = analysis
+    module.fetch_price_analytics(days=7, window=5, granularity=granularity)
+
+    query, params = client.calls[-1]
+    assert isinstance(params["since"], datetime)
+    sql = binding.finalize_query(query, params)
+    since = params["since"].strftime("%Y-%m-%d %H:%M:%S")
+
+    # The datetime is bound as a string literal, which must always be converted
+    # before it is used in DateTime arithmetic or comparisons.
+    uses = [m.start() for m in re.finditer(re.escape(f"'{since}'"), sql)]
+    assert len(uses) == 2
+    assert all(sql[:start].endswith("toDateTime(") for start in uses)
+    assert sql.count(f"toDateTime('{since}', 'UTC')") == 2
+    assert "%(" not in sql
+
+
+def test_fetch_price_analytics_rejects_unknown_granularity(analysis):
+    module, _ = analysis
+    with pytest.raises(ValueError):
+        module.fetch_price_analytics(granularity="minute")
@@ -12,9 +12,10 @@ Follow the coding style guide: https://github.com/causify-ai/helpers/blob/master
 """
 
 # Import libraries in this section.
+import hashlib
 import logging
 import time
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -34,6 +35,16 @@ from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 # Set up logger for the module.
 _LOG = logging.getLogger(__name__)
 
+# Patterns used to clean tweet text before it goes through spaCy.
+_URL_RE = re.compile(r"http\S+|www\S+|https\S+", flags=re.MULTILINE)
+_MENTION_HASHTAG_RE = re.compile(r"@\w+|#\w+")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Pipeline components whose output is not used by preprocessing (only lemmas,
+# stop words and entities are needed).
+_UNUSED_PIPES = ["parser", "senter"]
+# Entity labels that spaCy assigns to coin names.
+_COIN_LABELS = {"ORG", "PRODUCT", "PERSON"}
+
 def log_message(message: str) -> None:
     """
     Log a message with INFO level.
@@ -43,6 +54,29 @@ def log_message(message: str) -> None:
     """
     _LOG.info(message)
 
+def clean_text(text: str) -> str:
+    """
+    Remove URLs, mentions, hashtags, emojis and extra whitespace from a tweet.
+
+    :param text: The raw tweet text.
+    :return: The cleaned text.
+    """
+    cleaned_text = _URL_RE.sub("", text)
+    cleaned_text = _MENTION_HASHTAG_RE.sub("", cleaned_text)
+    cleaned_text = cleaned_text.encode("ascii", "ignore").decode()  # Remove emojis
+    return _WHITESPACE_RE.sub(" ", cleaned_text).strip()
+
+def tweet_key(tweet: dict) -> str:
+    """
+    Return the cache key of a tweet: its id if present, otherwise a hash of its text.
+
+    :param tweet: A tweet dictionary.
+    :return: The cache key.
+    """
+    if tweet.get("id") is not None:
+        return str(tweet["id"])
+    return hashlib.sha1(tweet["text"].encode("utf-8")).hexdigest()
+
 # #############################################################################
 # Bitcoin Sentiment Analyzer
 # #############################################################################
@@ -74,6 +108,9 @@ class BitcoinSentimentAnalyzer:
         except requests.RequestException as e:
             log_message(f"Error fetching CoinGecko data: {str(e)}")
             self.coin_list = []
+        self._coin_set = set(self.coin_list)
+        # Cache of spaCy and VADER results keyed by tweet id
+        self._nlp_cache: Dict[str, dict] = {}
         # Store X credentials
         self.x_username = x_username
         self.x_password = x_password
@@ -250,7 +287,7 @@ class BitcoinSentimentAnalyzer:
 
         :param keywords: List of search terms to query on Twitter (e.g., ["Bitcoin", "BTC"]).
         :param max_tweets: The maximum number of tweets to scrape.
-        :return: A list of dictionaries with tweet text and timestamp.
+        :return: A list of dictionaries with tweet text and timestamp (UTC, ISO 8601).
         """
         # Log in to X if credentials are provided
         self.login_to_x()
@@ -301,8 +338,8 @@ class BitcoinSentimentAnalyzer:
                             else:
                                 text = element.find_element(By.CSS_SELECTOR, 'div[lang]').text
                             if text not in seen_texts:  # Check for duplicates
-                                timestamp = pd.Timestamp.now().isoformat()
-                                tweets.append({"text": text, "timestamp": timestamp})
+                                timestamp = self._tweet_time(element)
+                                tweets.append({"id": self._tweet_id(element), "text": text, "timestamp": timestamp})
                                 seen_texts.add(text)
                         except:
                             continue
@@ -331,39 +368,86 @@ class BitcoinSentimentAnalyzer:
         log_message(f"Total unique tweets after combining: {len(all_tweets)}")
         return all_tweets
 
-    def preprocess_tweets(self, tweets: List[dict]) -> List[dict]:
+    def _tweet_id(self, element) -> Optional[str]:
+        """
+        Extract the tweet id from the status link of a tweet element.
+
+        :param element: The Selenium element of the tweet.
+        :return: The tweet id, or None if the element has no status link.
+        """
+        try:
+            href = element.find_element(By.CSS_SELECTOR, 'a[href*="/status/"]').get_attribute("href")
+        except Exception:
+            return None
+        match = re.search(r"/status/(\d+)", href or "")
+        return match.group(1) if match else None
+
+    def _tweet_time(self, element) -> str:
+        """
+        Extract the posting time of a tweet element.
+
+        :param element: The Selenium element of the tweet.
+        :return: The UTC time of the `<time datetime="...">` tag, or the scrape
+            time (UTC) if the element has none.
+        """
+        try:
+            posted = element.find_element(By.CSS_SELECTOR, "time").get_attribute("datetime")
+            if posted:
+                return pd.Timestamp(posted).tz_convert("UTC").isoformat()
+        except Exception:
+            pass
+        return pd.Timestamp.now(tz="UTC").isoformat()
+
+    def preprocess_tweets(self, tweets: List[dict], batch_size: int = 1000, n_process: int = 1) -> List[dict]:
         """
         Preprocess tweets using spaCy for tokenization, lemmatization, and cleaning.
 
+        Tweets are streamed through `nlp.pipe` in batches with the unused parser
+        disabled, and results are cached by tweet id so re-running the pipeline
+        on an overlapping scrape only processes new tweets.
+
         :param tweets: A list of tweet dictionaries with text and timestamp.
+        :param batch_size: The number of texts spaCy processes per batch (default: 1000).
+        :param n_process: The number of worker processes used by spaCy (default: 1).
         :return: A list of preprocessed tweet dictionaries with entities.
         """
         log_message(f"Preprocessing {len(tweets)} tweets.")
-        processed_tweets = []
-        for tweet in tweets:
-            # Inline clean_text logic
-            cleaned_text = re.sub(r"http\S+|www\S+|https\S+", "", tweet["text"], flags=re.MULTILINE)
-            cleaned_text = re.sub(r"@\w+|#\w+", "", cleaned_text)
-            cleaned_text = cleaned_text.encode("ascii", "ignore").decode()  # Remove emojis
-            cleaned_text = re.sub(r"\s+", " ", cleaned_text).strip()
-            
-            # Inline extract_entities logic
-            doc = self.nlp(cleaned_text)
+        keys = [tweet_key(tweet) for tweet in tweets]
+        # Run spaCy only on tweets that are not cached, once per tweet id
+        pending = {}
+        for key, tweet in zip(keys, tweets):
+            if key not in self._nlp_cache and key not in pending:
+                pending[key] = clean_text(tweet["text"])
+        log_message(f"Running spaCy on {len(pending)} tweets ({len(tweets) - len(pending)} cached).")
+        docs = self.nlp.pipe(
+            pending.values(),
+            batch_size=batch_size,
+            n_process=n_process,
+            disable=_UNUSED_PIPES,
+        )
+        for key, doc in zip(pending, docs):
             tokens = [token.lemma_.lower() for token in doc if not token.is_stop and not token.is_punct]
-            processed_text = " ".join(tokens)
             entities = [(ent.text, ent.label_) for ent in doc.ents]
-            
-            # Inline match_entities_with_coins logic
-            matched_coins = []
-            for text, label in entities:
-                if label in ["ORG", "PRODUCT", "PERSON"] and text.lower() in self.coin_list:
-                    matched_coins.append(text)
-                    
+            # Match entities against the CoinGecko coin names
+            matched_coins = [
+                text for text, label in entities
+                if label in _COIN_LABELS and text.lower() in self._coin_set
+            ]
+            self._nlp_cache[key] = {
+                "text": " ".join(tokens),
+                "entities": entities,
+                "coins": matched_coins,
+            }
+
+        processed_tweets = []
+        for key, tweet in zip(keys, tweets):
+            cached = self._nlp_cache[key]
             processed_tweets.append({
-                "text": processed_text,
+                "id": key,
+                "text": cached["text"],
                 "timestamp": tweet["timestamp"],
-                "entities": entities,
-                "coins": matched_coins
+                "entities": list(cached["entities"]),
+                "coins": list(cached["coins"])
             })
         log_message("Completed preprocessing.")
         return processed_tweets
@@ -372,13 +456,20 @@ class BitcoinSentimentAnalyzer:
         """
         Analyze the sentiment of tweets using VADER and categorize them.
 
+        Scores of tweets that went through `preprocess_tweets` are cached by tweet id.
+
         :param tweets: A list of preprocessed tweet dictionaries.
         :return: A list of tweet dictionaries with sentiment scores and categories.
         """
         log_message(f"Analyzing sentiment for {len(tweets)} tweets.")
         for tweet in tweets:
-            sentiment = self.sid.polarity_scores(tweet["text"])
-            tweet["sentiment"] = sentiment["compound"]
+            cached = self._nlp_cache.get(tweet.get("id"))
+            if cached is not None and cached["text"] == tweet["text"]:
+                if "sentiment" not in cached:
+                    cached["sentiment"] = self.sid.polarity_scores(tweet["text"])["compound"]
+                tweet["sentiment"] = cached["sentiment"]
+            else:
+                tweet["sentiment"] = self.sid.polarity_scores(tweet["text"])["compound"]
             # Categorize sentiment
             if tweet["sentiment"] > 0:
                 tweet["sentiment_category"] = "positive"
@@ -393,36 +484,49 @@ class BitcoinSentimentAnalyzer:
         """
         Fetch Bitcoin price data from CoinGecko API.
 
-        :return: A pandas DataFrame with columns 'timestamp' and 'price'.
+        :return: A pandas DataFrame with columns 'timestamp' (UTC) and 'price'.
         """
         log_message("Fetching Bitcoin price data from CoinGecko API.")
         url = "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart?vs_currency=usd&days=1"
         response = requests.get(url).json()
         prices = response["prices"]
         df = pd.DataFrame(prices, columns=["timestamp", "price"])
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
         log_message(f"Fetched {len(df)} price data points.")
         return df
 
-    def correlate_sentiment_price(self, tweets: List[dict], price_df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    def correlate_sentiment_price(self, tweets: List[dict], price_df: pd.DataFrame, tolerance: Optional[str] = None) -> Tuple[pd.DataFrame, dict]:
         """
         Correlate sentiment scores with Bitcoin price data using multiple methods.
 
+        Each tweet is paired with the latest price at or before its timestamp.
+        Both sides are compared in UTC; naive timestamps are taken as UTC.
+
         :param tweets: A list of tweet dictionaries with sentiment scores.
         :param price_df: A DataFrame with Bitcoin price data.
+        :param tolerance: The maximum time between a tweet and its price, e.g. "10min" (optional, defaults to None).
         :return: A tuple containing the combined DataFrame and a dictionary of correlation coefficients.
         """
         log_message("Correlating sentiment with Bitcoin price.")
         sentiment_df = pd.DataFrame({
-            "timestamp": [tweet["timestamp"] for tweet in tweets],
+            "timestamp": pd.to_datetime([tweet["timestamp"] for tweet in tweets], utc=True).as_unit("ns"),
             "sentiment": [tweet["sentiment"] for tweet in tweets]
-        })
-        sentiment_df["timestamp"] = pd.to_datetime(sentiment_df["timestamp"])
-        # Resample price data to match the number of tweets (simplified)
-        price_df = price_df.iloc[:len(tweets)]
+        }).sort_values("timestamp", kind="stable")
         # Rename timestamp column in price_df to avoid conflict
         price_df = price_df.rename(columns={"timestamp": "price_timestamp"})
-        combined_df = pd.concat([sentiment_df, price_df.reset_index(drop=True)], axis=1)
+        price_df["price_timestamp"] = pd.to_datetime(price_df["price_timestamp"], utc=True).dt.as_unit("ns")
+        price_df = price_df.sort_values("price_timestamp")
+        combined_df = pd.merge_asof(
+            sentiment_df,
+            price_df,
+            left_on="timestamp",
+            right_on="price_timestamp",
+            direction="backward",
+            tolerance=pd.Timedelta(tolerance) if tolerance else None,
+        )
+        # Drop tweets older than the first price (or further than the tolerance)
+        combined_df = combined_df.dropna(subset=["price"]).reset_index(drop=True)
+        log_message(f"Aligned {len(combined_df)} of {len(sentiment_df)} tweets with prices.")
 
         # Calculate additional metrics
         combined_df["price_change"] = combined_df["price"].pct_change()
@@ -539,17 +643,19 @@ class BitcoinSentimentAnalyzer:
         plt.show()
         plt.close()
 
-    def run_analysis(self, keywords: List[str] = ["Bitcoin", "BTC"], max_tweets: int = 50) -> None:
+    def run_analysis(self, keywords: List[str] = ["Bitcoin", "BTC"], max_tweets: int = 50, batch_size: int = 1000, n_process: int = 1) -> None:
         """
         Run the full sentiment analysis pipeline.
 
         :param keywords: List of search terms to query on Twitter (default: ["Bitcoin", "BTC"]).
         :param max_tweets: The maximum number of tweets to scrape (default: 50).
+        :param batch_size: The number of texts spaCy processes per batch (default: 1000).
+        :param n_process: The number of worker processes used by spaCy (default: 1).
         :return: None
         """
         log_message("Starting Bitcoin sentiment analysis pipeline.")
         tweets = self.scrape_tweets(keywords, max_tweets)
-        processed_tweets = self.preprocess_tweets(tweets)
+        processed_tweets = self.preprocess_tweets(tweets, batch_size=batch_size, n_process=n_process)
         tweets_with_sentiment = self.analyze_sentiment(processed_tweets)
         price_df = self.fetch_bitcoin_price()
         combined_df, correlations = self.correlate_sentiment_price(tweets_with_sentiment, price_df)
@@ -4,14 +4,42 @@ import matplotlib.pyplot as plt
 from neo4j_utils import (
     connect_to_neo4j,
     fetch_price_volume,
-    insert_transaction,
+    insert_transactions,
     insert_price_snapshots,
+    get_graph_version,
+    get_price_snapshots,
     get_frequent_pairs,
-    classify_wallet_tiers
+    classify_wallet_tiers,
+    get_wallet_tier
 )
 
-graph = connect_to_neo4j()
 st.set_page_config(page_title="Bitcoin Transaction Dashboard", layout="wide")
+
+# One connection for all reruns and sessions
+@st.cache_resource
+def get_graph():
+    return connect_to_neo4j()
+
+# Query results are cached per graph version, which every ingestion increases
+@st.cache_data(show_spinner=False)
+def load_price_snapshots(_graph, version):
+    return get_price_snapshots(_graph, "bitcoin")
+
+@st.cache_data(show_spinner=False)
+def load_frequent_pairs(_graph, version):
+    return get_frequent_pairs(_graph)
+
+# Tiers are computed on read instead of stored on the shared graph, so sessions
+# with different percentiles never overwrite each other's tiers
+@st.cache_data(show_spinner=False)
+def load_tier_counts(_graph, version, percentile):
+    return classify_wallet_tiers(_graph, whale_percentile=percentile, store=False)
+
+@st.cache_data(show_spinner=False)
+def load_wallet_tier(_graph, version, percentile, address):
+    return get_wallet_tier(_graph, address, whale_percentile=percentile)
+
+graph = get_graph()
 st.title("Bitcoin Transaction Dashboard")
 
 # Sidebar: Ingestion settings
@@ -32,11 +60,12 @@ with st.sidebar:
             with st.spinner("Ingesting data, please wait..."):
             # Fetch and insert transactions and price snapshots
                 txs, prices, volumes = fetch_price_volume(days=days, num_wallets=num_wallets)
-                for tx in txs:
-                    insert_transaction(graph, *tx)
+                insert_transactions(graph, txs)
                 insert_price_snapshots(graph, "bitcoin", prices, volumes)
                 st.success(f"Ingested {len(txs)} transactions and {len(prices)} price points.")
 
+graph_version = get_graph_version(graph)
+
 # Tabs for dashboard views
 tabs = st.tabs(["Time Series", "Wallet Analytics", "Frequent Transactions", "Wallet Lookup"])
 
@@ -44,12 +73,7 @@ tabs = st.tabs(["Time Series", "Wallet Analytics", "Frequent Transactions", "Wal
 with tabs[0]:
     st.subheader("Bitcoin Price and Volume Over Time")
 
-    df_snapshots = graph.run("""
-        MATCH (c:Coin)-[:HAS_SNAPSHOT]->(s:PriceSnapshot)
-        WHERE c.id = 'bitcoin'
-        RETURN s.timestamp AS time, s.price AS price, s.volume AS volume
-        ORDER BY time
-    """).to_data_frame()
+    df_snapshots = load_price_snapshots(graph, graph_version)
 
     if not df_snapshots.empty:
         df_snapshots["time"] = pd.to_datetime(df_snapshots["time"], unit="s")
@@ -79,16 +103,9 @@ with tabs[1]:
         min_value=1, max_value=50, value=10, step=1
     )
 
-    # Automatically classify on slider update
-    classify_wallet_tiers(graph, whale_percentile=percentile)
+    df_tiers = load_tier_counts(graph, graph_version, percentile)
     st.info(f"Top {percentile}% of wallets classified as WHALEs based on total amount sent.")
 
-    df_tiers = graph.run("""
-        MATCH (a:Address)
-        WHERE a.tier IS NOT NULL
-        RETURN a.tier AS tier, count(*) AS count
-    """).to_data_frame()
-
     if not df_tiers.empty:
         st.bar_chart(df_tiers.set_index("tier"))
         st.dataframe(df_tiers)
@@ -99,7 +116,7 @@ with tabs[1]:
 with tabs[2]:
     st.subheader("Frequent Sender-Receiver Pairs")
 
-    df_pairs = get_frequent_pairs(graph)
+    df_pairs = load_frequent_pairs(graph, graph_version)
 
     if not df_pairs.empty:
         st.dataframe(df_pairs)
@@ -115,16 +132,18 @@ with tabs[3]:
     address = st.text_input("Enter wallet address (e.g., wallet_0):")
 
     if address:
-        df = graph.run(f"""
-            MATCH (a:Address {{address: '{address}'}})
+        df = graph.run("""
+            MATCH (a:Address {address: $address})
             OPTIONAL MATCH (a)-[:SENT]->(r:Address)
             OPTIONAL MATCH (s:Address)-[:SENT]->(a)
-            RETURN a.address AS wallet, a.tier AS tier,
+            RETURN a.address AS wallet,
                    count(DISTINCT r) AS sent_to,
                    count(DISTINCT s) AS received_from
-        """).to_data_frame()
+        """, address=address).to_data_frame()
 
         if not df.empty:
+            # Tier for the percentile selected in Wallet Analytics
+            df.insert(1, "tier", load_wallet_tier(graph, graph_version, percentile, address))
             st.dataframe(df)
         else:
             st.warning("Address not found or has no transaction history.")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from py2neo import Graph, Node, Relationship
+from py2neo import Graph
 import os
 import requests
 import random
@@ -7,30 +7,87 @@ def connect_to_neo4j():
     return Graph(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASS")))
 
 def insert_transaction(graph, sender, receiver, amount, timestamp):
-    sender_node = Node("Address", address=sender)
-    receiver_node = Node("Address", address=receiver)
-
-    graph.merge(sender_node, "Address", "address")
-    graph.merge(receiver_node, "Address", "address")
+    """
+    Insert a single transaction. Prefer insert_transactions for more than a few, since
+    every call also bumps the graph version.
+    """
+    insert_transactions(graph, [(sender, receiver, amount, timestamp)])
 
-    tx_rel = Relationship(sender_node, "SENT", receiver_node, amount=amount, timestamp=timestamp)
-    graph.create(tx_rel)
+def create_constraints(graph):
+    """
+    Create uniqueness constraints for the keys used by MERGE, so that lookups use an index.
+    """
+    graph.run("CREATE CONSTRAINT address_unique IF NOT EXISTS FOR (a:Address) REQUIRE a.address IS UNIQUE")
+    graph.run("CREATE CONSTRAINT coin_unique IF NOT EXISTS FOR (c:Coin) REQUIRE c.id IS UNIQUE")
 
-def insert_price_snapshots(graph, coin_id, prices, volumes):
-    from py2neo import Node, Relationship
+def _batches(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
 
-    # Ensure Coin node exists
-    coin_node = Node("Coin", id=coin_id)
-    graph.merge(coin_node, "Coin", "id")
+def insert_transactions(graph, transactions, batch_size=5000):
+    """
+    Insert many (sender, receiver, amount, timestamp) transactions with one UNWIND query per batch.
+    Addresses are merged first, so the SENT relationships only need to match them.
+    """
+    create_constraints(graph)
+    addresses = sorted({tx[0] for tx in transactions} | {tx[1] for tx in transactions})
+    for batch in _batches([{"address": a} for a in addresses], batch_size):
+        graph.run("""
+            UNWIND $rows AS row
+            MERGE (:Address {address: row.address})
+        """, rows=batch)
+
+    rows = [
+        {"sender": sender, "receiver": receiver, "amount": amount, "timestamp": timestamp}
+        for sender, receiver, amount, timestamp in transactions
+    ]
+    for batch in _batches(rows, batch_size):
+        graph.run("""
+            UNWIND $rows AS row
+            MATCH (a:Address {address: row.sender})
+            MATCH (b:Address {address: row.receiver})
+            CREATE (a)-[:SENT {amount: row.amount, timestamp: row.timestamp}]->(b)
+        """, rows=batch)
+    bump_graph_version(graph)
+
+def insert_price_snapshots(graph, coin_id, prices, volumes, batch_size=5000):
+    create_constraints(graph)
+    rows = [
+        {"timestamp": int(price_entry[0] / 1000), "price": price_entry[1], "volume": vol_entry[1]}
+        for price_entry, vol_entry in zip(prices, volumes)
+    ]
+    # Ensure Coin node exists, then link one snapshot per price point to it
+    graph.run("MERGE (:Coin {id: $coin_id})", coin_id=coin_id)
+    for batch in _batches(rows, batch_size):
+        graph.run("""
+            MATCH (c:Coin {id: $coin_id})
+            UNWIND $rows AS row
+            CREATE (c)-[:HAS_SNAPSHOT]->(:PriceSnapshot {timestamp: row.timestamp, price: row.price, volume: row.volume})
+        """, coin_id=coin_id, rows=batch)
+    bump_graph_version(graph)
+
+def bump_graph_version(graph):
+    """
+    Increase the ingestion counter stored in the graph. Cached query results keyed by
+    get_graph_version() become stale after every ingestion, in any process.
+    """
+    graph.run("""
+        MERGE (v:GraphVersion {id: 'ingestion'})
+        SET v.version = coalesce(v.version, 0) + 1
+    """)
 
-    for price_entry, vol_entry in zip(prices, volumes):
-        timestamp = int(price_entry[0] / 1000)
-        price = price_entry[1]
-        volume = vol_entry[1]
+def get_graph_version(graph):
+    version = graph.evaluate("MATCH (v:GraphVersion {id: 'ingestion'}) RETURN v.version")
+    return version or 0
 
-        snapshot = Node("PriceSnapshot", timestamp=timestamp, price=price, volume=volume)
-        graph.create(snapshot)
-        graph.create(Relationship(coin_node, "HAS_SNAPSHOT", snapshot))
+def get_price_snapshots(graph, coin_id="bitcoin"):
+    query = """
+        MATCH (c:Coin)-[:HAS_SNAPSHOT]->(s:PriceSnapshot)
+        WHERE c.id = $coin_id
+        RETURN s.timestamp AS time, s.price AS price, s.volume AS volume
+        ORDER BY time
+    """
+    return graph.run(query, coin_id=coin_id).to_data_frame()
 
 def get_top_senders(graph):
     query = """
@@ -56,26 +113,38 @@ def get_mutual_transactions(graph):
     """
     return graph.run(query).to_data_frame()
 
-def classify_wallet_tiers(graph, whale_percentile=10):
-    """
-    Classify wallets based on percentile of total_sent.
-    Top `whale_percentile` percent are labeled as WHALEs, rest as NORMALs.
-    """
-    query = f"""
+# Ranks the wallets by total amount sent and labels the top `$whale_percentile`%
+# (rounded up) as WHALEs. Ties are broken by address, so the share of WHALEs
+# is exactly the selected one even when many wallets sent the same amount.
+_WALLET_TIERS_QUERY = """
     MATCH (a:Address)-[r:SENT]->()
     WITH a, sum(r.amount) AS total_sent
-    ORDER BY total_sent DESC
-    WITH collect({{address: a.address, total_sent: total_sent}}) AS wallets
-    WITH wallets, toInteger(size(wallets) * {whale_percentile} / 100.0) AS top_n
-    UNWIND range(0, size(wallets) - 1) AS i
-    WITH wallets[i] AS w, i, top_n
-    MATCH (a:Address {{address: w.address}})
-    SET a.tier = CASE
-        WHEN i < top_n THEN 'WHALE'
-        ELSE 'NORMAL'
-    END
+    ORDER BY total_sent DESC, a.address
+    WITH collect(a) AS wallets
+    WITH wallets, toInteger(ceil(size(wallets) * $whale_percentile / 100.0)) AS num_whales
+    UNWIND range(0, size(wallets) - 1) AS rank
+    WITH wallets[rank] AS a, CASE WHEN rank < num_whales THEN 'WHALE' ELSE 'NORMAL' END AS tier
+"""
+
+def classify_wallet_tiers(graph, whale_percentile=10, store=True):
+    """
+    Classify wallets based on their rank by total_sent.
+    The top `whale_percentile`% of the wallets are labeled as WHALEs, rest as NORMALs.
+    The ranking is computed inside Cypher; returns the number of wallets per tier.
+    With store=True the tier is also saved as the `tier` property of each wallet. The property
+    is shared by every reader of the graph, so concurrent callers with different percentiles
+    should use store=False and get_wallet_tier instead.
     """
-    graph.run(query)
+    query = _WALLET_TIERS_QUERY
+    if store:
+        query += "SET a.tier = tier\n"
+    query += "RETURN tier, count(*) AS count"
+    return graph.run(query, whale_percentile=whale_percentile).to_data_frame()
+
+def get_wallet_tier(graph, address, whale_percentile=10):
+    """Tier of one wallet for the given percentile, without storing it (None if it never sent)"""
+    query = _WALLET_TIERS_QUERY + "WHERE a.address = $address\nRETURN tier"
+    return graph.evaluate(query, whale_percentile=whale_percentile, address=address)
 
 
 def fetch_price_volume(days=1, num_wallets=20):
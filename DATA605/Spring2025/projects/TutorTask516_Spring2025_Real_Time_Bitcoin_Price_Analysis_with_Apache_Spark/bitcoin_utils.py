@@ -4,7 +4,7 @@ import pandas as pd
 import time
 from datetime import datetime
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, to_timestamp, window, avg
+from pyspark.sql.functions import col, to_timestamp, window, avg, sum as sum_, count
 from pyspark.sql.types import StructType, StringType, DoubleType
 
 
@@ -153,6 +153,192 @@ def compute_moving_average(
     return query
 
 
+def duration_seconds(duration):
+    """
+    Convert a Spark duration string such as "15 seconds" or "2 minutes" to seconds.
+
+    Parameters:
+        duration (str): "<number> <unit>" with unit second(s), minute(s), hour(s) or day(s).
+
+    Returns:
+        int: Duration in seconds.
+    """
+    units = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+    value, unit = duration.split()
+    return int(float(value) * units[unit.lower().rstrip("s")])
+
+
+class MovingAverageSink:
+    """
+    foreachBatch sink that turns per-slide price buckets into moving averages
+    for several window sizes and writes them as Parquet.
+
+    The streaming query only aggregates (sum, count) per slide-sized bucket.
+    Every window of every size is the union of consecutive buckets, so for
+    each micro-batch the sink upserts the changed buckets into a small keyed
+    state and recomputes only the windows that contain them.
+
+    Output layout in `output_dir`:
+        parts/part-<batch_id>.parquet  rows updated by that micro-batch
+        compacted-<batch_id>.parquet   latest value of every window up to that batch
+        state.parquet                  recent bucket state, for restarts
+    Rows have columns window_size, window_start, window_end, moving_avg, batch_id;
+    a later row for the same (window_size, window_start) replaces an earlier one.
+    """
+
+    def __init__(self, output_dir, window_sizes, slide_interval, watermark, compact_every=100):
+        self.output_dir = output_dir
+        self.window_sizes = list(window_sizes)
+        self.slide = duration_seconds(slide_interval)
+        self.windows = {}
+        for win in self.window_sizes:
+            seconds = duration_seconds(win)
+            if seconds % self.slide:
+                raise ValueError(f"Window size {win} is not a multiple of the slide interval {slide_interval}")
+            self.windows[win] = seconds
+        self.max_window = max(self.windows.values())
+        self.watermark = duration_seconds(watermark)
+        self.compact_every = compact_every
+        self.parts_dir = os.path.join(output_dir, "parts")
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self.state_path = os.path.join(output_dir, "state.parquet")
+        self.buckets = {}
+        if os.path.exists(self.state_path):
+            state = pd.read_parquet(self.state_path)
+            self.buckets = {
+                int(b): (s, c) for b, s, c in zip(state["bucket"], state["price_sum"], state["price_count"])
+            }
+
+    def __call__(self, batch_df, batch_id):
+        updates = batch_df.toPandas()
+        if updates.empty:
+            return
+        changed = set()
+        for start, price_sum, price_count in zip(updates["bucket_start"], updates["price_sum"], updates["price_count"]):
+            bucket = int(pd.Timestamp(start).timestamp())
+            self.buckets[bucket] = (float(price_sum), int(price_count))
+            changed.add(bucket)
+
+        # Later batches only change buckets newer than the watermark, and a micro-batch may
+        # still change buckets older than that; keep every bucket a changed window can cover.
+        oldest = min(min(changed), max(self.buckets) - self.watermark - self.slide)
+        self.buckets = {b: v for b, v in self.buckets.items() if b > oldest - self.max_window}
+
+        rows = []
+        for win, seconds in self.windows.items():
+            starts = {b - k * self.slide for b in changed for k in range(seconds // self.slide)}
+            for start in sorted(starts):
+                total, n = 0.0, 0
+                for bucket in range(start, start + seconds, self.slide):
+                    if bucket in self.buckets:
+                        total += self.buckets[bucket][0]
+                        n += self.buckets[bucket][1]
+                if n:
+                    rows.append((win, start, start + seconds, total / n))
+        result = pd.DataFrame(rows, columns=["window_size", "window_start", "window_end", "moving_avg"])
+        for column in ["window_start", "window_end"]:
+            result[column] = pd.to_datetime(result[column], unit="s")
+        result["batch_id"] = batch_id
+
+        # File names are keyed by batch id, so a re-run batch overwrites its own output
+        write_parquet_atomic(result, os.path.join(self.parts_dir, f"part-{batch_id:010d}.parquet"))
+        state = pd.DataFrame(
+            [(b, s, c) for b, (s, c) in self.buckets.items()],
+            columns=["bucket", "price_sum", "price_count"],
+        )
+        write_parquet_atomic(state, self.state_path)
+        if self.compact_every and batch_id % self.compact_every == self.compact_every - 1:
+            self.compact(batch_id)
+
+    def compact(self, batch_id):
+        """
+        Merge the previous compacted file and all parts up to batch_id into one file,
+        keeping the latest row per window, then delete the merged files.
+        """
+        frames, merged = [], []
+        for name in sorted(os.listdir(self.output_dir)):
+            if name.startswith("compacted-") and name.endswith(".parquet"):
+                frames.append(pd.read_parquet(os.path.join(self.output_dir, name)))
+                merged.append(os.path.join(self.output_dir, name))
+        for name in sorted(os.listdir(self.parts_dir)):
+            if name.endswith(".parquet") and int(name[5:15]) <= batch_id:
+                frames.append(pd.read_parquet(os.path.join(self.parts_dir, name)))
+                merged.append(os.path.join(self.parts_dir, name))
+        if not frames:
+            return
+        df = pd.concat(frames, ignore_index=True) \
+            .drop_duplicates(subset=["window_size", "window_start"], keep="last")
+        target = os.path.join(self.output_dir, f"compacted-{batch_id:010d}.parquet")
+        write_parquet_atomic(df, target)
+        for path in merged:
+            if path != target:
+                os.remove(path)
+        print(f"[Spark] Compacted {len(merged)} files into {target}")
+
+
+def write_parquet_atomic(df, path):
+    """
+    Write a DataFrame to Parquet under a hidden temporary name in the same
+    directory, fsync it and rename it into place, so readers (and directory
+    listings) never see a partially written file.
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        df.to_parquet(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def compute_moving_averages(
+    stream_df,
+    window_sizes,
+    slide_interval="15 seconds",
+    watermark="30 seconds",
+    output_dir="moving_avg_parquet",
+    trigger_interval=None
+):
+    """
+    Compute moving averages for several window sizes with a single streaming query.
+
+    Parameters:
+        stream_df (DataFrame): A Spark streaming DataFrame containing 'timestamp' and 'price' columns.
+        window_sizes (list): Window durations, e.g. ["2 minutes", "3 minutes"]; each must be a
+            multiple of slide_interval.
+        slide_interval (str): Interval at which the windows move. Default is "15 seconds".
+        watermark (str): Watermark delay to handle late data. Default is "30 seconds".
+        output_dir (str): Directory of the Parquet output (see MovingAverageSink). Default is "moving_avg_parquet".
+        trigger_interval (str): Optional processing-time trigger, e.g. "15 seconds".
+
+    Returns:
+        StreamingQuery: A Spark StreamingQuery object for the running write stream.
+
+    Notes:
+        - The query keeps one (sum, count) state per slide-sized bucket, whatever the number of window sizes.
+        - Buckets are emitted in update mode, so windows appear as soon as they have data and are
+          refined by later micro-batches until the watermark passes.
+        - The checkpoint is written to output_dir + "_checkpoint"; its commit log is what
+          plot.ParquetStreamTail uses to find newly written files.
+    """
+    sink = MovingAverageSink(output_dir, window_sizes, slide_interval, watermark)
+
+    df = stream_df.withColumn("event_time", to_timestamp(col("timestamp")))
+    bucket_df = df \
+        .withWatermark("event_time", watermark) \
+        .groupBy(window(col("event_time"), slide_interval)) \
+        .agg(sum_("price").alias("price_sum"), count("price").alias("price_count")) \
+        .select(col("window.start").alias("bucket_start"), "price_sum", "price_count")
+
+    writer = bucket_df.writeStream \
+        .outputMode("update") \
+        .foreachBatch(sink) \
+        .option("checkpointLocation", output_dir + "_checkpoint")
+    if trigger_interval:
+        writer = writer.trigger(processingTime=trigger_interval)
+    return writer.start()
+
+
 def launch_writer(data_dir, interval, num_points):
     """
     Starts the data collection writer process that fetches real-time Bitcoin prices
@@ -162,11 +348,14 @@ def launch_writer(data_dir, interval, num_points):
     start_data_collection(output_dir=data_dir, interval=interval, num_points=num_points)
 
 
-def launch_spark_stream(delay, data_dir, window_sizes, watermark, slide_interval):
+def launch_spark_stream(delay, data_dir, window_sizes, watermark, slide_interval, output_format="csv"):
     """
     Initializes a Spark session and launches multiple streaming queries,
     one for each configured window size.
 
+    With output_format="parquet", a single query computes all window sizes
+    and writes them to "moving_avg_parquet" (see compute_moving_averages).
+
     Returns:
         List of StreamingQuery objects, one for each moving average stream.
     """
@@ -176,6 +365,17 @@ def launch_spark_stream(delay, data_dir, window_sizes, watermark, slide_interval
     print("[Spark] Starting Spark session...")
     spark, df = start_spark_stream(data_dir=data_dir)
 
+    if output_format == "parquet":
+        print(f"[Spark] Starting one stream for WINDOW_SIZES={window_sizes} → Output: moving_avg_parquet")
+        query = compute_moving_averages(
+            df,
+            window_sizes,
+            slide_interval=slide_interval,
+            watermark=watermark,
+            output_dir="moving_avg_parquet"
+        )
+        return [query], spark
+
     queries = []
     for win in window_sizes:
         win_safe = win.replace(" ", "_")
@@ -36,6 +36,128 @@ def load_stream_output(folder):
     return df.dropna(subset=["window_start", "moving_avg"]).sort_values("window_start")
 
 
+class ParquetStreamTail:
+    """
+    Incremental reader for the Parquet output of bitcoin_utils.compute_moving_averages.
+
+    The streaming checkpoint writes commits/<batch_id> once a micro-batch has
+    been fully written, so each refresh only checks for the next batch ids and
+    reads their part files; files read before are never opened again. The
+    latest compacted file is read once, at the first refresh.
+
+    Rows are kept per window size in a dict keyed by window_start, so a
+    refresh only applies the rows of the new batches. At most `max_windows`
+    windows are kept per window size; the oldest ones are dropped first.
+    """
+
+    def __init__(self, output_dir, checkpoint_dir=None, max_windows=20_000):
+        self.output_dir = output_dir
+        self.checkpoint_dir = checkpoint_dir or output_dir + "_checkpoint"
+        self.max_windows = max_windows
+        self.next_batch = None
+        self.windows = {}
+        self._frames = {}
+
+    def _latest_compacted(self, min_batch=0):
+        names = [
+            name for name in os.listdir(self.output_dir)
+            if name.startswith("compacted-") and name.endswith(".parquet") and int(name[10:20]) >= min_batch
+        ] if os.path.isdir(self.output_dir) else []
+        return max(names) if names else None
+
+    def _upsert(self, df):
+        for window_size, rows in df.groupby("window_size", sort=False):
+            values = self.windows.setdefault(window_size, {})
+            values.update(zip(rows["window_start"], rows["moving_avg"]))
+            # Trim with some slack, so that sorting the keys is amortized over many batches
+            if self.max_windows and len(values) > self.max_windows * 5 // 4:
+                for start in sorted(values)[:len(values) - self.max_windows]:
+                    del values[start]
+            self._frames.pop(window_size, None)
+
+    def _load_compacted(self, min_batch=0):
+        """
+        Read the latest compacted file, if any. Compaction deletes the previous
+        compacted file once the new one is in place, so a file that disappears
+        while it is being read is replaced by a newer one and the listing is retried.
+        """
+        missing = None
+        while True:
+            name = self._latest_compacted(min_batch)
+            if name is None or name == missing:
+                return False
+            try:
+                df = pd.read_parquet(os.path.join(self.output_dir, name))
+            except FileNotFoundError:
+                missing = name
+                continue
+            self._upsert(df)
+            self.next_batch = int(name[10:20]) + 1
+            return True
+
+    def refresh(self):
+        """
+        Read the micro-batches committed since the last call.
+
+        Returns:
+            int: Number of newly read micro-batches.
+        """
+        if self.next_batch is None:
+            self.next_batch = 0
+            self._load_compacted()
+        read = 0
+        while os.path.exists(os.path.join(self.checkpoint_dir, "commits", str(self.next_batch))):
+            part = os.path.join(self.output_dir, "parts", f"part-{self.next_batch:010d}.parquet")
+            try:
+                df = pd.read_parquet(part)
+            except FileNotFoundError:
+                # Either an empty micro-batch, or the part was already merged into a compacted file
+                if self._load_compacted(min_batch=self.next_batch):
+                    read += 1
+                    continue
+            else:
+                self._upsert(df)
+            self.next_batch += 1
+            read += 1
+        return read
+
+    def window(self, window_size):
+        """
+        Returns the current moving averages of one window size, with the
+        same columns as load_stream_output: ["window_start", "moving_avg"].
+        """
+        if window_size not in self._frames:
+            values = self.windows.get(window_size, {})
+            self._frames[window_size] = pd.DataFrame(
+                {"window_start": list(values), "moving_avg": list(values.values())},
+                columns=["window_start", "moving_avg"],
+            ).sort_values("window_start").reset_index(drop=True)
+        return self._frames[window_size].copy()
+
+
+_tails = {}
+
+
+def load_parquet_stream_output(window_size, folder="moving_avg_parquet"):
+    """
+    Returns the moving averages of one window size from the Parquet stream output,
+    reading only micro-batches committed since the previous call.
+
+    Args:
+        window_size (str): Window size, e.g. "2 minutes".
+        folder (str): Output folder of compute_moving_averages.
+
+    Returns:
+        pd.DataFrame: Sorted DataFrame with columns ["window_start", "moving_avg"]
+    """
+    full_path = os.path.join(BASE_DIR, folder)
+    if full_path not in _tails:
+        _tails[full_path] = ParquetStreamTail(full_path)
+    tail = _tails[full_path]
+    tail.refresh()
+    return tail.window(window_size)
+
+
 def plot_peaks_and_valleys(df, title):
     """
     Plots a moving average time series with peaks and valleys highlighted,
@@ -185,21 +307,22 @@ def plot_trends(df, title):
     plt.close()
 
 
-def plot_overlay(window_sizes):
+def plot_overlay(window_sizes, source="csv"):
     """
     Plots overlay of multiple moving average series with different window sizes for comparison.
 
     Args:
         window_sizes (list): List of window sizes as strings, e.g., ["2 minutes", "3 minutes"]
+        source (str): "csv" for per-window CSV folders, "parquet" for the single Parquet output.
     """
     plt.figure(figsize=(14, 6))
     colors = ['blue', 'orange', 'green', 'purple', 'brown']
 
     for idx, win in enumerate(window_sizes):
         folder = f"moving_avg_output_{win.replace(' ', '_')}"
-        df = load_stream_output(folder)
+        df = load_parquet_stream_output(win) if source == "parquet" else load_stream_output(folder)
         if df.empty:
-            print(f"[WARN] No data found in {folder}, skipping.")
+            print(f"[WARN] No data found for {win}, skipping.")
             continue
         plt.plot(df["window_start"], df["moving_avg"], label=f"{win}", color=colors[idx % len(colors)], alpha=0.7)
 
@@ -221,14 +344,15 @@ if __name__ == "__main__":
     # - Increase NUM_POINTS and WRITER_DURATION in Bitcoin.example.ipynb
     # Sample usage on 2 hours worth of data with different window sizes
     WINDOW_SIZES = ["2 minutes", "3 minutes", "5 minutes"]
+    SOURCE = "parquet" if os.path.isdir(os.path.join(BASE_DIR, "moving_avg_parquet")) else "csv"
     for win in WINDOW_SIZES:
         folder = f"moving_avg_output_{win.replace(' ', '_')}"
-        df = load_stream_output(folder)
+        df = load_parquet_stream_output(win) if SOURCE == "parquet" else load_stream_output(folder)
         if df.empty:
-            print(f"[SKIP] No data in {folder}")
+            print(f"[SKIP] No data for {win}")
             continue
         title = f"Window {win}"
         plot_peaks_and_valleys(df.copy(), title)
         plot_trends(df.copy(), title)
 
-    plot_overlay(WINDOW_SIZES)
+    plot_overlay(WINDOW_SIZES, source=SOURCE)
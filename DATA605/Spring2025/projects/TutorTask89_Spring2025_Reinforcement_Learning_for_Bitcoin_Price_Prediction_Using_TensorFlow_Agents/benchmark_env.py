@@ -0,0 +1,106 @@
+"""
+Script for benchmarking the Bitcoin trading environments.
+
+Measures environment steps per second of BitcoinTradingEnv,
+ArrayBitcoinTradingEnv and BatchedBitcoinTradingEnv with random actions,
+on the normalised training data or on a synthetic price series.
+"""
+
+import argparse
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from bitcoin_trading_env import (
+    BitcoinTradingEnv,
+    ArrayBitcoinTradingEnv,
+    BatchedBitcoinTradingEnv,
+)
+import config
+
+
+def make_synthetic_data(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Creates a random-walk price series with the default feature columns.
+
+    :param num_rows: Number of rows.
+    :param seed: Random seed.
+    :return: DataFrame with 'Close' and the default feature columns.
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0, 0.02, num_rows)
+    close = 30000.0 * np.exp(np.cumsum(log_returns))
+    volume = rng.lognormal(20.0, 0.5, num_rows)
+    df = pd.DataFrame({"Close": close, "Volume": volume, "Log_Returns": log_returns})
+    df["Price_SMA_20"] = df["Close"].rolling(20, min_periods=1).mean()
+    df["Volume_SMA_20"] = df["Volume"].rolling(20, min_periods=1).mean()
+    return df
+
+
+def benchmark(env, num_steps: int, seed: int = 0) -> float:
+    """
+    Steps the environment with random actions and returns steps per second.
+    For a batched environment every episode step counts as one step.
+
+    :param env: PyEnvironment to benchmark.
+    :param num_steps: Number of (per-episode) steps to take.
+    :param seed: Random seed for the actions.
+    :return: Steps per second.
+    """
+    rng = np.random.default_rng(seed)
+    batch_size = env.batch_size if env.batched else None
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        if batch_size is None:
+            action = np.int32(rng.integers(0, 3))
+        else:
+            action = rng.integers(0, 3, size=batch_size).astype(np.int32)
+        time_step = env.step(action)
+        # The original environment does not restart by itself
+        if batch_size is None and time_step.is_last():
+            env.reset()
+    elapsed = time.perf_counter() - start
+    return num_steps * (batch_size or 1) / elapsed
+
+
+def main(data_path: Optional[str], num_rows: int, num_steps: int, batch_sizes: list) -> None:
+    if data_path:
+        df = pd.read_csv(data_path)
+    else:
+        df = make_synthetic_data(num_rows)
+    print(f"Data: {len(df)} rows, window_size={config.WINDOW_SIZE}, {num_steps} steps per run")
+    baseline = benchmark(
+        BitcoinTradingEnv(df, window_size=config.WINDOW_SIZE, fee=config.FEE), num_steps
+    )
+    print(f"{'BitcoinTradingEnv':<32} {baseline:>12,.0f} steps/s")
+    results = [
+        (
+            "ArrayBitcoinTradingEnv",
+            ArrayBitcoinTradingEnv(df, window_size=config.WINDOW_SIZE, fee=config.FEE),
+        )
+    ]
+    for n in batch_sizes:
+        results.append(
+            (
+                f"BatchedBitcoinTradingEnv(n={n})",
+                BatchedBitcoinTradingEnv(
+                    df, num_envs=n, window_size=config.WINDOW_SIZE, fee=config.FEE, seed=0
+                ),
+            )
+        )
+    for name, env in results:
+        rate = benchmark(env, num_steps)
+        print(f"{name:<32} {rate:>12,.0f} steps/s  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-path", default=None, help=f"CSV to use, e.g. {config.NORM_TRAIN_DATA_PATH} (default: synthetic data)")
+    parser.add_argument("--rows", type=int, default=3000, help="Rows of synthetic data")
+    parser.add_argument("--steps", type=int, default=5000, help="Steps per benchmark run")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    args = parser.parse_args()
+    main(args.data_path, args.rows, args.steps, args.batch_sizes)
@@ -147,3 +147,270 @@ class BitcoinTradingEnv(py_environment.PyEnvironment):
             block = np.concatenate([pad_block, block], axis=0)
         pos_col = np.full((self.window_size, 1), self._position, dtype=np.float32)
         return np.concatenate([block, pos_col], axis=1)
+
+
+def _precompute_arrays(
+    df: pd.DataFrame, window_size: int, feature_columns: List[str]
+) -> tuple:
+    """
+    Precomputes the arrays shared by the array-backed environments.
+
+    :param df: DataFrame containing the Bitcoin price data.
+    :param window_size: Size of the observation window.
+    :param feature_columns: List of feature columns used in the observation space.
+    :return: Tuple (windows, log_returns) where `windows[t]` is a read-only
+        (window_size, num_feats) view of the features ending at tick `t`, and
+        `log_returns[t]` is log(Close[t+1] / Close[t]) (0 at the last tick).
+    """
+    features = df[feature_columns].to_numpy(dtype=np.float32)
+    # Prepend window_size-1 copies of the first row, as _get_observation pads
+    padded = np.ascontiguousarray(
+        np.concatenate(
+            [np.repeat(features[0:1, :], window_size - 1, axis=0), features], axis=0
+        )
+    )
+    row_stride, col_stride = padded.strides
+    windows = np.lib.stride_tricks.as_strided(
+        padded,
+        shape=(len(features), window_size, features.shape[1]),
+        strides=(row_stride, row_stride, col_stride),
+        writeable=False,
+    )
+    close = df["Close"].to_numpy(dtype=np.float64)
+    log_returns = np.zeros(len(close), dtype=np.float64)
+    log_returns[:-1] = np.log(close[1:] / close[:-1])
+    return windows, log_returns
+
+
+class ArrayBitcoinTradingEnv(BitcoinTradingEnv):
+    """
+    Array-backed version of BitcoinTradingEnv.
+
+    The feature matrix is converted once to a contiguous float32 array and
+    observations are read from stride-trick window views, instead of slicing
+    the DataFrame at every step. Rewards and observations are identical to
+    BitcoinTradingEnv.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        window_size: int = 20,
+        fee: float = 0.001,
+        feature_columns: Optional[List[str]] = None,
+    ):
+        """
+        Initializes the array-backed Bitcoin trading environment.
+
+        :param df: DataFrame containing the Bitcoin price data.
+        :param window_size: Size of the observation window.
+        :param fee: Transaction fee for buying/selling Bitcoin per trade (fraction of the trade amount).
+        :param feature_columns: (Optional) List of feature columns to be used in the observation space.
+        """
+        super().__init__(df, window_size, fee, feature_columns)
+        self._windows, self._log_returns = _precompute_arrays(
+            df, self.window_size, self.feature_columns
+        )
+        self._num_ticks: int = len(df)
+        self._episode_ended: bool = False
+
+    def _reset(self) -> ts.TimeStep:
+        """
+        Resets the environment to the initial state.
+        """
+        self._episode_ended = False
+        return super()._reset()
+
+    def _step(self, action: int) -> ts.TimeStep:
+        """
+        Takes a step in the environment based on the action taken
+        (0 = Sell/Go Short, 1 = Hold, 2 = Buy/Go Long).
+        Starts a new episode if the previous step ended the current one.
+        """
+        if self._episode_ended:
+            return self.reset()
+        prev_pos = self._position
+        if action == 0:
+            self._position = -1
+        elif action == 2:
+            self._position = 1
+        log_ret = self._log_returns[self._current_tick]
+        trade_cost = abs(self._position - prev_pos) * self.fee
+        reward = (self._position * log_ret) - trade_cost
+        self._current_tick += 1
+        if self._current_tick >= self._num_ticks - 1:
+            self._episode_ended = True
+            return ts.termination(self._get_observation(), reward)
+        return ts.transition(self._get_observation(), reward=reward, discount=1.0)
+
+    def _get_observation(self) -> np.ndarray:
+        """
+        Returns an array of shape (window_size, num_price_feats+1) built from
+        the precomputed window view and a constant column of self._position.
+        """
+        obs = np.empty((self.window_size, self.num_price_feats + 1), dtype=np.float32)
+        obs[:, :-1] = self._windows[self._current_tick]
+        obs[:, -1] = self._position
+        return obs
+
+
+class BatchedBitcoinTradingEnv(py_environment.PyEnvironment):
+    """
+    Batched Bitcoin trading environment stepping `num_envs` independent
+    episodes over the same data with vectorized NumPy operations.
+
+    Each episode resets on its own: the step after an episode's LAST step
+    returns a FIRST step for that episode and ignores its action, as
+    expected by TF-Agents drivers.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        num_envs: int = 8,
+        window_size: int = 20,
+        fee: float = 0.001,
+        feature_columns: Optional[List[str]] = None,
+        random_starts: bool = True,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initializes the batched Bitcoin trading environment.
+
+        :param df: DataFrame containing the Bitcoin price data.
+        :param num_envs: Number of episodes stepped in parallel.
+        :param window_size: Size of the observation window.
+        :param fee: Transaction fee for buying/selling Bitcoin per trade (fraction of the trade amount).
+        :param feature_columns: (Optional) List of feature columns to be used in the observation space.
+        :param random_starts: Whether episodes start at a random tick, so the
+            parallel episodes cover different parts of the data. If False, all
+            episodes start at the first full window like BitcoinTradingEnv.
+        :param seed: (Optional) Seed for the random start ticks.
+        """
+        super().__init__()
+        self._df: pd.DataFrame = df
+        self.num_envs: int = num_envs
+        self.window_size: int = window_size
+        self.fee: float = fee
+        self.random_starts: bool = random_starts
+        self._rng = np.random.default_rng(seed)
+        self.feature_columns: List[str] = feature_columns or [
+            "Log_Returns",
+            "Price_SMA_20",
+            "Volume_SMA_20",
+            "Volume",
+        ]
+        self.num_price_feats: int = len(self.feature_columns)
+        self._windows, self._log_returns = _precompute_arrays(
+            df, self.window_size, self.feature_columns
+        )
+        self._num_ticks: int = len(df)
+        # Internal State (one entry per episode)
+        self._ticks = np.full(num_envs, self.window_size - 1, dtype=np.int64)
+        self._positions = np.zeros(num_envs, dtype=np.int64)
+        self._episode_ended = np.zeros(num_envs, dtype=bool)
+        # Specifications (per episode, without the batch dimension)
+        self._observation_spec = array_spec.BoundedArraySpec(
+            shape=(self.window_size, self.num_price_feats + 1),
+            dtype=np.float32,
+            minimum=-np.inf,
+            maximum=np.inf,
+            name="observation",
+        )
+        self._action_spec = array_spec.BoundedArraySpec(
+            shape=(),
+            dtype=np.int32,
+            minimum=0,
+            maximum=2,
+            name="action",
+        )
+
+    @property
+    def batched(self) -> bool:
+        return True
+
+    @property
+    def batch_size(self) -> int:
+        return self.num_envs
+
+    def action_spec(self) -> array_spec.BoundedArraySpec:
+        """
+        Returns the action specification for a single episode.
+        """
+        return self._action_spec
+
+    def observation_spec(self) -> array_spec.BoundedArraySpec:
+        """
+        Returns the observation specification for a single episode.
+        """
+        return self._observation_spec
+
+    def _start_ticks(self, n: int) -> np.ndarray:
+        """
+        Returns the start ticks of `n` new episodes.
+        """
+        first_tick = self.window_size - 1
+        if not self.random_starts or self._num_ticks - 1 <= first_tick:
+            return np.full(n, first_tick, dtype=np.int64)
+        # Leave at least one step before the end of the data
+        return self._rng.integers(first_tick, self._num_ticks - 1, size=n)
+
+    def _reset(self) -> ts.TimeStep:
+        """
+        Resets all episodes to their initial state.
+        """
+        self._ticks = self._start_ticks(self.num_envs)
+        self._positions[:] = 0
+        self._episode_ended[:] = False
+        return ts.TimeStep(
+            step_type=np.full(self.num_envs, ts.StepType.FIRST, dtype=np.int32),
+            reward=np.zeros(self.num_envs, dtype=np.float32),
+            discount=np.ones(self.num_envs, dtype=np.float32),
+            observation=self._get_observations(),
+        )
+
+    def _step(self, action: np.ndarray) -> ts.TimeStep:
+        """
+        Takes one step in every episode, based on the batch of actions taken
+        (0 = Sell/Go Short, 1 = Hold, 2 = Buy/Go Long).
+        """
+        action = np.asarray(action).reshape(self.num_envs)
+        restart = self._episode_ended.copy()
+        prev_pos = self._positions
+        new_pos = np.where(action == 0, -1, np.where(action == 2, 1, prev_pos))
+        log_ret = self._log_returns[self._ticks]
+        trade_cost = np.abs(new_pos - prev_pos) * self.fee
+        reward = (new_pos * log_ret - trade_cost).astype(np.float32)
+        self._positions = new_pos
+        self._ticks = self._ticks + 1
+        self._episode_ended = self._ticks >= self._num_ticks - 1
+        step_type = np.where(
+            self._episode_ended, ts.StepType.LAST, ts.StepType.MID
+        ).astype(np.int32)
+        discount = np.where(self._episode_ended, 0.0, 1.0).astype(np.float32)
+        # Episodes that ended on the previous step start over instead
+        if restart.any():
+            self._ticks[restart] = self._start_ticks(int(restart.sum()))
+            self._positions[restart] = 0
+            self._episode_ended[restart] = False
+            step_type[restart] = ts.StepType.FIRST
+            reward[restart] = 0.0
+            discount[restart] = 1.0
+        return ts.TimeStep(
+            step_type=step_type,
+            reward=reward,
+            discount=discount,
+            observation=self._get_observations(),
+        )
+
+    def _get_observations(self) -> np.ndarray:
+        """
+        Returns an array of shape (num_envs, window_size, num_price_feats+1).
+        """
+        obs = np.empty(
+            (self.num_envs, self.window_size, self.num_price_feats + 1),
+            dtype=np.float32,
+        )
+        obs[:, :, :-1] = self._windows[self._ticks]
+        obs[:, :, -1] = self._positions[:, None]
+        return obs
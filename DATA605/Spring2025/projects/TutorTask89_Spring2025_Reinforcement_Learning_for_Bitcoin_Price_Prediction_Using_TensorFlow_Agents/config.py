@@ -27,6 +27,9 @@ TEST_DATA_PATH: str = "data/test_data.csv"
 NORM_TRAIN_DATA_PATH: str = "data/train_data_normalized.csv"
 NORM_VALIDATION_DATA_PATH: str = "data/validation_data_normalized.csv"
 NORM_TEST_DATA_PATH: str = "data/test_data_normalized.csv"
+OHLCV_DATA_PATH: str = "data/ohlcv_data.csv"  # Cleaned OHLCV data, the feature store source
+FEATURE_STORE_DIR: str = "data/feature_store"
+USE_FEATURE_STORE: bool = True  # Train from the feature store instead of the normalized CSVs
 
 POLICY_SAVE_PATH: str = "policy"  # Directory to save the trained policy
 
@@ -42,6 +45,7 @@ NUM_FEATURES_IN_OBSERVATION: int = (
     NUM_MARKET_FEATURES + NUM_POSITION_FEATURES
 )  # Total number of features in the observation space
 FEE = 0.001  # Transaction fee for buy/sell actions
+NUM_PARALLEL_ENVS: int = 1  # Episodes stepped together by the training environment (>1 uses the batched env)
 
 # #############################################################################
 # Seed
@@ -114,3 +118,9 @@ EPSILON_DECAY_TRAINING_STEPS: int = int(NUM_TRAINING_ITERATIONS * 0.7)
 # #############################################################################
 EVAL_INTERVAL: int = 1000  # e.g., Evaluate every 1000 training steps
 NUM_EVAL_EPISODES: int = 5  # Number of episodes to evaluate the agent
+
+# #############################################################################
+# Hyperparameter Sweep Configuration
+# #############################################################################
+SWEEP_RESULTS_PATH: str = "sweeps/results.sqlite"  # Shared results table of sweep_dqn.py
+SWEEP_THREADS_PER_RUN: int = 1  # TensorFlow threads (and pinned cores) per sweep process
@@ -18,6 +18,8 @@ if __name__ == "__main__":
             end_date="2025-04-29",
         )
         cleaned_df = utils.clean_yahoo_data(data)
+        # Source of the feature store used by train_dqn.py
+        utils.save_to_csv(cleaned_df, config.OHLCV_DATA_PATH)
         features_df = utils.calculate_features(cleaned_df)
         utils.save_to_csv(features_df, config.SRC_DATA_PATH)
         utils.split_yahoo_data(features_df)
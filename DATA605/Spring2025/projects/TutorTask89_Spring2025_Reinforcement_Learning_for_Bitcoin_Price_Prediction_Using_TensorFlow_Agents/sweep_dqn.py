@@ -0,0 +1,568 @@
+"""
+Script for running DQN hyper-parameter sweeps in parallel.
+
+Every configuration (learning rate, epsilon schedule, window size, seed) is
+trained in its own CPU process with a fixed number of TensorFlow threads,
+pinned to its own cores when possible. The processes stream their metrics
+into a shared SQLite results table, and the runner stops runs whose
+validation Sharpe ratio falls behind the other runs at the same step.
+
+TensorFlow is only imported inside the worker processes, after their thread
+settings are in place.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+
+TRADING_DAYS_PER_YEAR = 365  # Bitcoin trades every day
+
+
+# #############################################################################
+# Results Table
+# #############################################################################
+class SweepResults:
+    """
+    Shared results table of a sweep, stored in SQLite.
+
+    The `runs` table holds one row per configuration with its status, and the
+    `metrics` table one row per (run, step, metric). Every process opens its
+    own connection; WAL mode lets the runner read while workers write.
+    """
+
+    def __init__(self, path: str = config.SWEEP_RESULTS_PATH):
+        """
+        Opens (and creates if needed) the results database.
+
+        :param path: Path to the SQLite file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                params TEXT,
+                status TEXT,
+                stop_requested INTEGER DEFAULT 0,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS metrics (
+                run_id TEXT,
+                step INTEGER,
+                name TEXT,
+                value REAL,
+                wall_time REAL
+            );
+            CREATE INDEX IF NOT EXISTS metrics_by_name ON metrics (name, run_id, step);
+            """
+        )
+        self._conn.commit()
+
+    def add_run(self, run_id: str, params: dict) -> None:
+        """
+        Registers a queued run (replacing an earlier run with the same id).
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM metrics WHERE run_id = ?", (run_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, params, status) VALUES (?, ?, 'queued')",
+                (run_id, json.dumps(params, sort_keys=True)),
+            )
+
+    def set_status(self, run_id: str, status: str, error: Optional[str] = None) -> None:
+        """
+        Updates the status of a run ('running', 'finished', 'stopped' or 'failed').
+        """
+        now = time.time()
+        with self._conn:
+            if status == "running":
+                self._conn.execute(
+                    "UPDATE runs SET status = ?, started_at = ? WHERE run_id = ?",
+                    (status, now, run_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE runs SET status = ?, finished_at = ?, error = ? WHERE run_id = ?",
+                    (status, now, error, run_id),
+                )
+
+    def log_metrics(self, run_id: str, step: int, metrics: Dict[str, float]) -> None:
+        """
+        Appends metric values of a run at a training step.
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO metrics (run_id, step, name, value, wall_time) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, int(step), name, float(value), now) for name, value in metrics.items()],
+            )
+
+    def request_stop(self, run_id: str) -> None:
+        """
+        Asks a run to stop after its current evaluation.
+        """
+        with self._conn:
+            self._conn.execute("UPDATE runs SET stop_requested = 1 WHERE run_id = ?", (run_id,))
+
+    def stop_requested(self, run_id: str) -> bool:
+        """
+        Whether the runner asked the run to stop.
+        """
+        row = self._conn.execute(
+            "SELECT stop_requested FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def status(self, run_id: str) -> Optional[str]:
+        """
+        Returns the status of a run.
+        """
+        row = self._conn.execute("SELECT status FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row[0] if row else None
+
+    def metric(self, name: str) -> pd.DataFrame:
+        """
+        Returns all values of a metric as a DataFrame with 'run_id', 'step' and 'value'.
+        """
+        return pd.read_sql_query(
+            "SELECT run_id, step, value FROM metrics WHERE name = ? ORDER BY run_id, step",
+            self._conn,
+            params=(name,),
+        )
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Returns one row per run with its parameters, status and best validation Sharpe.
+        """
+        runs = pd.read_sql_query(
+            "SELECT run_id, params, status, started_at, finished_at FROM runs", self._conn
+        )
+        params = pd.DataFrame([json.loads(p) for p in runs.pop("params")], index=runs.index)
+        sharpe = self.metric("val_sharpe").groupby("run_id")["value"].agg(["max", "last"])
+        steps = self.metric("val_sharpe").groupby("run_id")["step"].max()
+        summary = pd.concat([runs, params], axis=1).set_index("run_id")
+        summary["best_val_sharpe"] = sharpe["max"]
+        summary["last_val_sharpe"] = sharpe["last"]
+        summary["last_eval_step"] = steps
+        summary["minutes"] = (summary.pop("finished_at") - summary.pop("started_at")) / 60
+        return summary.sort_values("best_val_sharpe", ascending=False)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# #############################################################################
+# Worker Process
+# #############################################################################
+def _set_threads(num_threads: int, cpus: Optional[List[int]]) -> None:
+    """
+    Pins the process to `cpus` and limits math-library threads.
+    Must run before TensorFlow is imported.
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[name] = str(num_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+
+def _load_splits(utils) -> Dict[str, Optional[pd.DataFrame]]:
+    """
+    Returns the normalised train and validation splits, as in train_dqn.py.
+    """
+    if config.USE_FEATURE_STORE and os.path.exists(config.OHLCV_DATA_PATH):
+        return utils.load_feature_store()
+    return {
+        "train": pd.read_csv(config.NORM_TRAIN_DATA_PATH),
+        "validation": pd.read_csv(config.NORM_VALIDATION_DATA_PATH),
+    }
+
+
+def sharpe_ratio(rewards: np.ndarray) -> float:
+    """
+    Annualised Sharpe ratio of per-step (daily) log returns.
+
+    :param rewards: Rewards of one episode.
+    :return: Sharpe ratio, or 0.0 for a constant reward series.
+    """
+    std = np.std(rewards)
+    if len(rewards) < 2 or std == 0:
+        return 0.0
+    return float(np.mean(rewards) / std * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+
+def train_run(
+    run_id: str,
+    params: dict,
+    results_path: str,
+    num_iterations: int,
+    eval_interval: int,
+    log_interval: int,
+    num_threads: int = 1,
+    cpus: Optional[List[int]] = None,
+) -> None:
+    """
+    Trains one DQN configuration and streams its metrics to the results table.
+
+    :param run_id: Id of the run in the results table.
+    :param params: Run parameters: learning_rate, initial_epsilon, min_epsilon,
+        epsilon_decay_steps, window_size and seed.
+    :param results_path: Path to the SQLite results table.
+    :param num_iterations: Number of training iterations.
+    :param eval_interval: Training steps between validation evaluations.
+    :param log_interval: Training steps between loss records.
+    :param num_threads: TensorFlow intra-op threads of the process.
+    :param cpus: CPU cores the process is pinned to (None to not pin).
+    """
+    _set_threads(num_threads, cpus)
+    results = SweepResults(results_path)
+    results.set_status(run_id, "running")
+    try:
+        import tensorflow as tf
+        from tf_agents.environments import tf_py_environment
+        from tf_agents.policies import random_tf_policy
+        from tf_agents.utils import common
+
+        import tensorflow_agents_utils as utils
+
+        tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        utils.logging_setup(
+            log_file=os.path.join(os.path.dirname(results_path) or ".", f"{run_id}.log"),
+            enable_console=False,
+        )
+        tf.random.set_seed(params["seed"])
+        np.random.seed(params["seed"])
+
+        splits = _load_splits(utils)
+        train_tf_env = utils.create_btc_env(
+            window_size=params["window_size"],
+            fee=config.FEE,
+            num_parallel_envs=config.NUM_PARALLEL_ENVS,
+            seed=params["seed"],
+            df=splits["train"],
+        )
+        eval_py_env = utils.create_btc_env(
+            window_size=params["window_size"],
+            fee=config.FEE,
+            wrap_in_tf_env=False,
+            df=splits["validation"],
+        )
+        eval_tf_env = tf_py_environment.TFPyEnvironment(eval_py_env)
+
+        train_step_counter = common.create_variable("train_step_counter", initial_value=0)
+        q_net = utils.create_q_network(
+            observation_spec=train_tf_env.observation_spec(),
+            action_spec=train_tf_env.action_spec(),
+        )
+        agent = utils.create_dqn_agent(
+            time_step_spec=train_tf_env.time_step_spec(),
+            action_spec=train_tf_env.action_spec(),
+            q_net=q_net,
+            train_step_counter=train_step_counter,
+            optimizer=tf.keras.optimizers.Adam(learning_rate=params["learning_rate"]),
+        )
+        replay_buffer = utils.create_replay_buffer(
+            tf_agent=agent, environment_batch_size=train_tf_env.batch_size
+        )
+        current_epsilon = tf.Variable(
+            params["initial_epsilon"], dtype=tf.float32, trainable=False
+        )
+        epsilon_decay_rate = (
+            params["initial_epsilon"] - params["min_epsilon"]
+        ) / max(1, params["epsilon_decay_steps"])
+        collect_policy = utils.create_collection_policy(agent, current_epsilon.value)
+        initial_collect_driver = utils.create_data_collection_driver(
+            train_tf_env,
+            random_tf_policy.RandomTFPolicy(
+                train_tf_env.time_step_spec(), train_tf_env.action_spec()
+            ),
+            replay_buffer,
+            config.INITIAL_COLLECT_STEPS,
+        )
+        training_collect_driver = utils.create_data_collection_driver(
+            train_tf_env,
+            collect_policy,
+            replay_buffer,
+            config.COLLECT_STEPS_PER_ITERATION,
+        )
+        dataset_iterator = iter(utils.create_training_dataset(replay_buffer, agent))
+        utils.initial_collect(initial_collect_driver, replay_buffer)
+
+        agent.train = common.function(agent.train)
+        greedy_action = common.function(agent.policy.action)
+
+        def evaluate() -> Dict[str, float]:
+            # One greedy episode over the validation split
+            rewards = []
+            eval_ts = eval_tf_env.reset()
+            while not eval_ts.is_last():
+                eval_ts = eval_tf_env.step(greedy_action(eval_ts).action)
+                rewards.append(float(eval_ts.reward.numpy()[0]))
+            rewards = np.asarray(rewards)
+            return {"val_sharpe": sharpe_ratio(rewards), "val_return": float(rewards.sum())}
+
+        time_step = train_tf_env.reset()
+        start = time.perf_counter()
+        status = "finished"
+        for _ in range(num_iterations):
+            time_step, _ = training_collect_driver.run(time_step=time_step)
+            # The batched environment restarts finished episodes by itself
+            if train_tf_env.batch_size == 1 and time_step.is_last():
+                time_step = train_tf_env.reset()
+            train_loss = utils.train_one_iteration(dataset_iterator, agent)
+            current_step = int(train_step_counter.numpy())
+            current_epsilon.assign(
+                max(
+                    params["min_epsilon"],
+                    params["initial_epsilon"] - epsilon_decay_rate * current_step,
+                )
+            )
+            if current_step % log_interval == 0:
+                results.log_metrics(
+                    run_id,
+                    current_step,
+                    {
+                        "loss": float(train_loss.numpy()),
+                        "epsilon": float(current_epsilon.numpy()),
+                        "steps_per_sec": current_step / (time.perf_counter() - start),
+                    },
+                )
+            if current_step % eval_interval == 0:
+                results.log_metrics(run_id, current_step, evaluate())
+                if results.stop_requested(run_id):
+                    status = "stopped"
+                    break
+        results.set_status(run_id, status)
+        train_tf_env.close()
+        eval_tf_env.close()
+    except Exception as e:
+        results.set_status(run_id, "failed", error=repr(e))
+        raise
+    finally:
+        results.close()
+
+
+# #############################################################################
+# Sweep Runner
+# #############################################################################
+def make_grid(
+    learning_rates: List[float],
+    epsilon_decay_fractions: List[float],
+    min_epsilons: List[float],
+    window_sizes: List[int],
+    seeds: List[int],
+    num_iterations: int,
+    initial_epsilon: float = config.INITIAL_EPSILON,
+) -> Dict[str, dict]:
+    """
+    Builds the cartesian product of the sweep values.
+
+    :return: Dictionary mapping run ids to run parameters.
+    """
+    grid = {}
+    for lr, decay, min_eps, window, seed in itertools.product(
+        learning_rates, epsilon_decay_fractions, min_epsilons, window_sizes, seeds
+    ):
+        run_id = f"lr{lr:g}_decay{decay:g}_eps{min_eps:g}_win{window}_seed{seed}"
+        grid[run_id] = {
+            "learning_rate": lr,
+            "initial_epsilon": initial_epsilon,
+            "min_epsilon": min_eps,
+            "epsilon_decay_steps": int(decay * num_iterations),
+            "window_size": window,
+            "seed": seed,
+        }
+    return grid
+
+
+def find_hopeless_runs(
+    sharpe: pd.DataFrame,
+    running: List[str],
+    grace_evals: int = 2,
+    min_peers: int = 2,
+    quantile: float = 0.5,
+    min_sharpe: Optional[float] = None,
+) -> List[str]:
+    """
+    Median-stopping rule on validation Sharpe.
+
+    A running run is hopeless if, after `grace_evals` evaluations, its best
+    Sharpe so far is below `min_sharpe`, or below the `quantile` of the best
+    Sharpe so far of at least `min_peers` other runs at the same step.
+
+    :param sharpe: Validation Sharpe records ('run_id', 'step', 'value').
+    :param running: Ids of the runs that can be stopped.
+    :return: Ids of the runs to stop.
+    """
+    if sharpe.empty:
+        return []
+    sharpe = sharpe.sort_values(["run_id", "step"]).copy()
+    sharpe["best"] = sharpe.groupby("run_id")["value"].cummax()
+    hopeless = []
+    for run_id, history in sharpe.groupby("run_id"):
+        if run_id not in running or len(history) < grace_evals:
+            continue
+        step, best = history["step"].iloc[-1], history["best"].iloc[-1]
+        if min_sharpe is not None and best < min_sharpe:
+            hopeless.append(run_id)
+            continue
+        peers = sharpe[(sharpe["step"] == step) & (sharpe["run_id"] != run_id)]["best"]
+        if len(peers) >= min_peers and best < peers.quantile(quantile):
+            hopeless.append(run_id)
+    return hopeless
+
+
+def run_sweep(
+    grid: Dict[str, dict],
+    results_path: str = config.SWEEP_RESULTS_PATH,
+    num_workers: Optional[int] = None,
+    threads_per_worker: int = config.SWEEP_THREADS_PER_RUN,
+    num_iterations: int = config.NUM_TRAINING_ITERATIONS,
+    eval_interval: int = config.EVAL_INTERVAL,
+    log_interval: int = config.LOG_INTERVAL,
+    grace_evals: int = 2,
+    min_sharpe: Optional[float] = None,
+    poll_seconds: float = 2.0,
+) -> pd.DataFrame:
+    """
+    Trains every configuration of `grid` in its own process and stops hopeless runs.
+
+    :param grid: Dictionary mapping run ids to run parameters (see make_grid).
+    :param results_path: Path to the SQLite results table.
+    :param num_workers: Number of concurrent runs (default: cores // threads_per_worker).
+    :param threads_per_worker: TensorFlow threads (and pinned cores) per run.
+    :param num_iterations: Training iterations per run.
+    :param eval_interval: Training steps between validation evaluations.
+    :param log_interval: Training steps between loss records.
+    :param grace_evals: Evaluations before a run can be stopped early.
+    :param min_sharpe: Optional Sharpe floor below which runs are stopped.
+    :param poll_seconds: Seconds between checks of the results table.
+    :return: Summary of the sweep, best run first.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if num_workers is None:
+        num_workers = max(1, len(cores) // threads_per_worker)
+    # One block of cores per worker slot, if there are enough of them
+    slots = [
+        cores[i * threads_per_worker : (i + 1) * threads_per_worker]
+        if (i + 1) * threads_per_worker <= len(cores)
+        else None
+        for i in range(num_workers)
+    ]
+    results = SweepResults(results_path)
+    for run_id, params in grid.items():
+        results.add_run(run_id, params)
+    print(
+        f"Sweep of {len(grid)} runs on {num_workers} workers x {threads_per_worker} threads, "
+        f"results in {results_path}"
+    )
+    # Spawned workers import TensorFlow fresh, with their own thread settings
+    ctx = mp.get_context("spawn")
+    pending = list(grid)
+    running: Dict[str, tuple] = {}
+    free_slots = list(range(num_workers))
+    start = time.time()
+    try:
+        while pending or running:
+            while pending and free_slots:
+                run_id = pending.pop(0)
+                slot = free_slots.pop(0)
+                process = ctx.Process(
+                    target=train_run,
+                    args=(
+                        run_id,
+                        grid[run_id],
+                        results_path,
+                        num_iterations,
+                        eval_interval,
+                        log_interval,
+                        threads_per_worker,
+                        slots[slot],
+                    ),
+                    name=run_id,
+                )
+                process.start()
+                running[run_id] = (process, slot)
+            for run_id, (process, slot) in list(running.items()):
+                if not process.is_alive():
+                    process.join()
+                    if process.exitcode != 0 and results.status(run_id) == "running":
+                        results.set_status(run_id, "failed", error=f"exit code {process.exitcode}")
+                    print(f"[{time.time() - start:7.0f}s] {run_id}: {results.status(run_id)}")
+                    del running[run_id]
+                    free_slots.append(slot)
+            for run_id in find_hopeless_runs(
+                results.metric("val_sharpe"),
+                [r for r in running if not results.stop_requested(r)],
+                grace_evals=grace_evals,
+                min_sharpe=min_sharpe,
+            ):
+                print(f"[{time.time() - start:7.0f}s] {run_id}: stopping, validation Sharpe behind")
+                results.request_stop(run_id)
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        for process, _ in running.values():
+            process.terminate()
+        raise
+    summary = results.summary()
+    results.close()
+    print(f"Sweep finished in {(time.time() - start) / 60:.1f} min")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learning-rates", type=float, nargs="+", default=[1e-4, 1e-5])
+    parser.add_argument("--epsilon-decay-fractions", type=float, nargs="+", default=[0.7], help="Share of the iterations over which epsilon decays")
+    parser.add_argument("--min-epsilons", type=float, nargs="+", default=[config.MIN_EPSILON])
+    parser.add_argument("--window-sizes", type=int, nargs="+", default=[config.WINDOW_SIZE])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[config.RANDOM_SEED])
+    parser.add_argument("--iterations", type=int, default=config.NUM_TRAINING_ITERATIONS)
+    parser.add_argument("--eval-interval", type=int, default=config.EVAL_INTERVAL)
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent runs (default: cores // threads)")
+    parser.add_argument("--threads", type=int, default=config.SWEEP_THREADS_PER_RUN, help="TensorFlow threads per run")
+    parser.add_argument("--grace-evals", type=int, default=2, help="Evaluations before a run can be stopped")
+    parser.add_argument("--min-sharpe", type=float, default=None, help="Stop runs whose best validation Sharpe is below this")
+    parser.add_argument("--results", default=config.SWEEP_RESULTS_PATH)
+    args = parser.parse_args()
+    sweep_grid = make_grid(
+        args.learning_rates,
+        args.epsilon_decay_fractions,
+        args.min_epsilons,
+        args.window_sizes,
+        args.seeds,
+        args.iterations,
+    )
+    sweep_summary = run_sweep(
+        sweep_grid,
+        results_path=args.results,
+        num_workers=args.workers,
+        threads_per_worker=args.threads,
+        num_iterations=args.iterations,
+        eval_interval=args.eval_interval,
+        grace_evals=args.grace_evals,
+        min_sharpe=args.min_sharpe,
+    )
+    print(sweep_summary.to_string())
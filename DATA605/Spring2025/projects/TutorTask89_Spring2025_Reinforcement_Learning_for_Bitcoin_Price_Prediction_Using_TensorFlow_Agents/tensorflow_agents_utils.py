@@ -13,7 +13,9 @@ Functions include:
 - calculate_normalization_params: Calculates normalization parameters for specified columns in the DataFrame.
 - normalize_data: Normalizes the training, validation, and test data using the calculated parameters.
 - ingest_bitcoin_data: Loads, cleans, feature-engineers, and returns a DataFrame.
-- create_btc_env: Creates a Bitcoin trading environment using the BitcoinTradingEnv class.
+- build_feature_store: Computes, splits and normalizes features and saves them as .npy arrays.
+- load_feature_store: Loads the memory-mapped normalized splits, building them on first use.
+- create_btc_env: Creates a Bitcoin trading environment (plain, array-backed or batched).
 - create_q_network: Creates a Q-Network for the DQN agent.
 - create_dqn_agent: Creates and initializes a TF-Agents DqnAgent.
 - create_collection_policy: Creates an EpsilonGreedyPolicy for data collection.
@@ -27,11 +29,15 @@ Functions include:
 """
 
 import re, os
+import hashlib
+import json
 import logging
-from typing import Optional, List, Union, Tuple, Any, Callable
+import shutil
+from typing import Optional, List, Union, Tuple, Any, Callable, Dict
 
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 import yfinance as yf
 import tensorflow as tf
 import matplotlib.pyplot as plt
@@ -45,7 +51,11 @@ from tf_agents.policies import tf_policy
 from tf_agents.networks import q_network
 from tf_agents.replay_buffers import tf_uniform_replay_buffer
 from tf_agents.drivers import dynamic_step_driver
-from bitcoin_trading_env import BitcoinTradingEnv
+from bitcoin_trading_env import (
+    BitcoinTradingEnv,
+    ArrayBitcoinTradingEnv,
+    BatchedBitcoinTradingEnv,
+)
 import config
 
 
@@ -277,14 +287,27 @@ def calculate_features(
     try:
         # Create a copy to avoid modifying the original
         df = df.copy()
+        close = df["Close"].to_numpy(dtype=np.float64)
+        volume = df["Volume"].to_numpy(dtype=np.float64)
         # Compute log returns for price
-        df["Log_Returns"] = np.log(df["Close"] / df["Close"].shift(1))
-        # Compute price SMAs
+        log_returns = np.full(len(close), np.nan)
+        log_returns[1:] = np.log(close[1:] / close[:-1])
+        features = {"Log_Returns": log_returns}
+        # Compute price and volume SMAs together, one sliding window per window size
+        prices_and_volumes = np.column_stack([close, volume])
+        smas = {}
+        for window in set(price_sma_windows.values()) | set(volume_sma_windows.values()):
+            means = np.full((len(close), 2), np.nan)
+            if window <= len(close):
+                means[window - 1 :] = sliding_window_view(
+                    prices_and_volumes, window, axis=0
+                ).mean(axis=-1)
+            smas[window] = means
         for name, window in price_sma_windows.items():
-            df[name] = df["Close"].rolling(window=window).mean()
-        # Compute volume SMAs
+            features[name] = smas[window][:, 0]
         for name, window in volume_sma_windows.items():
-            df[name] = df["Volume"].rolling(window=window).mean()
+            features[name] = smas[window][:, 1]
+        df = df.assign(**features)
         # Remove rows with missing values if required
         if drop_na:
             df = df.dropna()
@@ -333,6 +356,26 @@ def calculate_normalization_params(
         raise
 
 
+def _normalization_arrays(params: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn normalization parameters into per-column offset and scale arrays.
+
+    :param params: Dictionary of normalization parameters
+    :return: Tuple of (offset, scale) arrays, in the order of `params`
+    """
+    offset, scale = [], []
+    for col, stat in params.items():
+        if "min" in stat:
+            offset.append(stat["min"])
+            scale.append(stat["max"] - stat["min"])
+        elif "mean" in stat:
+            offset.append(stat["mean"])
+            scale.append(stat["std"])
+        else:
+            raise ValueError(f"Unsupported normalization parameters for {col}: {stat}")
+    return np.asarray(offset, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
 # #############################################################################
 # Normalize Data
 # #############################################################################
@@ -345,17 +388,12 @@ def normalize_data(dataframes: list, params: dict) -> tuple:
     :return: Tuple of normalized DataFrames
     """
     try:
-        for col, stat in params.items():
-            if "min" in stat:
-                min_val = stat["min"]
-                max_val = stat["max"]
-                for df in dataframes:
-                    df[col] = (df[col] - min_val) / (max_val - min_val)
-            elif "mean" in stat:
-                mean = stat["mean"]
-                std = stat["std"]
-                for df in dataframes:
-                    df[col] = (df[col] - mean) / std
+        columns = list(params)
+        offset, scale = _normalization_arrays(params)
+        # Normalize all columns at once on copies, leaving the inputs untouched
+        dataframes = [df.copy() for df in dataframes]
+        for df in dataframes:
+            df[columns] = (df[columns].to_numpy(dtype=np.float64) - offset) / scale
         _LOG.info(
             f"Data normalization complete. Data shapes: {[df.shape for df in dataframes]}"
         )
@@ -397,6 +435,8 @@ def ingest_bitcoin_data(
     _LOG.info(f"Loading data for {ticker} from {start_date} to {end_date}")
     df = load_yahoo_data(ticker, start_date, end_date)
     df = clean_yahoo_data(df)
+    # Keep the cleaned OHLCV data as the source of the feature store
+    save_to_csv(df, config.OHLCV_DATA_PATH)
     df = calculate_features(df)
     _LOG.info("Ingestion complete: features calculated")
     # Save the data to CSV
@@ -420,25 +460,212 @@ def ingest_bitcoin_data(
     return df
 
 
+# #############################################################################
+# Feature Store
+# #############################################################################
+FEATURE_STORE_VERSION = 1
+FEATURE_STORE_SPLITS = ("train", "validation", "test")
+
+
+def default_feature_config() -> dict:
+    """
+    Return the feature configuration of the training pipeline.
+
+    :return: Dictionary with the SMA windows, normalized columns, normalization method and split dates
+    """
+    return {
+        "price_sma_windows": {"Price_SMA_20": 20},
+        "volume_sma_windows": {"Volume_SMA_20": 20},
+        "normalize_columns": ["Log_Returns", "Price_SMA_20", "Volume_SMA_20", "Volume"],
+        "normalization": "zscore",
+        "train_start_date": config.TRAIN_START_DATE,
+        "validation_start_date": config.VALIDATION_START_DATE,
+        "test_start_date": config.TEST_START_DATE,
+    }
+
+
+def feature_store_key(source_path: str, feature_config: dict) -> str:
+    """
+    Compute the feature store key from the source file content and the feature configuration.
+
+    :param source_path: Path to the cleaned OHLCV CSV file
+    :param feature_config: Feature configuration (see default_feature_config)
+    :return: Hexadecimal key naming the store entry
+    """
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(
+        json.dumps(
+            {"version": FEATURE_STORE_VERSION, "config": feature_config}, sort_keys=True
+        ).encode("utf-8")
+    )
+    return digest.hexdigest()[:16]
+
+
+def build_feature_store(
+    source_path: str = config.OHLCV_DATA_PATH,
+    feature_config: Optional[dict] = None,
+    store_dir: str = config.FEATURE_STORE_DIR,
+) -> str:
+    """
+    Compute features, split and normalize the source data, and save the splits as .npy arrays.
+
+    Each split is stored as a float64 array with the 'Close' column followed by the
+    normalized columns, plus an array of timestamps. Normalization parameters are
+    calculated on the training split only, as in preprocess_yahoo_btc_data.py.
+
+    :param source_path: Path to the cleaned OHLCV CSV file
+    :param feature_config: Feature configuration (defaults to default_feature_config())
+    :param store_dir: Root directory of the feature store
+    :return: Path to the store entry
+    """
+    feature_config = feature_config or default_feature_config()
+    key = feature_store_key(source_path, feature_config)
+    entry_dir = os.path.join(store_dir, key)
+    _LOG.info(f"Building feature store entry {entry_dir} from {source_path}")
+    try:
+        df = pd.read_csv(source_path, index_col=0)
+        df.index = pd.to_datetime(df.index, utc=True)
+        df = calculate_features(
+            df,
+            price_sma_windows=feature_config["price_sma_windows"],
+            volume_sma_windows=feature_config["volume_sma_windows"],
+        )
+        train_start, validation_start, test_start = (
+            pd.Timestamp(feature_config[name]).tz_localize("UTC")
+            for name in ("train_start_date", "validation_start_date", "test_start_date")
+        )
+        splits = {
+            "train": df.loc[train_start : validation_start - pd.Timedelta(days=1)],
+            "validation": df.loc[validation_start : test_start - pd.Timedelta(days=1)],
+            "test": df.loc[test_start:],
+        }
+        normalize_columns = list(feature_config["normalize_columns"])
+        params = calculate_normalization_params(
+            splits["train"], normalize_columns, method=feature_config["normalization"]
+        )
+        offset, scale = _normalization_arrays(params)
+        columns = ["Close"] + normalize_columns
+        # Write to a temporary directory and rename it, so readers never see a partial entry
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, split in splits.items():
+            values = split[columns].to_numpy(dtype=np.float64)
+            values[:, 1:] = (values[:, 1:] - offset) / scale
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+            np.save(os.path.join(tmp_dir, f"{name}_index.npy"), split.index.asi8)
+        meta = {
+            "version": FEATURE_STORE_VERSION,
+            "source_path": source_path,
+            "feature_config": feature_config,
+            "columns": columns,
+            "normalization_params": {
+                col: {k: float(v) for k, v in stat.items()} for col, stat in params.items()
+            },
+            "rows": {name: len(split) for name, split in splits.items()},
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        if os.path.exists(entry_dir):
+            # Built concurrently by another run from the same inputs
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, entry_dir)
+        _LOG.info(f"Feature store entry {key} built. Rows: {meta['rows']}")
+        return entry_dir
+    except Exception as e:
+        _LOG.error(f"Error building feature store: {e}")
+        raise
+
+
+def load_feature_store(
+    source_path: str = config.OHLCV_DATA_PATH,
+    feature_config: Optional[dict] = None,
+    store_dir: str = config.FEATURE_STORE_DIR,
+    rebuild: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Load the normalized train/validation/test splits, building them on first use.
+
+    The arrays are memory-mapped, so repeated DQN runs and sweeps share the page
+    cache instead of re-reading and re-normalizing the CSV data.
+
+    :param source_path: Path to the cleaned OHLCV CSV file
+    :param feature_config: Feature configuration (defaults to default_feature_config())
+    :param store_dir: Root directory of the feature store
+    :param rebuild: Whether to rebuild the entry even if it exists
+    :return: Dictionary mapping 'train', 'validation' and 'test' to read-only DataFrames
+    """
+    feature_config = feature_config or default_feature_config()
+    entry_dir = os.path.join(store_dir, feature_store_key(source_path, feature_config))
+    if rebuild:
+        shutil.rmtree(entry_dir, ignore_errors=True)
+    if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+        build_feature_store(source_path, feature_config, store_dir)
+    with open(os.path.join(entry_dir, "meta.json")) as f:
+        meta = json.load(f)
+    frames = {}
+    for name in FEATURE_STORE_SPLITS:
+        values = np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r")
+        index = pd.to_datetime(np.load(os.path.join(entry_dir, f"{name}_index.npy")), utc=True)
+        frames[name] = pd.DataFrame(values, index=index, columns=meta["columns"], copy=False)
+    _LOG.info(f"Loaded feature store entry {entry_dir}. Rows: {meta['rows']}")
+    return frames
+
+
 # #############################################################################
 # Create Bitcoin Trading Environment
 # #############################################################################
 def create_btc_env(
-    data_path: str,
+    data_path: Optional[str] = None,
     window_size: int = 20,
     fee: float = 0.001,
     feature_columns: Optional[List[str]] = None,
     wrap_in_tf_env: bool = True,
-) -> Union[BitcoinTradingEnv, tf_py_environment.TFPyEnvironment]:
-    _LOG.info(f"Attempting to create BitcoinTradingEnv with data from: {data_path}")
-    try:
-        df = pd.read_csv(data_path)
-        _LOG.info(
-            f"Successfully loaded data. Shape: {df.shape}, Columns: {df.columns.tolist()}"
-        )
-    except Exception as e:
-        _LOG.error(f"Failed to load data from {data_path}: {e}")
-        raise
+    num_parallel_envs: int = 1,
+    vectorized: bool = True,
+    seed: Optional[int] = None,
+    df: Optional[pd.DataFrame] = None,
+) -> Union[BitcoinTradingEnv, BatchedBitcoinTradingEnv, tf_py_environment.TFPyEnvironment]:
+    """
+    Creates a Bitcoin trading environment from a CSV file or a DataFrame.
+
+    Args:
+        data_path: Path to the CSV file with the 'Close' and feature columns.
+            Ignored if `df` is given.
+        window_size: Size of the observation window.
+        fee: Transaction fee per trade.
+        feature_columns: Feature columns for the observation (defaults to the available standard features).
+        wrap_in_tf_env: Whether to wrap the environment in a TFPyEnvironment.
+        num_parallel_envs: Number of episodes stepped together. Above 1, a
+            BatchedBitcoinTradingEnv with batch_size=num_parallel_envs is created.
+        vectorized: Whether a single environment uses the array-backed
+            ArrayBitcoinTradingEnv instead of the DataFrame-based BitcoinTradingEnv.
+        seed: Seed for the random episode starts of the batched environment.
+        df: DataFrame to use instead of reading `data_path`, e.g. a split
+            returned by load_feature_store.
+
+    Returns:
+        The (optionally TF-wrapped) environment.
+    """
+    if df is not None:
+        # The environments index rows by position
+        df = df.reset_index(drop=True)
+        data_path = data_path or "<DataFrame>"
+        _LOG.info(f"Creating BitcoinTradingEnv from a DataFrame. Shape: {df.shape}")
+    else:
+        _LOG.info(f"Attempting to create BitcoinTradingEnv with data from: {data_path}")
+        try:
+            df = pd.read_csv(data_path)
+            _LOG.info(
+                f"Successfully loaded data. Shape: {df.shape}, Columns: {df.columns.tolist()}"
+            )
+        except Exception as e:
+            _LOG.error(f"Failed to load data from {data_path}: {e}")
+            raise
     if "Close" not in df.columns:
         _LOG.error(
             f"'Close' column not found in {data_path}. It is required for reward calculation."
@@ -463,14 +690,25 @@ def create_btc_env(
             )
             raise ValueError(f"Missing feature columns: {missing_cols}")
         _LOG.info(f"Using specified feature columns for observation: {feature_columns}")
-    py_env = BitcoinTradingEnv(
-        df=df,
-        window_size=window_size,
-        fee=fee,
-        feature_columns=feature_columns,
-    )
+    if num_parallel_envs > 1:
+        py_env = BatchedBitcoinTradingEnv(
+            df=df,
+            num_envs=num_parallel_envs,
+            window_size=window_size,
+            fee=fee,
+            feature_columns=feature_columns,
+            seed=seed,
+        )
+    else:
+        env_class = ArrayBitcoinTradingEnv if vectorized else BitcoinTradingEnv
+        py_env = env_class(
+            df=df,
+            window_size=window_size,
+            fee=fee,
+            feature_columns=feature_columns,
+        )
     _LOG.info(
-        f"BitcoinTradingEnv (PyEnvironment) created successfully. Observation Spec: {py_env.observation_spec()}, Action Spec: {py_env.action_spec()}"
+        f"{type(py_env).__name__} (PyEnvironment) created successfully. Observation Spec: {py_env.observation_spec()}, Action Spec: {py_env.action_spec()}"
     )
     if wrap_in_tf_env:
         tf_env = tf_py_environment.TFPyEnvironment(py_env)
@@ -663,6 +901,8 @@ def create_data_collection_driver(
         collect_policy: The policy to use for action selection during collection.
         replay_buffer: The replay buffer to store collected experiences.
         steps_to_collect: The number of steps to collect when driver.run() is called.
+            For a batched environment this is the total over all parallel
+            episodes, so each run takes steps_to_collect / batch_size env steps.
 
     Returns:
         An instance of DynamicStepDriver.
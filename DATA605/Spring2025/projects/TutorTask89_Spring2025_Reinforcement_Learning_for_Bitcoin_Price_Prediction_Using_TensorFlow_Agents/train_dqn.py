@@ -44,6 +44,17 @@ def main(visualize: bool = True) -> None:
         _LOG.info(f"Setting random seed to: {config.RANDOM_SEED}")
         tf.random.set_seed(config.RANDOM_SEED)
         np.random.seed(config.RANDOM_SEED)
+    # Data: normalized splits from the feature store, or the normalized CSVs
+    train_df = validation_df = None
+    if config.USE_FEATURE_STORE:
+        if os.path.exists(config.OHLCV_DATA_PATH):
+            splits = utils.load_feature_store()
+            train_df, validation_df = splits["train"], splits["validation"]
+        else:
+            _LOG.warning(
+                f"{config.OHLCV_DATA_PATH} not found, re-run the ingestion to use the "
+                "feature store. Falling back to the normalized CSV files."
+            )
     # Environment Creation
     _LOG.info("Creating training and evaluation environments…")
     train_tf_env: tf_environment.TFEnvironment = utils.create_btc_env(
@@ -52,6 +63,9 @@ def main(visualize: bool = True) -> None:
         fee=config.FEE,
         feature_columns=None,
         wrap_in_tf_env=True,
+        num_parallel_envs=config.NUM_PARALLEL_ENVS,
+        seed=config.RANDOM_SEED,
+        df=train_df,
     )
     eval_tf_env: tf_environment.TFEnvironment = utils.create_btc_env(
         data_path=config.NORM_VALIDATION_DATA_PATH,
@@ -59,6 +73,7 @@ def main(visualize: bool = True) -> None:
         fee=config.FEE,
         feature_columns=None,
         wrap_in_tf_env=True,
+        df=validation_df,
     )
     # Agent, Replay Buffer, Policies
     train_step_counter = common.create_variable("train_step_counter", initial_value=0)
@@ -129,7 +144,8 @@ def main(visualize: bool = True) -> None:
     time_step = train_tf_env.reset()
     for iteration in range(config.NUM_TRAINING_ITERATIONS):
         time_step, _ = training_collect_driver.run(time_step=time_step)
-        if time_step.is_last():
+        # The batched environment restarts finished episodes by itself
+        if train_tf_env.batch_size == 1 and time_step.is_last():
             time_step = train_tf_env.reset()
         train_loss = utils.train_one_iteration(dataset_iterator, agent)
         current_step = train_step_counter.numpy()
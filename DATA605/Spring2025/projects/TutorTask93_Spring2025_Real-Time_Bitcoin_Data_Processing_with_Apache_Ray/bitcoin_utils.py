@@ -11,6 +11,8 @@ This file contains utility functions and Ray-based components for real-time Bitc
 import requests
 import ray
 import time
+import zlib
+import numpy as np
 import pandas as pd
 import logging
 import yfinance as yf
@@ -66,6 +68,13 @@ class PriceProcessor:
             self.prices.append((timestamp, price))
         return len(self.prices)
 
+    def add_prices(self, timestamps, prices):
+        self.prices.extend(
+            (ts, price) for ts, price in zip(timestamps, prices)
+            if price is not None and price == price
+        )
+        return len(self.prices)
+
     def get_data(self):
         return self.prices
 
@@ -124,23 +133,294 @@ class PriceProcessor:
         df["volatility"] = df["return"].rolling(window=window).std()
         df["timestamp"] = df["timestamp"].apply(lambda ts: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)))
         return df.dropna().to_dict("records")
-    
+
+# -----------------------------------------------------------------------------
+# Columnar Price Store: PriceRingBuffer
+# -----------------------------------------------------------------------------
+DEFAULT_SYMBOL = "BTC-USD"
+
+
+def _to_datetime64(timestamps):
+    """
+    Convert Unix timestamps (seconds) to UTC datetime64[ms] in one vectorized step.
+    """
+    return np.round(np.asarray(timestamps) * 1000).astype(np.int64).view("datetime64[ms]")
+
+
+def _format_result(columns, output):
+    """
+    Return analytics columns as a dict of NumPy arrays, a pyarrow Table or a DataFrame.
+
+    NumPy and Arrow results wrap the computed arrays without copying them.
+    """
+    if output == "numpy":
+        return columns
+    if output == "arrow":
+        import pyarrow as pa
+        return pa.table(columns)
+    if output == "pandas":
+        return pd.DataFrame(columns)
+    raise ValueError(f"Unknown output format: {output}")
+
+
+class PriceRingBuffer:
+    """
+    Fixed-capacity columnar store of (timestamp, price) points.
+
+    Points live in two preallocated NumPy arrays used as a ring buffer, so
+    appends never reallocate and the oldest points are overwritten once the
+    capacity is reached. Rolling statistics over the last `window` points are
+    updated on every append.
+    """
+    def __init__(self, capacity=1_000_000, window=5):
+        self.capacity = capacity
+        self.window = window
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._prices = np.empty(capacity, dtype=np.float64)
+        self._end = 0
+        self._count = 0
+        self.stats = {}
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamps, prices):
+        """
+        Append a batch of points; None/NaN prices are skipped.
+
+        :param timestamps: Sequence of Unix timestamps (seconds)
+        :param prices: Sequence of prices
+        :return: Number of stored points
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        valid = ~np.isnan(prices)
+        if not valid.all():
+            timestamps, prices = timestamps[valid], prices[valid]
+        n = len(prices)
+        if n == 0:
+            return self._count
+        if n >= self.capacity:
+            timestamps, prices = timestamps[-self.capacity:], prices[-self.capacity:]
+            n = self.capacity
+        # At most two slices: up to the end of the arrays, then from the start
+        first = min(n, self.capacity - self._end)
+        self._timestamps[self._end:self._end + first] = timestamps[:first]
+        self._prices[self._end:self._end + first] = prices[:first]
+        self._timestamps[:n - first] = timestamps[first:]
+        self._prices[:n - first] = prices[first:]
+        self._end = (self._end + n) % self.capacity
+        self._count = min(self._count + n, self.capacity)
+        self._update_stats()
+        return self._count
+
+    def _tail(self, values, n):
+        """
+        Return the last n stored values in insertion order.
+        """
+        n = min(n, self._count)
+        start = self._end - n
+        if start >= 0:
+            return values[start:self._end]
+        return np.concatenate([values[start:], values[:self._end]])
+
+    def _update_stats(self):
+        """
+        Refresh the rolling statistics from the last window + 1 points.
+        """
+        prices = self._tail(self._prices, self.window + 1)
+        stats = {"count": self._count, "timestamp": self._tail(self._timestamps, 1)[0],
+                 "price": prices[-1], "moving_avg": None, "volatility": None}
+        if len(prices) >= self.window:
+            stats["moving_avg"] = prices[-self.window:].mean()
+        if len(prices) > self.window:
+            stats["volatility"] = _returns(prices).std(ddof=1)
+        self.stats = stats
+
+    def arrays(self):
+        """
+        Return (timestamps, prices) in insertion order.
+
+        The arrays are views of the buffer until it wraps around.
+        """
+        return self._tail(self._timestamps, self._count), self._tail(self._prices, self._count)
+
+
+def _returns(prices):
+    """
+    Simple returns between consecutive prices (0 where the previous price is 0).
+    """
+    prev = prices[:-1]
+    return np.divide(prices[1:] - prev, prev, out=np.zeros(len(prev)), where=prev != 0)
+
+
+def _rolling(values, window, func):
+    """
+    Rolling mean or sample standard deviation, NaN for the first window - 1 points.
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+    # Strided (n - window + 1, window) view, no copy of the values
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    if func == "mean":
+        out[window - 1:] = windows.mean(axis=1)
+    else:
+        out[window - 1:] = windows.std(axis=1, ddof=1)
+    return out
+
+# -----------------------------------------------------------------------------
+# Actor: RingBufferPriceProcessor
+# -----------------------------------------------------------------------------
+@ray.remote
+class RingBufferPriceProcessor:
+    """
+    Ray Actor that stores price data per symbol in NumPy ring buffers.
+
+    Same analytics as PriceProcessor, but prices are ingested in batches with
+    `add_prices` and results are columnar (dict of NumPy arrays by default,
+    or a pyarrow Table / DataFrame), which Ray returns to the caller through
+    the object store without per-row serialization. Timestamps in the results
+    are UTC datetime64[ms].
+    """
+    def __init__(self, capacity=1_000_000, window=5):
+        self.capacity = capacity
+        self.window = window
+        self.buffers = {}
+
+    def _buffer(self, symbol):
+        if symbol not in self.buffers:
+            self.buffers[symbol] = PriceRingBuffer(self.capacity, self.window)
+        return self.buffers[symbol]
+
+    def add_price(self, timestamp, price, symbol=DEFAULT_SYMBOL):
+        if price is None:
+            return len(self._buffer(symbol))
+        return self._buffer(symbol).append([timestamp], [price])
+
+    def add_prices(self, timestamps, prices, symbol=DEFAULT_SYMBOL):
+        return self._buffer(symbol).append(timestamps, prices)
+
+    def symbols(self):
+        return list(self.buffers)
+
+    def latest_stats(self, symbol=DEFAULT_SYMBOL):
+        return self._buffer(symbol).stats
+
+    def get_data(self, symbol=DEFAULT_SYMBOL, output="numpy"):
+        timestamps, prices = self._buffer(symbol).arrays()
+        return _format_result({"timestamp": _to_datetime64(timestamps), "price": prices}, output)
+
+    def compute_moving_average(self, window=5, symbol=DEFAULT_SYMBOL, output="numpy"):
+        timestamps, prices = self._buffer(symbol).arrays()
+        if len(prices) < window:
+            timestamps, prices = timestamps[:0], prices[:0]
+        return _format_result({
+            "timestamp": _to_datetime64(timestamps),
+            "price": prices,
+            "moving_avg": _rolling(prices, window, "mean"),
+        }, output)
+
+    def compute_percentage_changes(self, symbol=DEFAULT_SYMBOL, output="numpy"):
+        timestamps, prices = self._buffer(symbol).arrays()
+        if len(prices) < 2:
+            timestamps, prices = timestamps[:1], prices[:1]
+        return _format_result({
+            "timestamp": _to_datetime64(timestamps[1:]),
+            "price": prices[1:],
+            "percent_change": np.round(_returns(prices) * 100, 4),
+        }, output)
+
+    def filter_prices_above(self, threshold, symbol=DEFAULT_SYMBOL, output="numpy"):
+        timestamps, prices = self._buffer(symbol).arrays()
+        mask = prices > threshold
+        return _format_result({"timestamp": _to_datetime64(timestamps[mask]), "price": prices[mask]}, output)
+
+    def compute_volatility(self, window=5, symbol=DEFAULT_SYMBOL, output="numpy"):
+        timestamps, prices = self._buffer(symbol).arrays()
+        if len(prices) < window + 1:
+            timestamps, prices = timestamps[:1], prices[:1]
+        returns = _returns(prices)
+        volatility = _rolling(returns, window, "std")
+        # Drop the first window - 1 returns, which have no full window
+        start = window - 1 if len(returns) else 0
+        return _format_result({
+            "timestamp": _to_datetime64(timestamps[1:][start:]),
+            "return": returns[start:],
+            "volatility": volatility[start:],
+        }, output)
+
+# -----------------------------------------------------------------------------
+# Helper Class: ShardedPriceProcessor
+# -----------------------------------------------------------------------------
+class ShardedPriceProcessor:
+    """
+    Spreads symbols over several RingBufferPriceProcessor actors.
+
+    Each symbol is always routed to the same actor (by CRC32 of its name), so
+    different symbols are ingested and analysed in parallel. Methods return
+    Ray object references; use `ray.get` on them.
+    """
+    def __init__(self, num_shards=4, capacity=1_000_000, window=5):
+        self.actors = [
+            RingBufferPriceProcessor.remote(capacity=capacity, window=window)
+            for _ in range(num_shards)
+        ]
+
+    def actor_for(self, symbol):
+        return self.actors[zlib.crc32(symbol.encode("utf-8")) % len(self.actors)]
+
+    def add_prices(self, timestamps, prices, symbol=DEFAULT_SYMBOL):
+        return self.actor_for(symbol).add_prices.remote(timestamps, prices, symbol=symbol)
+
+    def call(self, method, symbol=DEFAULT_SYMBOL, **kwargs):
+        """
+        Call an analytics method (e.g. "compute_moving_average") for one symbol.
+        """
+        return getattr(self.actor_for(symbol), method).remote(symbol=symbol, **kwargs)
+
+    def call_all(self, method, symbols, **kwargs):
+        """
+        Call an analytics method for several symbols in parallel.
+
+        :return: Dict mapping each symbol to its result
+        """
+        refs = [self.call(method, symbol, **kwargs) for symbol in symbols]
+        return dict(zip(symbols, ray.get(refs)))
+
 # -----------------------------------------------------------------------------
 # Helper Function: Load CSV into Actor
 # -----------------------------------------------------------------------------
-def load_csv_to_actor(file_path, actor):
+def load_csv_to_actor(file_path, actor, batch_size=100_000, symbol_column=None):
     """
-    Loads historical CSV data and adds it to the PriceProcessor actor.
+    Loads historical CSV data and adds it to the actor in batches.
+
+    The CSV is read in chunks; each chunk is sent with one `add_prices` call
+    and all calls are awaited together at the end.
 
     :param file_path: Path to the CSV file
-    :param actor: Instance of PriceProcessor (Ray actor)
-    """
-    df = pd.read_csv(file_path)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    for _, row in df.iterrows():
-        ts = row["timestamp"].timestamp()
-        price = row["price"]
-        ray.get(actor.add_price.remote(ts, price))
+    :param actor: PriceProcessor / RingBufferPriceProcessor actor, or a ShardedPriceProcessor
+    :param batch_size: Number of rows per `add_prices` call
+    :param symbol_column: Optional column with the symbol of each row (ring-buffer
+        actors and ShardedPriceProcessor only)
+    """
+    refs = []
+    for df in pd.read_csv(file_path, chunksize=batch_size):
+        # Same values as Timestamp.timestamp(), computed for the whole chunk
+        timestamps = pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+        prices = df["price"].to_numpy(dtype=np.float64)
+        if symbol_column is None:
+            groups = [(None, timestamps, prices)]
+        else:
+            codes, symbols = pd.factorize(df[symbol_column])
+            groups = [(symbol, timestamps[codes == i], prices[codes == i]) for i, symbol in enumerate(symbols)]
+        for symbol, ts, price in groups:
+            kwargs = {} if symbol is None else {"symbol": symbol}
+            if isinstance(actor, ShardedPriceProcessor):
+                refs.append(actor.add_prices(ts, price, **kwargs))
+            else:
+                refs.append(actor.add_prices.remote(ts, price, **kwargs))
+    ray.get(refs)
 
 # -----------------------------------------------------------------------------
 # Helper Function: Run Stream Simulation
@@ -144,18 +144,25 @@ def count_historical_records():
 
 
 
-def aggregate_hourly_daily_moving_average():
-    from pyspark.sql import SparkSession
-    from pyspark.sql.functions import (
-        col, avg, min, max, hour, date_format,
-        window
-    )
+TYPED_PARQUET_PATH = "Data/bitcoin_typed.parquet"
+AGGREGATES_PATH = "Data/aggregates"
+
+
+def convert_history_to_parquet(spark, json_path="Data/bitcoin_combined.json", parquet_path=TYPED_PARQUET_PATH):
+    """
+    Convert the JSON history into typed Parquet partitioned by Date.
+
+    The conversion runs only when the JSON file is newer than the last
+    successful Parquet write; otherwise the existing Parquet is reused.
+    """
+    from pyspark.sql.functions import col, to_date
     from pyspark.sql.types import StructType, StringType, DoubleType
 
-    # Start Spark session
-    spark = SparkSession.builder.appName("BitcoinAggregation").getOrCreate()
+    success_marker = os.path.join(parquet_path, "_SUCCESS")
+    if os.path.exists(success_marker) and os.path.getmtime(success_marker) >= os.path.getmtime(json_path):
+        print(f"♻️ Reusing typed Parquet at {parquet_path}")
+        return spark.read.parquet(parquet_path)
 
-    # Define schema
     schema = StructType() \
         .add("Datetime", StringType()) \
         .add("Open", DoubleType()) \
@@ -164,62 +171,159 @@ def aggregate_hourly_daily_moving_average():
         .add("Close", DoubleType()) \
         .add("Volume", StringType())
 
-    # Load data
-    df = spark.read.schema(schema).json("Data/bitcoin_combined.json")
-
-    # Cast types
+    df = spark.read.schema(schema).json(json_path)
     df = df.withColumn("Datetime", col("Datetime").cast("timestamp")) \
-           .withColumn("Volume", col("Volume").cast("double"))
-
-    # Filter bad data
-    global df_filtered
-    df_filtered = df.filter(
-        (col("Close").isNotNull()))
+           .withColumn("Volume", col("Volume").cast("double")) \
+           .withColumn("Date", to_date(col("Datetime")))
+
+    df.write.mode("overwrite").partitionBy("Date").parquet(parquet_path)
+    print(f"📁 Wrote typed Parquet to {parquet_path}")
+    return spark.read.parquet(parquet_path)
+
+
+def run_aggregation_job(json_path="Data/bitcoin_combined.json",
+                        parquet_path=TYPED_PARQUET_PATH,
+                        output_path=AGGREGATES_PATH,
+                        window_minutes=60,
+                        slide_minutes=30,
+                        show=True):
+    """
+    Compute hourly, daily and sliding-window Close aggregates in one pass.
+
+    The filtered frame is persisted (and kept in the `df_filtered` global for
+    the training step). A single GROUPING SETS aggregation computes the
+    hour-of-day, day and slide-sized bucket groups; each sliding window is
+    then combined from the buckets it covers, which only touches the small
+    aggregated frame. Results are written to `output_path` as Parquet
+    partitioned by Granularity ('hourly', 'daily', 'moving_avg').
+
+    :param window_minutes: Length of the sliding window (a multiple of slide_minutes)
+    :param slide_minutes: Slide of the sliding window
+    :return: Dict of Spark DataFrames keyed by granularity
+    """
+    from pyspark import StorageLevel
+    from pyspark.sql.functions import col, expr, lit
+
+    if window_minutes % slide_minutes:
+        raise ValueError("window_minutes must be a multiple of slide_minutes")
+    slide_seconds = slide_minutes * 60
+    buckets_per_window = window_minutes // slide_minutes
 
+    spark = SparkSession.builder.appName("BitcoinAggregation").getOrCreate()
 
-    # === ✅ Group by hour ===
-    df_hourly = df_filtered \
-        .withColumn("Hour", hour(col("Datetime"))) \
-        .groupBy("Hour") \
+    # Filter bad data once and keep it for the aggregations and the model
+    global df_filtered
+    df_filtered = convert_history_to_parquet(spark, json_path, parquet_path) \
+        .filter(col("Close").isNotNull()) \
+        .persist(StorageLevel.MEMORY_AND_DISK)
+    df_filtered.createOrReplaceTempView("btc_filtered")
+
+    # === ✅ One aggregation for hour of day, day and slide buckets ===
+    df_agg = spark.sql(f"""
+        SELECT
+            CASE grouping_id(Hour, Day, Bucket)
+                WHEN 3 THEN 'hourly'
+                WHEN 5 THEN 'daily'
+                ELSE 'bucket'
+            END AS Granularity,
+            Hour, Day, Bucket,
+            AVG(Close) AS Avg_Close,
+            MIN(Close) AS Min_Close,
+            MAX(Close) AS Max_Close,
+            SUM(Close) AS Sum_Close,
+            COUNT(Close) AS Num_Records
+        FROM (
+            SELECT
+                Close,
+                hour(Datetime) AS Hour,
+                date_format(Datetime, 'yyyy-MM-dd') AS Day,
+                timestamp_seconds(FLOOR(unix_timestamp(Datetime) / {slide_seconds}) * {slide_seconds}) AS Bucket
+            FROM btc_filtered
+        )
+        GROUP BY GROUPING SETS ((Hour), (Day), (Bucket))
+    """).persist(StorageLevel.MEMORY_AND_DISK)
+
+    df_hourly = df_agg.filter(col("Granularity") == "hourly")
+    df_daily = df_agg.filter(col("Granularity") == "daily")
+
+    # === ✅ Sliding windows from the buckets they contain (same windows as window()) ===
+    df_moving_avg = df_agg.filter(col("Granularity") == "bucket") \
+        .withColumn("Offset", expr(f"explode(sequence(0, {buckets_per_window - 1}))")) \
+        .withColumn("Start", expr(f"Bucket - make_dt_interval(0, 0, 0, Offset * {slide_seconds})")) \
+        .groupBy("Start") \
         .agg(
-            avg("Close").alias("Hourly_Avg_Close"),
-            min("Close").alias("Hourly_Min_Close"),
-            max("Close").alias("Hourly_Max_Close")
+            expr("SUM(Sum_Close) / SUM(Num_Records)").alias("Avg_Close"),
+            expr("MIN(Min_Close)").alias("Min_Close"),
+            expr("MAX(Max_Close)").alias("Max_Close"),
+            expr("SUM(Num_Records)").alias("Num_Records")
         ) \
-        .orderBy("Hour")
+        .withColumn("End", expr(f"Start + make_dt_interval(0, 0, {window_minutes}, 0)"))
+
+    # === ✅ Write all granularities as one partitioned dataset ===
+    columns = ["Hour", "Day", "Start", "End", "Avg_Close", "Min_Close", "Max_Close", "Num_Records"]
+    types = {"Hour": "int", "Day": "string", "Start": "timestamp", "End": "timestamp"}
+
+    def with_columns(df, granularity):
+        selected = [
+            col(name) if name in df.columns else lit(None).cast(types[name]).alias(name)
+            for name in columns
+        ]
+        return df.select(*selected, lit(granularity).alias("Granularity"))
+
+    results = {
+        "hourly": df_hourly,
+        "daily": df_daily,
+        "moving_avg": df_moving_avg,
+    }
+    df_out = with_columns(df_hourly, "hourly") \
+        .unionByName(with_columns(df_daily, "daily")) \
+        .unionByName(with_columns(df_moving_avg, "moving_avg"))
+    df_out.write.mode("overwrite").partitionBy("Granularity").parquet(output_path)
+    print(f"📁 Wrote aggregates to {output_path}")
+
+    if show:
+        print("🔹 Hourly Aggregation:")
+        df_hourly.select(
+            "Hour",
+            col("Avg_Close").alias("Hourly_Avg_Close"),
+            col("Min_Close").alias("Hourly_Min_Close"),
+            col("Max_Close").alias("Hourly_Max_Close")
+        ).orderBy("Hour").show(truncate=False)
+
+        print("🔹 Daily Aggregation:")
+        df_daily.select(
+            "Day",
+            col("Avg_Close").alias("Daily_Avg_Close"),
+            col("Min_Close").alias("Daily_Min_Close"),
+            col("Max_Close").alias("Daily_Max_Close")
+        ).orderBy("Day").show(truncate=False)
+
+        print(f"🔹 Moving Average ({window_minutes}-minute window, {slide_minutes}-min slide):")
+        df_moving_avg.select(
+            "Start",
+            "End",
+            col("Avg_Close").alias("Moving_Avg_Close")
+        ).orderBy("Start").show(truncate=False)
+
+    return results
+
+
+def load_aggregates(granularity, output_path=AGGREGATES_PATH):
+    """
+    Read one granularity ('hourly', 'daily' or 'moving_avg') of the written
+    aggregates as a pandas DataFrame, e.g. for plotting. Only that partition
+    is read.
+    """
+    from pyspark.sql.functions import col
 
-    # === ✅ Group by day ===
-    df_daily = df_filtered \
-        .withColumn("Day", date_format(col("Datetime"), "yyyy-MM-dd")) \
-        .groupBy("Day") \
-        .agg(
-            avg("Close").alias("Daily_Avg_Close"),
-            min("Close").alias("Daily_Min_Close"),
-            max("Close").alias("Daily_Max_Close")
-        ) \
-        .orderBy("Day")
+    spark = SparkSession.builder.appName("BitcoinAggregation").getOrCreate()
+    df = spark.read.parquet(output_path).filter(col("Granularity") == granularity)
+    order = {"hourly": "Hour", "daily": "Day", "moving_avg": "Start"}[granularity]
+    return df.orderBy(order).toPandas()
 
-    # === ✅ Moving Average with 1-hour rolling window ===
-    df_moving_avg = df_filtered \
-        .groupBy(
-            window(col("Datetime"), "1 hour", "30 minutes")
-        ) \
-        .agg(avg("Close").alias("Moving_Avg_Close")) \
-        .orderBy("window")
-
-    # === ✅ Show results ===
-    print("🔹 Hourly Aggregation:")
-    df_hourly.show(truncate=False)
-
-    print("🔹 Daily Aggregation:")
-    df_daily.show(truncate=False)
-
-    print("🔹 Moving Average (1-hour window, 30-min slide):")
-    df_moving_avg.select(
-        col("window.start").alias("Start"),
-        col("window.end").alias("End"),
-        "Moving_Avg_Close"
-    ).show(truncate=False)
+
+def aggregate_hourly_daily_moving_average():
+    run_aggregation_job()
 
 
 def count_filtered_rows():
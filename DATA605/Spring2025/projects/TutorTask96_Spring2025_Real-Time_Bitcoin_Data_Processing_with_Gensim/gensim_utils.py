@@ -19,6 +19,7 @@ from gensim.models.doc2vec import TaggedDocument, Doc2Vec
 from gensim import corpora
 from gensim.models import LdaModel
 from gensim.models import LsiModel
+from gensim.matutils import corpus2dense
 # Analysis & Report Imports
 from sklearn.metrics.pairwise import cosine_similarity
 import pandas as pd
@@ -26,7 +27,6 @@ import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.lines as mlines
-from itertools import combinations
 import networkx as nx
 
 
@@ -320,6 +320,224 @@ def lsi_modeling(dictionary, corpus, num_topics):
         print(topic)
     return lsi_model
 
+# # -----------------------------------------------------------------------------
+# # Similarity Engine
+# # -----------------------------------------------------------------------------
+
+def window_vectors(model, documents):
+    """
+    Stacks the mean token vector of every time window into one matrix.
+
+    Args:
+        model (gensim Word2Vec / FastText): Trained model with `.wv` embeddings.
+        documents (List[List[str]]): Tokenized time windows.
+
+    Returns:
+        np.ndarray: Matrix of shape (n_windows, vector_size); windows without
+        known tokens get a zero vector.
+    """
+    vectors = np.zeros((len(documents), model.wv.vector_size), dtype=np.float32)
+    for i, doc in enumerate(documents):
+        tokens = [token for token in doc if token in model.wv]
+        if tokens:
+            vectors[i] = model.wv[tokens].mean(axis=0)
+    return vectors
+
+
+def doc2vec_vectors(d2v_model, num_docs):
+    """
+    Stacks the Doc2Vec vectors of documents tagged '0' .. str(num_docs - 1).
+
+    Args:
+        d2v_model (gensim.models.Doc2Vec): Trained Doc2Vec model.
+        num_docs (int): Number of tagged documents.
+
+    Returns:
+        np.ndarray: Matrix of shape (num_docs, vector_size).
+    """
+    indices = [d2v_model.dv.get_index(str(i)) for i in range(num_docs)]
+    return d2v_model.dv.vectors[indices]
+
+
+def topic_matrix(model, corpus):
+    """
+    Converts the topic distributions of a corpus into one dense matrix.
+
+    Args:
+        model: Trained LDA or LSI model with .num_topics.
+        corpus: Bag-of-Words corpus.
+
+    Returns:
+        np.ndarray: Matrix of shape (n_documents, num_topics), with 0 for
+        topics missing from a document's distribution.
+    """
+    return corpus2dense(model[corpus], num_terms=model.num_topics,
+                        num_docs=len(corpus), dtype=np.float64).T
+
+
+def normalize_rows(vectors):
+    """
+    L2-normalizes the rows of a matrix so dot products are cosine similarities.
+
+    Args:
+        vectors (np.ndarray): Matrix of shape (n, dim).
+
+    Returns:
+        np.ndarray: Normalized float32 matrix; zero rows stay zero.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def _merge_top_pairs(rows, cols, sims, top_k):
+    """Keeps the top_k candidate pairs, highest similarity first."""
+    if len(sims) > top_k:
+        keep = np.argpartition(-sims, top_k - 1)[:top_k]
+        rows, cols, sims = rows[keep], cols[keep], sims[keep]
+    order = np.lexsort((cols, rows, -sims))
+    return rows[order], cols[order], sims[order]
+
+
+def top_similar_pairs(vectors, top_k=10, threshold=None, max_memory_mb=256, normalized=False):
+    """
+    Finds the top_k most similar pairs of rows by cosine similarity.
+
+    The similarity matrix is computed in blocks of rows (X[block] @ X.T), sized
+    so one block stays under `max_memory_mb`, and only the upper triangle of
+    each block is searched with `argpartition`. The full n x n matrix is never
+    materialized.
+
+    Args:
+        vectors (np.ndarray): Matrix of shape (n, dim), one row per window.
+        top_k (int): Number of pairs to return.
+        threshold (float or None): Minimum similarity for a pair to be returned.
+        max_memory_mb (float): Memory cap for one block of similarities.
+        normalized (bool): Whether the rows are already L2-normalized.
+
+    Returns:
+        List[Tuple[Tuple[int, int], float]]: ((i, j), similarity) with i < j,
+        sorted by decreasing similarity.
+    """
+    matrix = vectors if normalized else normalize_rows(vectors)
+    n = len(matrix)
+    if n < 2 or top_k <= 0:
+        return []
+    block_size = int(max(1, min(n, max_memory_mb * 2**20 // (4 * n))))
+
+    best_rows = np.empty(0, dtype=np.int64)
+    best_cols = np.empty(0, dtype=np.int64)
+    best_sims = np.empty(0, dtype=np.float32)
+    columns = np.arange(n)
+    for start in range(0, n - 1, block_size):
+        stop = min(start + block_size, n - 1)
+        sims = matrix[start:stop] @ matrix.T
+        # Only pairs (i, j) with i < j
+        sims[columns[None, :] <= np.arange(start, stop)[:, None]] = -np.inf
+        if threshold is not None:
+            sims[sims < threshold] = -np.inf
+        k = min(top_k, sims.size)
+        flat = np.argpartition(-sims, k - 1, axis=None)[:k]
+        flat = flat[np.isfinite(sims.flat[flat])]
+        block_rows, block_cols = np.unravel_index(flat, sims.shape)
+        best_rows, best_cols, best_sims = _merge_top_pairs(
+            np.concatenate([best_rows, block_rows + start]),
+            np.concatenate([best_cols, block_cols]),
+            np.concatenate([best_sims, sims.flat[flat]]),
+            top_k,
+        )
+    return [((int(i), int(j)), float(sim)) for i, j, sim in zip(best_rows, best_cols, best_sims)]
+
+
+def approximate_similar_pairs(vectors, top_k=10, threshold=None, num_tables=16, num_bits=8,
+                              max_memory_mb=256, seed=42):
+    """
+    Approximate version of `top_similar_pairs` for tens of thousands of windows.
+
+    Rows are hashed with random hyperplanes (cosine LSH) into `num_tables`
+    tables of 2**num_bits buckets, and exact similarities are only computed
+    between rows sharing a bucket, so the work grows roughly with
+    n * bucket size instead of n**2. The similarities returned are exact, but
+    pairs can be missed: a pair at angle theta lands in the same bucket of one
+    table with probability p = (1 - theta / pi)**num_bits, and is found with
+    probability 1 - (1 - p)**num_tables. With the defaults that is about 0.99
+    for a cosine similarity of 0.9, 0.94 for 0.8 and only 0.5 for 0.5, so the
+    recall is high when the top pairs are close (e.g. overlapping windows) and
+    poor when even the best pairs are weakly similar. More tables raise the
+    recall at a linear cost; more bits make buckets smaller and faster but
+    lower the recall.
+
+    Args:
+        vectors (np.ndarray): Matrix of shape (n, dim), one row per window.
+        top_k (int): Number of pairs to return.
+        threshold (float or None): Minimum similarity for a pair to be returned.
+        num_tables (int): Number of hash tables (more tables, better recall).
+        num_bits (int): Hyperplanes per table (more bits, smaller buckets).
+        max_memory_mb (float): Memory cap for one block of similarities in a bucket.
+        seed (int): Seed for the random hyperplanes.
+
+    Returns:
+        List[Tuple[Tuple[int, int], float]]: ((i, j), similarity) with i < j,
+        sorted by decreasing similarity.
+    """
+    matrix = normalize_rows(vectors)
+    if len(matrix) < 2 or top_k <= 0:
+        return []
+    rng = np.random.default_rng(seed)
+    powers = 1 << np.arange(num_bits, dtype=np.int64)
+
+    candidates = {}
+    for _ in range(num_tables):
+        planes = rng.standard_normal((matrix.shape[1], num_bits)).astype(np.float32)
+        codes = ((matrix @ planes) > 0) @ powers
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        for bucket in np.split(order, bounds):
+            if len(bucket) < 2:
+                continue
+            for (a, b), sim in top_similar_pairs(matrix[bucket], top_k, threshold,
+                                                 max_memory_mb, normalized=True):
+                i, j = sorted((int(bucket[a]), int(bucket[b])))
+                candidates[(i, j)] = sim
+    top = sorted(candidates.items(), key=lambda item: (-item[1], item[0]))
+    return top[:top_k]
+
+
+def similar_pairs(vectors, top_k=10, threshold=None, approximate=False, max_memory_mb=256):
+    """
+    Dispatches to `top_similar_pairs` or `approximate_similar_pairs`.
+
+    Args:
+        vectors (np.ndarray): Matrix of shape (n, dim), one row per window.
+        top_k (int): Number of pairs to return.
+        threshold (float or None): Minimum similarity for a pair to be returned.
+        approximate (bool): Use the LSH approximate-neighbour mode.
+        max_memory_mb (float): Memory cap for one block of similarities.
+
+    Returns:
+        List[Tuple[Tuple[int, int], float]]: ((i, j), similarity) pairs.
+    """
+    if approximate:
+        return approximate_similar_pairs(vectors, top_k, threshold, max_memory_mb=max_memory_mb)
+    return top_similar_pairs(vectors, top_k, threshold, max_memory_mb)
+
+
+def recent_similarities(vectors, index=-1, lookback=5):
+    """
+    Cosine similarities between one window and the `lookback` windows before it.
+
+    Args:
+        vectors (np.ndarray): Matrix of shape (n, dim), one row per window.
+        index (int): Window to compare (default: the latest one).
+        lookback (int): Number of previous windows.
+
+    Returns:
+        np.ndarray: Similarities to windows index-lookback .. index-1.
+    """
+    index = index % len(vectors)
+    window = normalize_rows(vectors[max(0, index - lookback):index + 1])
+    return window[:-1] @ window[-1]
+
 # # -----------------------------------------------------------------------------
 # # Analysis
 # # -----------------------------------------------------------------------------
@@ -440,7 +658,7 @@ def similar_w2v_time(df, w2v_model, documents, new_doc, topn=5):
         print("Timeframe:", min(window_df), "To", max(window_df), f"Similarity: {similarities[idx]:.4f}")
 # --------------------------------------- #
 
-def d2v_cosine_sim(d2v_model, tagged_docs):
+def d2v_cosine_sim(d2v_model, tagged_docs, approximate=False, max_memory_mb=256):
     """
     Finds and prints the top 10 most similar document (window) pairs
     based on cosine similarity using a trained Doc2Vec model.
@@ -448,27 +666,24 @@ def d2v_cosine_sim(d2v_model, tagged_docs):
     Args:
         d2v_model (gensim.models.Doc2Vec): Trained Doc2Vec model.
         tagged_docs (List[TaggedDocument]): List of tagged documents used for training.
+        approximate (bool): Use the approximate-neighbour mode (for very many windows).
+        max_memory_mb (float): Memory cap for one block of the similarity matrix.
 
     Returns:
         None (prints top 10 most similar window pairs and their similarity scores)
     """
     # Extract vectors for all tagged documents
-    doc_vectors = [d2v_model.dv[str(i)] for i in range(len(tagged_docs))]
-
-    # Compute pairwise similarities
-    top_pairs = []
-    for i, j in combinations(range(len(doc_vectors)), 2):
-        sim = cosine_similarity([doc_vectors[i]], [doc_vectors[j]])[0][0]
-        top_pairs.append(((i, j), sim))
+    doc_vectors = doc2vec_vectors(d2v_model, len(tagged_docs))
 
-    # Sort and print top 10
-    top_pairs = sorted(top_pairs, key=lambda x: x[1], reverse=True)
+    # Top 10 pairs from blocked matrix products
+    top_pairs = similar_pairs(doc_vectors, top_k=10, approximate=approximate,
+                              max_memory_mb=max_memory_mb)
     print("Top 10 similar pairs")
-    for pair, sim in top_pairs[:10]:
+    for pair, sim in top_pairs:
         print(f"Windows {pair[0]} & {pair[1]} --> Similarity: {sim:.4f}")
 # --------------------------------------- #
 
-def word2v_cosine_sim(model, documents, top_k=20, threshold=0.8):
+def word2v_cosine_sim(model, documents, top_k=20, threshold=0.8, approximate=False, max_memory_mb=256):
     """
     Visualizes the top-k most similar time windows using Word2Vec or FastText,
     and prints an investment confidence score based on recent similarity.
@@ -478,23 +693,17 @@ def word2v_cosine_sim(model, documents, top_k=20, threshold=0.8):
         documents (List[List[str]]): Tokenized symbolic time windows.
         top_k (int): Number of top pairs to show in similarity graph.
         threshold (float): Minimum similarity to consider for edge creation.
+        approximate (bool): Use the approximate-neighbour mode (for very many windows).
+        max_memory_mb (float): Memory cap for one block of the similarity matrix.
 
     Returns:
         None (prints top similar pairs, renders a graph, and prints a confidence score)
     """
-    w2v_doc_vectors = [
-        np.mean([model.wv[token] for token in doc if token in model.wv], axis=0)
-        for doc in documents
-    ]
+    w2v_doc_vectors = window_vectors(model, documents)
 
-    similarities = []
-    for i, j in combinations(range(len(w2v_doc_vectors)), 2):
-        sim = cosine_similarity([w2v_doc_vectors[i]], [w2v_doc_vectors[j]])[0][0]
-        if sim >= threshold:
-            similarities.append(((i, j), sim))
-
-    # Sort and select top_k
-    top_similar = sorted(similarities, key=lambda x: x[1], reverse=True)[:top_k]
+    # Top_k pairs above the threshold
+    top_similar = similar_pairs(w2v_doc_vectors, top_k=top_k, threshold=threshold,
+                                approximate=approximate, max_memory_mb=max_memory_mb)
 
     print(f"Top {top_k} most similar time windows:")
     for pair, sim in top_similar[:10]:
@@ -520,13 +729,8 @@ def word2v_cosine_sim(model, documents, top_k=20, threshold=0.8):
     plt.show()
 
     # Investment Confidence Score
-    latest_index = len(w2v_doc_vectors) - 1
-    prev_indices = list(range(max(0, latest_index - 5), latest_index))
-    last_similarities = [
-        cosine_similarity([w2v_doc_vectors[latest_index]], [w2v_doc_vectors[i]])[0][0]
-        for i in prev_indices
-    ]
-    if last_similarities:
+    last_similarities = recent_similarities(w2v_doc_vectors, lookback=5)
+    if len(last_similarities):
         confidence = np.mean(last_similarities) * 100
         print(f"Investment Confidence Score (Last 5 windows): {confidence:.2f}/100")
 # --------------------------------------- #
@@ -543,26 +747,14 @@ def topic_model_cos_sim(model, corpus):
     Returns:
         confidence score and inferred trend
     """
-    num_topics = model.num_topics
-    dense_vectors = []
-
-    # Convert topic distributions to dense vectors
-    for doc_bow in corpus:
-        topic_dist = model[doc_bow]
-        vec = np.zeros(num_topics)
-        for topic_id, value in topic_dist:
-            vec[topic_id] = value
-        dense_vectors.append(vec)
+    # Convert topic distributions to a dense matrix
+    dense_vectors = topic_matrix(model, corpus)
 
     # Investment Confidence Score
     latest_index = len(dense_vectors) - 1
-    prev_indices = list(range(max(0, latest_index - 5), latest_index))
-    last_similarities = [
-        cosine_similarity([dense_vectors[latest_index]], [dense_vectors[i]])[0][0]
-        for i in prev_indices
-    ]
+    last_similarities = recent_similarities(dense_vectors, latest_index, lookback=5)
 
-    if last_similarities:
+    if len(last_similarities):
         confidence = np.mean(last_similarities) * 100
     else:
         confidence = 0.0
@@ -613,36 +805,20 @@ def combine_topic_signals(lda_result, lsi_result):
 # --------------------------------------- #
 
 def time_analysis(model, corpus, df):
-    # Get LSI/LDA topic vectors for all windows
-    topic_vectors = [model[corpus[i]] for i in range(len(corpus))]
-
-    # Convert sparse topic distributions into dense numpy arrays
-    num_topics = model.num_topics
-    dense_vectors = []
-
-    for doc in topic_vectors:
-        vec = np.zeros(num_topics)
-        for topic_id, value in doc:
-            vec[topic_id] = value
-        dense_vectors.append(vec)
+    # Get LSI/LDA topic vectors for all windows as one dense matrix
+    dense_vectors = topic_matrix(model, corpus)
 
     for idx, topic in model.print_topics(num_words=5):
         print(f"Topic {idx}: {topic}")
 
     # Assign dominant topic label per window based on LSI topic vectors
-    trend_labels = []
-
-    for vec in dense_vectors:
-        dominant_topic = np.argmax(vec)
-        if dominant_topic == 0:
-            trend_labels.append('Bearish')
-        else:
-            trend_labels.append('Bullish')
+    dominant_topics = dense_vectors.argmax(axis=1)
+    trend_labels = np.where(dominant_topics == 0, 'Bearish', 'Bullish')
 
     # Append to dataframe for easy reference
     df_trends = pd.DataFrame({
-        'window': list(range(len(dense_vectors))),
-        'dominant_topic': [np.argmax(vec) for vec in dense_vectors],
+        'window': np.arange(len(dense_vectors)),
+        'dominant_topic': dominant_topics,
         'trend': trend_labels
     })
     
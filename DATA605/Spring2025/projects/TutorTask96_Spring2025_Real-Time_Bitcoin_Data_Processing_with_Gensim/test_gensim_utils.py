@@ -0,0 +1,51 @@
+"""
+Tests for the window-similarity helpers in gensim_utils.
+
+Run from the project directory with `python -m pytest test_gensim_utils.py`.
+"""
+
+import numpy as np
+import pytest
+
+from gensim_utils import approximate_similar_pairs, top_similar_pairs
+
+
+def recall(approximate, exact):
+    exact_pairs = {pair for pair, _ in exact}
+    return len(exact_pairs & {pair for pair, _ in approximate}) / len(exact_pairs)
+
+
+@pytest.mark.parametrize("num_rows", [3000, 10000])
+def test_approximate_recall_on_random_vectors(num_rows):
+    vectors = np.random.default_rng(0).standard_normal((num_rows, 16))
+    exact = top_similar_pairs(vectors, top_k=50)
+    approximate = approximate_similar_pairs(vectors, top_k=50)
+    assert recall(approximate, exact) >= 0.95
+
+
+def test_approximate_recall_on_drifting_windows():
+    # Consecutive windows of a random walk, like the embeddings of
+    # overlapping time windows: the top pairs are very similar.
+    rng = np.random.default_rng(1)
+    vectors = np.cumsum(rng.standard_normal((5000, 32)), axis=0) + rng.standard_normal((5000, 32))
+    exact = top_similar_pairs(vectors, top_k=100)
+    approximate = approximate_similar_pairs(vectors, top_k=100)
+    assert recall(approximate, exact) >= 0.98
+
+
+def test_approximate_similarities_are_exact():
+    vectors = np.random.default_rng(2).standard_normal((2000, 16))
+    exact = dict(top_similar_pairs(vectors, top_k=2000))
+    for pair, sim in approximate_similar_pairs(vectors, top_k=20):
+        assert pair[0] < pair[1]
+        if pair in exact:
+            assert sim == pytest.approx(exact[pair], abs=1e-5)
+
+
+def test_more_tables_do_not_lower_recall():
+    vectors = np.random.default_rng(3).standard_normal((3000, 16))
+    exact = top_similar_pairs(vectors, top_k=50)
+    few = recall(approximate_similar_pairs(vectors, top_k=50, num_tables=2), exact)
+    many = recall(approximate_similar_pairs(vectors, top_k=50, num_tables=32), exact)
+    assert few <= many
+    assert many >= 0.98
@@ -15,6 +15,9 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 BLOCKCHAIN_WS_URL = "wss://ws.blockchain.info/inv"
 BLOCKSTREAM_API = "https://blockstream.info/api"
 
+#Status index of the backup transactions (kept on a volume in docker-compose)
+STATUS_INDEX_FILE = os.getenv("STATUS_INDEX_FILE", "transaction_status_index.sqlite")
+
 #Queries
 smurfing_query = '''
 // Find potential smurfing patterns
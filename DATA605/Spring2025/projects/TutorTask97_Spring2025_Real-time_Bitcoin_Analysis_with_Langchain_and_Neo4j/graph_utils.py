@@ -1,6 +1,12 @@
 from langchain_neo4j import Neo4jGraph
+from neo4j import GraphDatabase
 from config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
 import json
+import threading
+import concurrent.futures
+
+_driver = None
+_driver_lock = threading.Lock()
 
 def connection_to_graph():
     graphConnection = Neo4jGraph(
@@ -100,3 +106,185 @@ def query_Neo4j_database(query):
     graphConnection = connection_to_graph()
     records = graphConnection.query(query)
     return records
+
+def get_driver():
+    """Return the process-wide Neo4j driver, creating it on first use (its connection pool is shared by all sessions)"""
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            _driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+        return _driver
+
+def create_constraints():
+    """Create the uniqueness constraints that back the MERGE lookups of the bulk loader"""
+    constraints = [
+        "CREATE CONSTRAINT transaction_txid IF NOT EXISTS FOR (t:Transaction) REQUIRE t.txid IS UNIQUE",
+        "CREATE CONSTRAINT wallet_address IF NOT EXISTS FOR (w:Wallet) REQUIRE w.address IS UNIQUE",
+        "CREATE CONSTRAINT block_height IF NOT EXISTS FOR (b:Block) REQUIRE b.height IS UNIQUE",
+    ]
+    with get_driver().session() as session:
+        for constraint in constraints:
+            session.run(constraint).consume()
+
+def flatten_transactions(transactions):
+    """
+    Flatten transactions into one parameter list per node label and relationship type.
+    Rows are keyed like the MERGE patterns of insert_transaction, so a later row replaces
+    an earlier one exactly as repeated insert_transaction calls would.
+    """
+    tx_rows, block_rows, wallets = {}, {}, set()
+    included_rows, sent_rows, received_rows = {}, {}, {}
+    for transaction_data in transactions:
+        txid = transaction_data["txid"]
+        status = transaction_data.get("status", {})
+        vin = transaction_data.get("vin", [])
+        vout = transaction_data.get("vout", [])
+
+        total_sent = sum(vin_entry.get("prevout", {}).get("value", 0) for vin_entry in vin)
+        total_received = sum(vout_entry.get("value", 0) for vout_entry in vout)
+        tx_rows[txid] = {
+            "txid": txid,
+            "total_sent": total_sent,
+            "fee": total_sent - total_received,
+            "status_json": json.dumps(status),
+        }
+
+        block_height = status.get("block_height")
+        if block_height is not None:
+            block_rows[block_height] = {"block_height": block_height, "block_hash": status.get("block_hash")}
+            included_rows[txid] = {"txid": txid, "block_height": block_height}
+
+        for vin_entry in vin:
+            prevout = vin_entry.get("prevout", {})
+            sender_addr = prevout.get("scriptpubkey_address")
+            sent_value = prevout.get("value")
+            if sender_addr and sent_value is not None:
+                wallets.add(sender_addr)
+                sent_rows[(sender_addr, txid)] = {"address": sender_addr, "txid": txid, "value": sent_value}
+
+        for vout_entry in vout:
+            receiver_addr = vout_entry.get("scriptpubkey_address")
+            received_value = vout_entry.get("value")
+            if receiver_addr and received_value is not None:
+                wallets.add(receiver_addr)
+                received_rows[(txid, receiver_addr)] = {"address": receiver_addr, "txid": txid, "value": received_value}
+
+    return {
+        "transactions": list(tx_rows.values()),
+        "blocks": list(block_rows.values()),
+        "wallets": [{"address": address} for address in wallets],
+        "included_in": list(included_rows.values()),
+        "sent": list(sent_rows.values()),
+        "received": list(received_rows.values()),
+    }
+
+# Node statements only create nodes, relationship statements only MATCH them
+NODE_QUERIES = {
+    "transactions": """
+        UNWIND $rows AS row
+        MERGE (t:Transaction {txid: row.txid})
+        SET t.value = row.total_sent,
+            t.fee = row.fee,
+            t.status = row.status_json,
+            t.name = row.txid
+    """,
+    "blocks": """
+        UNWIND $rows AS row
+        MERGE (b:Block {height: row.block_height})
+        SET b.hash = row.block_hash,
+            b.name = toString(row.block_height)
+    """,
+    "wallets": """
+        UNWIND $rows AS row
+        MERGE (w:Wallet {address: row.address})
+    """,
+}
+
+RELATIONSHIP_QUERIES = {
+    "included_in": """
+        UNWIND $rows AS row
+        MATCH (t:Transaction {txid: row.txid})
+        MATCH (b:Block {height: row.block_height})
+        MERGE (t)-[r:INCLUDED_IN]->(b)
+    """,
+    "sent": """
+        UNWIND $rows AS row
+        MATCH (w:Wallet {address: row.address})
+        MATCH (t:Transaction {txid: row.txid})
+        MERGE (w)-[r:SENT]->(t)
+        SET r.value = row.value
+    """,
+    "received": """
+        UNWIND $rows AS row
+        MATCH (t:Transaction {txid: row.txid})
+        MATCH (w:Wallet {address: row.address})
+        MERGE (t)-[r:RECEIVED]->(w)
+        SET r.value = row.value
+    """,
+}
+
+def _run_batches(statements, max_workers, on_batch_done=None, total_rows=0):
+    """Run (query, rows) pairs in parallel write transactions, which retry transient errors such as deadlocks"""
+    def run(statement):
+        query, rows = statement
+        with get_driver().session() as session:
+            session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+        return len(rows)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run, statement) for statement in statements]
+        for future in concurrent.futures.as_completed(futures):
+            rows_written = future.result()  # re-raises the first failure
+            if on_batch_done:
+                on_batch_done(rows_written, total_rows)
+
+def bulk_load_transactions(transactions, batch_size=5000, max_workers=4, relation_workers=1, on_batch_done=None):
+    """
+    Insert many transactions with one UNWIND ... MERGE statement per label and relationship
+    type and batch, run in parallel sessions of the shared driver.
+    Nodes are written before the relationships that MATCH them. Node batches run on
+    max_workers sessions; relationship batches lock both endpoints, which SENT and RECEIVED
+    batches share, so they run on relation_workers sessions (one by default) instead of
+    deadlocking and retrying.
+    on_batch_done(rows_written, total_rows) is called after every written batch, e.g. to report progress.
+    """
+    create_constraints()
+    rows = flatten_transactions(transactions)
+    total_rows = sum(len(value) for value in rows.values())
+    for queries, workers in ((NODE_QUERIES, max_workers), (RELATIONSHIP_QUERIES, relation_workers)):
+        statements = [
+            (query, rows[key][start:start + batch_size])
+            for key, query in queries.items()
+            for start in range(0, len(rows[key]), batch_size)
+        ]
+        _run_batches(statements, workers, on_batch_done, total_rows)
+    return {key: len(value) for key, value in rows.items()}
+
+
+def update_transaction_statuses_in_graph(transactions, batch_size=5000, relation_workers=1):
+    """
+    Set the status of existing Transaction nodes in place and link confirmed ones to their Block.
+    The batches merge INCLUDED_IN relationships to shared Block nodes, so like the relationship
+    batches of bulk_load_transactions they run on relation_workers sessions (one by default).
+    """
+    rows = []
+    for transaction_data in transactions:
+        status = transaction_data.get("status", {})
+        rows.append({
+            "txid": transaction_data["txid"],
+            "status_json": json.dumps(status),
+            "block_height": status.get("block_height"),
+            "block_hash": status.get("block_hash"),
+        })
+    query = """
+        UNWIND $rows AS row
+        MATCH (t:Transaction {txid: row.txid})
+        SET t.status = row.status_json
+        WITH t, row WHERE row.block_height IS NOT NULL
+        MERGE (b:Block {height: row.block_height})
+        SET b.hash = row.block_hash,
+            b.name = toString(row.block_height)
+        MERGE (t)-[r:INCLUDED_IN]->(b)
+    """
+    _run_batches([(query, rows[start:start + batch_size]) for start in range(0, len(rows), batch_size)], relation_workers)
+    return len(rows)
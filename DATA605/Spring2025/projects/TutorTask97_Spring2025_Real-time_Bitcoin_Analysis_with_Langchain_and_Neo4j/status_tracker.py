@@ -0,0 +1,262 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+import aiohttp
+import orjson
+from config import BLOCKSTREAM_API, STATUS_INDEX_FILE
+
+class TransactionStatusIndex:
+    """
+    SQLite index of the backup transactions keyed by txid.
+    The backup JSON is imported only when it changed, confirmations are written row by row,
+    so checking statuses never rewrites the whole backup.
+    Each row also records whether it was written to Neo4j (in_graph) and whether the graph has
+    its current status (graph_synced); both are set only after a successful graph write, so
+    rows whose write failed are retried on the next run.
+    """
+
+    def __init__(self, path=STATUS_INDEX_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                txid TEXT PRIMARY KEY,
+                confirmed INTEGER NOT NULL,
+                record BLOB NOT NULL,
+                last_checked REAL,
+                in_graph INTEGER NOT NULL DEFAULT 0,
+                graph_synced INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS transactions_unconfirmed ON transactions (confirmed, last_checked);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        # Indexes created before the graph columns existed are synced again once
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(transactions)")}
+        for column in ("in_graph", "graph_synced"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE transactions ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS transactions_unsynced ON transactions (graph_synced)")
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute("SELECT count(*) FROM transactions").fetchone()[0]
+
+    def import_backup(self, backup_file):
+        """
+        Add transactions of the backup file that are not indexed yet, and confirmations the
+        backup has but the index does not (a confirmed record is never replaced by an unconfirmed one).
+        Returns the number of added or upgraded records; the file is only parsed if its size or mtime changed.
+        The records are marked as not synced to the graph.
+        """
+        if not os.path.exists(backup_file):
+            return 0
+        stat = os.stat(backup_file)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'backup_signature'").fetchone()
+        if row and row[0] == signature:
+            return 0
+
+        with open(backup_file, "rb") as f:
+            transactions = orjson.loads(f.read())
+        indexed = dict(self._conn.execute("SELECT txid, confirmed FROM transactions"))
+        changed = {}
+        for tx in transactions:
+            txid = tx.get("txid")
+            confirmed = bool(tx.get("status", {}).get("confirmed", False))
+            if txid and (txid not in indexed or (confirmed and not indexed[txid])):
+                changed[txid] = tx
+                indexed[txid] = confirmed
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO transactions (txid, confirmed, record) VALUES (?, ?, ?)
+                ON CONFLICT (txid) DO UPDATE SET
+                    confirmed = excluded.confirmed, record = excluded.record, graph_synced = 0
+                """,
+                [(txid, int(tx.get("status", {}).get("confirmed", False)), orjson.dumps(tx)) for txid, tx in changed.items()]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backup_signature', ?)", (signature,))
+        print(f"[DOCKER LOG] Imported {len(changed)} new or newly confirmed transactions from {backup_file} ({len(transactions)} in file)")
+        return len(changed)
+
+    def unconfirmed_txids(self, limit=None):
+        """Return unconfirmed txids, least recently checked first"""
+        query = "SELECT txid FROM transactions WHERE confirmed = 0 ORDER BY coalesce(last_checked, 0)"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [txid for (txid,) in self._conn.execute(query)]
+
+    def get(self, txid):
+        row = self._conn.execute("SELECT record FROM transactions WHERE txid = ?", (txid,)).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def set_statuses(self, statuses):
+        """Store new statuses ({txid: status}), marked as not synced to the graph, and return the updated records"""
+        records = []
+        for txid, status in statuses.items():
+            record = self.get(txid)
+            if record is not None:
+                record["status"] = status
+                records.append(record)
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE transactions SET confirmed = ?, record = ?, last_checked = ?, graph_synced = 0 WHERE txid = ?",
+                [(int(record["status"].get("confirmed", False)), orjson.dumps(record), now, record["txid"]) for record in records]
+            )
+        return records
+
+    def mark_checked(self, txids):
+        """Record that txids were polled without a status change"""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany("UPDATE transactions SET last_checked = ? WHERE txid = ?", [(now, txid) for txid in txids])
+
+    def _records(self, where):
+        return [orjson.loads(record) for (record,) in self._conn.execute(f"SELECT record FROM transactions WHERE {where}")]
+
+    def pending_inserts(self):
+        """Records that were never written to the graph"""
+        return self._records("in_graph = 0")
+
+    def pending_status_updates(self):
+        """Records in the graph whose status changed since they were written"""
+        return self._records("in_graph = 1 AND graph_synced = 0")
+
+    def mark_synced(self, txids):
+        """Record that the graph holds the current version of txids"""
+        with self._conn:
+            self._conn.executemany("UPDATE transactions SET in_graph = 1, graph_synced = 1 WHERE txid = ?", [(txid,) for txid in txids])
+
+    def close(self):
+        self._conn.close()
+
+
+class AdaptiveConcurrency:
+    """
+    Limit on in-flight requests that grows by one after `limit` successful requests
+    and halves when the API throttles or fails (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def success(self):
+        self._successes += 1
+        if self._successes >= self.limit:
+            self.limit = min(self.maximum, self.limit + 1)
+            self._successes = 0
+
+    def throttled(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self._successes = 0
+
+
+async def fetch_status(session, limiter, txid, max_retries=3, backoff_factor=1):
+    """Fetch the status of a transaction, or None if it is unknown or the checks failed"""
+    url = f"{BLOCKSTREAM_API}/tx/{txid}/status"
+    last_status = None
+    for retries in range(max_retries):
+        async with limiter:
+            try:
+                async with session.get(url) as response:
+                    last_status = response.status
+                    if response.status == 200:
+                        limiter.success()
+                        return orjson.loads(await response.read())
+                    if response.status == 404:
+                        limiter.success()
+                        return None  # Dropped from the mempool
+                    if response.status in [429, 502, 503, 504]:
+                        limiter.throttled()
+                    else:
+                        print(f"[STATUS CHECK] Transaction {txid} | Unexpected HTTP error {response.status}")
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                limiter.throttled()
+                print(f"[STATUS CHECK] Transaction {txid} | Connection error: {e!r}")
+        await asyncio.sleep(backoff_factor * (2 ** retries))
+    print(f"[STATUS CHECK] Transaction {txid} | Final check failed with status {last_status or 'connection error'}")
+    return None
+
+
+async def check_unconfirmed(index, limit=None, initial_concurrency=8, max_concurrency=64, flush_every=500):
+    """
+    Poll the unconfirmed transactions of the index through one HTTP session and store the
+    ones that got confirmed. Returns the updated records.
+    """
+    txids = index.unconfirmed_txids(limit)
+    total = len(txids)
+    print(f"[DOCKER LOG] Checking {total} unconfirmed transactions...")
+    if not total:
+        return []
+
+    limiter = AdaptiveConcurrency(initial=initial_concurrency, maximum=max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    timeout = aiohttp.ClientTimeout(total=10)
+    updated, confirmed, unchanged = [], {}, []
+    next_percent = 10
+
+    async def check(txid):
+        return txid, await fetch_status(session, limiter, txid)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Create tasks lazily, about twice the current concurrency limit at a time
+        pending = set()
+        txid_iter = iter(txids)
+        done_count = 0
+        while True:
+            while len(pending) < limiter.limit * 2:
+                txid = next(txid_iter, None)
+                if txid is None:
+                    break
+                pending.add(asyncio.ensure_future(check(txid)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                txid, status = task.result()
+                if status and status.get("confirmed", False):
+                    confirmed[txid] = status
+                else:
+                    unchanged.append(txid)
+                done_count += 1
+
+            # Only changed records are written, in small transactions
+            if len(confirmed) >= flush_every:
+                updated.extend(index.set_statuses(confirmed))
+                confirmed = {}
+            if len(unchanged) >= flush_every:
+                index.mark_checked(unchanged)
+                unchanged = []
+
+            percent_complete = int(done_count / total * 100)
+            if percent_complete >= next_percent:
+                print(f"[DOCKER LOG] Processing: {percent_complete}% complete ({done_count}/{total}), concurrency {limiter.limit}")
+                sys.stdout.flush()
+                next_percent = (percent_complete // 10 + 1) * 10
+
+    updated.extend(index.set_statuses(confirmed))
+    index.mark_checked(unchanged)
+    return updated
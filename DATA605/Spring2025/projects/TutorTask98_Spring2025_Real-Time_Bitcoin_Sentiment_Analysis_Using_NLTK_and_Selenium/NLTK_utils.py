@@ -1,8 +1,14 @@
 import re
 import os
 import sys
+import json
+import queue
+import threading
 import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
 from datetime import datetime
 from fake_headers import Headers
 from time import sleep
@@ -877,6 +883,315 @@ It may be due to the following:
     def get_tweets(self):
         return self.data
 
+    def extract_new_tweets(self):
+        # Parse every card that has not been seen yet in a single round trip
+        rows = self.driver.execute_script(EXTRACT_TWEETS_JS)
+        return [_row_to_tweet(row) for row in rows]
+
+    def load_fixture(self, path):
+        # innerHTML does not run the page scripts, so saved pages load offline
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        self.driver.get("about:blank")
+        self.driver.execute_script("document.documentElement.innerHTML = arguments[0];", html)
+        pass
+
+    def save_page_fixture(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.driver.page_source)
+        print("Fixture Saved: {}".format(path))
+        pass
+
+# Parallel Scraping Engine
+# Extracts the same fields as the Tweet class for every card not marked as
+# scraped yet, marks those cards, and drops hidden cards like remove_hidden_cards.
+EXTRACT_TWEETS_JS = """
+const snapshot = (xpath, node) => {
+    const result = document.evaluate(xpath, node, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+    return nodes;
+};
+const first = (xpath, node) =>
+    document.evaluate(xpath, node, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const text = (xpath, node) => { const el = first(xpath, node); return el ? el.innerText : null; };
+const count = (xpath, node) => text(xpath, node) || "0";
+
+const hidden = snapshot('//article[@data-testid="tweet" and @disabled]', document);
+for (const card of hidden.slice(1, -2)) {
+    const container = card.parentNode && card.parentNode.parentNode && card.parentNode.parentNode.parentNode;
+    if (container && container.parentNode) container.parentNode.removeChild(container);
+}
+
+const rows = [];
+for (const card of snapshot('//article[@data-testid="tweet" and not(@disabled) and not(@data-scraped)]', document)) {
+    card.setAttribute("data-scraped", "1");
+    const user = text('.//div[@data-testid="User-Name"]//span', card);
+    const handle = text('.//span[contains(text(), "@")]', card);
+    const time = first(".//time", card);
+    // Cards without a user, handle or time are ads or incomplete
+    if (user === null || handle === null || time === null) continue;
+    const link = first(".//a[contains(@href, '/status/')]", card);
+    const avatar = first('.//div[@data-testid="Tweet-User-Avatar"]//img', card);
+    rows.push([
+        user,
+        handle,
+        time.getAttribute("datetime"),
+        first('.//*[local-name()="svg" and @data-testid="icon-verified"]', card) !== null,
+        snapshot('(.//div[@data-testid="tweetText"])[1]/span | (.//div[@data-testid="tweetText"])[1]/a', card)
+            .map(el => el.innerText).join(""),
+        count('.//div[@data-testid="reply"]//span', card),
+        count('.//div[@data-testid="retweet"]//span', card),
+        count('.//div[@data-testid="like"]//span', card),
+        count('.//a[contains(@href, "/analytics")]//span', card),
+        snapshot('.//a[contains(@href, "src=hashtag_click")]', card).map(el => el.innerText),
+        snapshot('(.//div[@data-testid="tweetText"])[1]//a[contains(text(), "@")]', card).map(el => el.innerText),
+        snapshot('(.//div[@data-testid="tweetText"])[1]/img[contains(@src, "emoji")]', card).map(el => el.getAttribute("alt") || ""),
+        avatar ? avatar.getAttribute("src") : "",
+        link ? link.getAttribute("href") : "",
+    ]);
+}
+return rows;
+"""
+
+def _row_to_tweet(row):
+    (user, handle, date_time, verified, content, reply_cnt, retweet_cnt, like_cnt,
+     analytics_cnt, tags, mentions, emojis, profile_img, href) = row
+    tweet_link = urljoin("https://twitter.com", href) if href else ""
+    tweet_id = str(tweet_link.split("/")[-1]) if tweet_link else ""
+    emojis = [emoji.encode("unicode-escape").decode("ASCII") for emoji in emojis]
+    # Same layout as Tweet.tweet, without the poster details
+    return (
+        user, handle, date_time, verified, content, reply_cnt, retweet_cnt, like_cnt,
+        analytics_cnt, tags, mentions, emojis, profile_img, tweet_link, tweet_id,
+        None, "0", "0",
+    )
+
+def _tweet_key(tweet):
+    # Tweet ID, or handle and time for cards without a status link
+    return tweet[14] or f"{tweet[1]}|{tweet[2]}"
+
+def build_shards(keywords, since=None, until=None, days_per_shard=1):
+    """
+    Split a search into one query per keyword and date range, using the
+    `since:`/`until:` search operators. Without dates, one query per keyword.
+    """
+    if since is None or until is None:
+        return list(keywords)
+    bounds = pd.date_range(since, until, freq=f"{days_per_shard}D").tolist()
+    if bounds[-1] < pd.Timestamp(until):
+        bounds.append(pd.Timestamp(until))
+    return [
+        f"{keyword} since:{start:%Y-%m-%d} until:{end:%Y-%m-%d}"
+        for keyword in keywords
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+class TweetStore:
+    """
+    Append-only JSON Lines store of scraped tweets (one Tweet.tweet tuple per
+    line). The IDs already in the file are loaded on open, so every tweet is
+    stored once even across runs, and tweets are written as soon as they are
+    parsed.
+    """
+
+    def __init__(self, path="./tweets/tweets.jsonl"):
+        self.path = path
+        self.ids = set()
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        for tweet in self._read():
+            self.ids.add(_tweet_key(tweet))
+        self._file = open(path, "a", encoding="utf-8")
+        # Start on a new line after a line cut short by an interrupted run
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield tuple(json.loads(line))
+                except ValueError:
+                    # Line cut short by an interrupted run
+                    continue
+
+    def append(self, tweets):
+        # Returns the tweets that were not stored yet
+        new_tweets = []
+        with self._lock:
+            for tweet in tweets:
+                key = _tweet_key(tweet)
+                if key not in self.ids:
+                    self.ids.add(key)
+                    new_tweets.append(tweet)
+            if new_tweets:
+                self._file.write("".join(json.dumps(tweet) + "\n" for tweet in new_tweets))
+                self._file.flush()
+        return new_tweets
+
+    def get_tweets(self):
+        return list(self._read())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def close(self):
+        self._file.close()
+        pass
+
+class ScrapingEngine:
+    """
+    Scrape search shards (see build_shards) with a pool of headless drivers.
+
+    Each worker owns one Twitter_Scraper, logs in once and takes shards from a
+    shared queue. Cards are parsed in the browser in one call per scroll and
+    every card is parsed once; new tweets are streamed into the TweetStore.
+    """
+
+    def __init__(
+        self,
+        store,
+        username=None,
+        password=None,
+        n_workers=4,
+        scrape_latest=True,
+        scroll_pause=1.5,
+        max_empty_scrolls=5,
+    ):
+        self.store = store
+        self.username = username
+        self.password = password
+        self.n_workers = n_workers
+        self.scrape_latest = scrape_latest
+        self.scroll_pause = scroll_pause
+        self.max_empty_scrolls = max_empty_scrolls
+
+    def _run_pool(self, jobs, task, login):
+        jobs_queue = queue.Queue()
+        for job in jobs:
+            jobs_queue.put(job)
+        results = []
+        results_lock = threading.Lock()
+
+        def worker():
+            scraper = Twitter_Scraper(self.username, self.password)
+            try:
+                if login and self.username and self.password:
+                    scraper.login()
+                while True:
+                    try:
+                        job = jobs_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        added = task(scraper, job)
+                    except Exception as e:
+                        print(f"[ScrapingEngine] {job} failed: {e}")
+                        continue
+                    with results_lock:
+                        results.extend(added)
+            finally:
+                scraper.driver.quit()
+
+        n_workers = max(1, min(self.n_workers, len(jobs)))
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            # list() re-raises errors from driver setup or login
+            list(executor.map(lambda _: worker(), range(n_workers)))
+        return results
+
+    def _scrape_shard(self, scraper, query, max_tweets):
+        scraper._config_scraper(
+            max_tweets=max_tweets,
+            scrape_query=query,
+            scrape_latest=self.scrape_latest,
+            scrape_top=not self.scrape_latest,
+        )
+        scraper.router()
+        added = []
+        empty_count = 0
+        while len(added) < max_tweets and empty_count < self.max_empty_scrolls:
+            try:
+                new_tweets = self.store.append(scraper.extract_new_tweets())
+            except StaleElementReferenceException:
+                sleep(2)
+                continue
+            added.extend(new_tweets)
+            empty_count = 0 if new_tweets else empty_count + 1
+            scraper.scroller.scroll_to_bottom()
+            sleep(self.scroll_pause)
+        print(f"[ScrapingEngine] {query}: {len(added)} new tweets ({len(self.store)} stored)")
+        return added
+
+    def run(self, shards, max_tweets_per_shard=100):
+        # Returns the tweets added by this run, in the Tweet.tweet layout
+        start = time.monotonic()
+        added = self._run_pool(
+            shards,
+            lambda scraper, query: self._scrape_shard(scraper, query, max_tweets_per_shard),
+            login=True,
+        )
+        print(f"[ScrapingEngine] {len(added)} new tweets from {len(shards)} shards in {time.monotonic() - start:.1f}s")
+        return added
+
+    def _parse_fixture(self, scraper, path):
+        scraper.load_fixture(path)
+        return self.store.append(scraper.extract_new_tweets())
+
+    def run_fixtures(self, paths):
+        # Same pipeline on pages saved with Twitter_Scraper.save_page_fixture
+        start = time.monotonic()
+        added = self._run_pool(paths, self._parse_fixture, login=False)
+        print(f"[ScrapingEngine] {len(added)} new tweets from {len(paths)} fixtures in {time.monotonic() - start:.1f}s")
+        return added
+
+def benchmark_parser(paths, repeat=3, legacy=True):
+    """
+    Time the in-browser card parser (and optionally the Tweet class) on saved
+    page fixtures, without network access or login.
+    """
+    scraper = Twitter_Scraper(None, None)
+    results = []
+    try:
+        parsers = {"batched": lambda: len(scraper.extract_new_tweets())}
+        if legacy:
+            def parse_legacy():
+                scraper.get_tweet_cards()
+                tweets = [Tweet(card, scraper.driver, scraper.actions) for card in scraper.tweet_cards]
+                return sum(1 for tweet in tweets if tweet.tweet is not None)
+            parsers["legacy"] = parse_legacy
+
+        for name, parse in parsers.items():
+            tweets = 0
+            seconds = 0.0
+            for _ in range(repeat):
+                for path in paths:
+                    scraper.load_fixture(path)
+                    start = time.perf_counter()
+                    tweets += parse()
+                    seconds += time.perf_counter() - start
+            results.append({
+                "parser": name,
+                "tweets": tweets,
+                "seconds": seconds,
+                "tweets_per_sec": tweets / seconds if seconds else float("nan"),
+            })
+    finally:
+        scraper.driver.quit()
+    df = pd.DataFrame(results)
+    print(df.to_string(index=False))
+    return df
+
 # FETCHING DATA FROM COINGECKO
 def fetch_price():
     try: